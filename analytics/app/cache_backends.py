@@ -0,0 +1,266 @@
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import unquote, urlparse
+
+# Storage for the response cache. Values are bytes with a TTL in seconds;
+# add() stores only when the key is absent and doubles as a short lock.
+# Backends other than memory are blocking and shared between workers.
+
+
+class MemoryBackend:
+    name = "memory"
+    blocking = False
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        # key -> (expires_at, value), least recently stored first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                return False
+            self._entries[key] = (time.time() + ttl, value)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self, prefix: str) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(prefix)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def size(self, prefix: str) -> int:
+        with self._lock:
+            return sum(key.startswith(prefix) for key in self._entries)
+
+
+# One SQLite file shared by every worker on the host; survives restarts.
+class SQLiteBackend:
+    name = "sqlite"
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS response_cache (
+                  key TEXT PRIMARY KEY,
+                  value BLOB NOT NULL,
+                  expires_at REAL NOT NULL
+                )
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5)
+        return conn
+
+    def get(self, key: str) -> bytes | None:
+        row = self._connect().execute(
+            "SELECT value FROM response_cache WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl),
+            )
+            conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+            conn.execute(
+                """
+                DELETE FROM response_cache WHERE key IN (
+                  SELECT key FROM response_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM response_cache WHERE key = ? AND expires_at <= ?", (key, now)
+            )
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl),
+            )
+            return cursor.rowcount == 1
+
+    def delete(self, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def clear(self, prefix: str) -> int:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM response_cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            )
+            return cursor.rowcount
+
+    def size(self, prefix: str) -> int:
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM response_cache WHERE expires_at > ? AND substr(key, 1, ?) = ?",
+            (time.time(), len(prefix), prefix),
+        ).fetchone()[0]
+
+
+class RedisError(Exception):
+    pass
+
+
+# Failures a cache lookup may hit; callers treat them as a miss.
+BACKEND_ERRORS = (OSError, sqlite3.Error, RedisError)
+
+
+# Speaks the Redis protocol (RESP) directly, one socket per thread, so any
+# Redis-compatible server works without a client library.
+class RedisBackend:
+    name = "redis"
+    blocking = True
+
+    def __init__(self, url: str, timeout: float = 2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _open(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        stream = sock.makefile("rb")
+        self._local.sock, self._local.stream = sock, stream
+        if self.password:
+            auth = ("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)
+            self._send(*auth)
+        if self.db:
+            self._send("SELECT", self.db)
+
+    def _close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = self._local.stream = None
+        if sock is not None:
+            sock.close()
+
+    def _read(self):
+        line = self._local.stream.readline()
+        if not line:
+            raise ConnectionError("connection closed by the cache server")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise RedisError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            return self._local.stream.read(length + 2)[:-2]
+        if kind == b"*":
+            length = int(body)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise RedisError(f"unexpected reply {line!r}")
+
+    def _send(self, *parts):
+        payload = [b"*%d\r\n" % len(parts)]
+        for part in parts:
+            if not isinstance(part, bytes):
+                part = str(part).encode()
+            payload.append(b"$%d\r\n%s\r\n" % (len(part), part))
+        self._local.sock.sendall(b"".join(payload))
+        return self._read()
+
+    def _command(self, *parts):
+        if getattr(self._local, "sock", None) is None:
+            self._open()
+        try:
+            return self._send(*parts)
+        except (OSError, ConnectionError):
+            # one retry on a fresh connection, e.g. after a server restart
+            self._close()
+            self._open()
+            return self._send(*parts)
+
+    def get(self, key: str) -> bytes | None:
+        return self._command("GET", key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._command("SET", key, value, "PX", max(1, int(ttl * 1000)))
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return self._command("SET", key, value, "NX", "PX", max(1, int(ttl * 1000))) == "OK"
+
+    def delete(self, key: str) -> None:
+        self._command("DEL", key)
+
+    # Keys under prefix, a SCAN page at a time (DBSIZE would count the whole
+    # database, which other applications may share).
+    def _scan(self, prefix: str):
+        cursor = "0"
+        while True:
+            cursor, keys = self._command("SCAN", cursor, "MATCH", f"{prefix}*", "COUNT", 500)
+            cursor = cursor.decode() if isinstance(cursor, bytes) else cursor
+            if keys:
+                yield keys
+            if cursor == "0":
+                return
+
+    def clear(self, prefix: str) -> int:
+        return sum(self._command("DEL", *keys) for keys in self._scan(prefix))
+
+    def size(self, prefix: str) -> int:
+        return sum(len(keys) for keys in self._scan(prefix))
+
+
+# url: "memory://", "sqlite:///path/to/cache.db" or "redis://[:password@]host:port/db"
+def create_backend(url: str, max_entries: int):
+    scheme = urlparse(url).scheme or url
+    if scheme == "memory":
+        return MemoryBackend(max_entries)
+    if scheme == "sqlite":
+        return SQLiteBackend(url.split("://", 1)[1].removeprefix("/") or ":memory:", max_entries)
+    if scheme == "redis":
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported RESPONSE_CACHE_URL: {url}")
@@ -0,0 +1,90 @@
+import gzip
+import threading
+from collections import OrderedDict
+
+import brotli
+
+from .config import (
+    BROTLI_QUALITY,
+    COMPRESSION_CACHE_ENTRIES,
+    COMPRESSION_ENCODINGS,
+    GZIP_LEVEL,
+)
+
+# (etag, encoding) -> compressed body, least recently used first. The ETag is
+# a hash of the body, so repeated responses (cache hits, unchanged dashboards)
+# reuse the bytes compressed the first time.
+_COMPRESSED = OrderedDict()
+_LOCK = threading.Lock()
+_STATS = {"hits": 0, "misses": 0, "bytesIn": 0, "bytesOut": 0}
+
+
+# Picks the first of COMPRESSION_ENCODINGS the client accepts (q > 0).
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.strip()] = q
+    for encoding in COMPRESSION_ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+# Compressed variants are distinct representations, so they get their own ETag.
+def encoded_etag(etag: str, encoding: str) -> str:
+    return etag[:-1] + f"-{encoding}" + '"'
+
+
+def cached_compressed(etag: str | None, encoding: str) -> bytes | None:
+    if etag is None:
+        return None
+    with _LOCK:
+        body = _COMPRESSED.get((etag, encoding))
+        if body is not None:
+            _COMPRESSED.move_to_end((etag, encoding))
+            _STATS["hits"] += 1
+        return body
+
+
+def compress(body: bytes, encoding: str, etag: str | None = None) -> bytes:
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    with _LOCK:
+        _STATS["misses"] += 1
+        _STATS["bytesIn"] += len(body)
+        _STATS["bytesOut"] += len(compressed)
+        if etag is not None and COMPRESSION_CACHE_ENTRIES > 0:
+            _COMPRESSED[(etag, encoding)] = compressed
+            _COMPRESSED.move_to_end((etag, encoding))
+            while len(_COMPRESSED) > COMPRESSION_CACHE_ENTRIES:
+                _COMPRESSED.popitem(last=False)
+    return compressed
+
+
+def compression_stats() -> dict:
+    with _LOCK:
+        stats = dict(_STATS)
+        entries = len(_COMPRESSED)
+        cached_bytes = sum(len(body) for body in _COMPRESSED.values())
+    return {
+        **stats,
+        "ratio": round(stats["bytesOut"] / stats["bytesIn"], 3) if stats["bytesIn"] else 0,
+        "encodings": list(COMPRESSION_ENCODINGS),
+        "gzipLevel": GZIP_LEVEL,
+        "brotliQuality": BROTLI_QUALITY,
+        "cachedEntries": entries,
+        "cachedBytes": cached_bytes,
+    }
@@ -9,6 +9,13 @@ def _env(name: str, default: str | None = None) -> str | None:
     return value if value is not None else default
 
 
+def _env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 LMS_DB_HOST = _env("LMS_DB_HOST", "127.0.0.1")
 LMS_DB_PORT = int(_env("LMS_DB_PORT", "3306"))
 LMS_DB_NAME = _env("LMS_DB_NAME", "lms")
@@ -21,3 +28,147 @@ MOODLE_DB_NAME = _env("MOODLE_DB_NAME", "moodle")
 MOODLE_DB_USER = _env("MOODLE_DB_USER", "demo")
 MOODLE_DB_PASS = _env("MOODLE_DB_PASS", "Demo@123")
 MOODLE_DB_PREFIX = _env("MOODLE_DB_PREFIX", "mdl_")
+
+# Where learning-hours sessions are computed from the Moodle log:
+# "sql" aggregates the 1-30 minute gaps in the database (window functions,
+# MySQL 8+), "python" fetches the raw log rows and walks them here.
+SESSIONIZATION_MODE = (_env("SESSIONIZATION_MODE", "sql") or "sql").strip().lower()
+
+# Large id lists are split into IN (...) chunks of IN_LIST_CHUNK_SIZE ids, run
+# on up to IN_LIST_PARALLEL connections at once. From IN_LIST_TEMP_TABLE_MIN
+# ids on (0 = never) the ids are loaded into a temporary table instead.
+IN_LIST_CHUNK_SIZE = int(_env("IN_LIST_CHUNK_SIZE", "1000"))
+IN_LIST_PARALLEL = int(_env("IN_LIST_PARALLEL", "4"))
+IN_LIST_TEMP_TABLE_MIN = int(_env("IN_LIST_TEMP_TABLE_MIN", "0"))
+
+# Optional rollup database (full SQLAlchemy URL) kept up to date by
+# `python -m app.rollups`. Log aggregates are read from it while it is no more
+# than ROLLUP_MAX_LAG_SECONDS behind the requested window.
+ROLLUP_DB_URL = _env("ROLLUP_DB_URL")
+ROLLUP_MAX_LAG_SECONDS = int(_env("ROLLUP_MAX_LAG_SECONDS", "900"))
+ROLLUP_STATE_CHECK_SECONDS = int(_env("ROLLUP_STATE_CHECK_SECONDS", "30"))
+ROLLUP_BATCH_SIZE = int(_env("ROLLUP_BATCH_SIZE", "200000"))
+ROLLUP_CONCURRENCY_DAYS = int(_env("ROLLUP_CONCURRENCY_DAYS", "2"))
+# Log rows younger than this are left for the next ETL run, so rows whose ids
+# commit out of order are not skipped by the id watermark.
+ROLLUP_SETTLE_SECONDS = int(_env("ROLLUP_SETTLE_SECONDS", "120"))
+
+# Run services on the async engines (aiomysql) and fan out independent queries.
+# When disabled, routes run the sync services in the threadpool.
+DB_ASYNC = _env_bool("DB_ASYNC", False)
+
+# Identical concurrent service calls (same endpoint and arguments) share one
+# computation instead of running the same queries side by side.
+COALESCE_REQUESTS = _env_bool("COALESCE_REQUESTS", True)
+
+# Connection pool policy, applied to every engine (sync and async).
+DB_POOL_SIZE = int(_env("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(_env("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(_env("DB_POOL_TIMEOUT", "30"))
+# Seconds before a pooled connection is replaced; -1 keeps connections forever.
+# Keep it below MySQL wait_timeout when pre-ping is turned off.
+DB_POOL_RECYCLE = int(_env("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+
+# Independent helpers of a sync service (e.g. the eight of student-overall)
+# run on up to GATHER_PARALLEL shared worker threads; 1 runs them in order.
+# The busy workers of all fan-outs together (helpers, id chunks, sections) are
+# capped at DB_POOL_SIZE + DB_MAX_OVERFLOW - 1; calls over the cap run on the
+# calling thread. A request still waiting on helpers after
+# REQUEST_DEADLINE_SECONDS fails with 504 (0 = no deadline).
+GATHER_PARALLEL = int(_env("GATHER_PARALLEL", "4"))
+REQUEST_DEADLINE_SECONDS = float(_env("REQUEST_DEADLINE_SECONDS", "30"))
+
+# Optional read replicas (full SQLAlchemy URLs). Analytics reads go to the
+# replica while its lag stays under REPLICA_MAX_LAG_SECONDS.
+LMS_DB_REPLICA_URL = _env("LMS_DB_REPLICA_URL")
+MOODLE_DB_REPLICA_URL = _env("MOODLE_DB_REPLICA_URL")
+REPLICA_MAX_LAG_SECONDS = int(_env("REPLICA_MAX_LAG_SECONDS", "30"))
+REPLICA_LAG_CHECK_SECONDS = int(_env("REPLICA_LAG_CHECK_SECONDS", "10"))
+# Endpoints that always read from the primary, e.g. "teacher-per-course".
+FRESH_ENDPOINTS = {
+    name.strip() for name in (_env("FRESH_ENDPOINTS", "") or "").split(",") if name.strip()
+}
+
+# Response cache for parameterless dashboards (admin-*). Entries are fresh for
+# the endpoint TTL and then served stale for up to RESPONSE_CACHE_STALE_SECONDS
+# more while one background task recomputes them. A TTL of 0 disables caching.
+RESPONSE_CACHE_TTL_SECONDS = int(_env("RESPONSE_CACHE_TTL_SECONDS", "60"))
+RESPONSE_CACHE_STALE_SECONDS = int(_env("RESPONSE_CACHE_STALE_SECONDS", "300"))
+RESPONSE_CACHE_MAX_ENTRIES = int(_env("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+# Where cached responses live: "memory://" (per worker), "sqlite:///path.db"
+# (shared by the workers on one host) or "redis://host:6379/0" (shared).
+RESPONSE_CACHE_URL = _env("RESPONSE_CACHE_URL", "memory://") or "memory://"
+RESPONSE_CACHE_PREFIX = _env("RESPONSE_CACHE_PREFIX", "analytics:resp:")
+# Per-endpoint TTL overrides, e.g. "admin-ideas=300,admin-overall=30".
+RESPONSE_CACHE_TTLS = {
+    name.strip(): int(ttl)
+    for name, _, ttl in (
+        item.partition("=") for item in (_env("RESPONSE_CACHE_TTLS", "") or "").split(",")
+    )
+    if name.strip() and ttl.strip()
+}
+
+# In-process caches for dimension rows (users, courses, id mappings), per
+# table: entries live for the TTL and the least recently used are dropped past
+# DIMENSION_CACHE_MAX_ENTRIES. A TTL of 0 disables a table.
+DIMENSION_CACHE_TTL_SECONDS = int(_env("DIMENSION_CACHE_TTL_SECONDS", "300"))
+DIMENSION_CACHE_MAX_ENTRIES = int(_env("DIMENSION_CACHE_MAX_ENTRIES", "10000"))
+# Per-table TTL overrides, e.g. "course_teacher=60,all_courses=600".
+DIMENSION_CACHE_TTLS = {
+    name.strip(): int(ttl)
+    for name, _, ttl in (
+        item.partition("=") for item in (_env("DIMENSION_CACHE_TTLS", "") or "").split(",")
+    )
+    if name.strip() and ttl.strip()
+}
+
+# Compression of JSON responses of at least COMPRESSION_MIN_BYTES, in the
+# listed order of preference ("br,gzip"; empty disables). Compressed bodies of
+# the last COMPRESSION_CACHE_ENTRIES responses are kept for reuse by ETag.
+COMPRESSION_ENCODINGS = [
+    name.strip().lower()
+    for name in (_env("COMPRESSION_ENCODINGS", "br,gzip") or "").split(",")
+    if name.strip().lower() in ("br", "gzip")
+]
+COMPRESSION_MIN_BYTES = int(_env("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(_env("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(_env("BROTLI_QUALITY", "5"))
+COMPRESSION_CACHE_ENTRIES = int(_env("COMPRESSION_CACHE_ENTRIES", "256"))
+
+# Page size of the cursor-paged teacher-per-course lists.
+PAGE_SIZE_DEFAULT = int(_env("PAGE_SIZE_DEFAULT", "100"))
+PAGE_SIZE_MAX = int(_env("PAGE_SIZE_MAX", "1000"))
+
+# Students per batch in streamed exports: rows read from the server-side cursor
+# and metric lookups per step, which bounds memory per export.
+EXPORT_BATCH_SIZE = int(_env("EXPORT_BATCH_SIZE", "500"))
+
+# Most moodle_user_ids accepted by student-overall-bulk in one request.
+STUDENT_BULK_MAX_IDS = int(_env("STUDENT_BULK_MAX_IDS", "500"))
+
+# Sections of a composite endpoint (admin-dashboard) computed at once in sync
+# mode, each on its own connections.
+SECTION_PARALLEL = int(_env("SECTION_PARALLEL", "4"))
+
+# Per-query and per-request metrics served at /analytics/_metrics.
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+
+# Server-Timing response header with the longest spans of the request (SQL per
+# helper, payload building, JSON rendering). "request" adds it when the request
+# asks (?timing=1 or X-Server-Timing: 1), "always" unless ?timing=0, "off" never.
+SERVER_TIMING = _env("SERVER_TIMING", "request").lower()
+SERVER_TIMING_MAX_SPANS = int(_env("SERVER_TIMING_MAX_SPANS", "12"))
+
+# ?profile=1 runs the request under cProfile and returns the report with the
+# request's SQL log instead of the payload. Off unless enabled, and the request
+# must also send PROFILE_TOKEN as X-Profile-Token; while it is unset profiling
+# is refused. With PROFILE_DIR set, reports are also written there.
+PROFILING_ENABLED = _env_bool("PROFILING_ENABLED", False)
+PROFILE_TOKEN = _env("PROFILE_TOKEN", "")
+PROFILE_DIR = _env("PROFILE_DIR", "")
+PROFILE_TOP_FUNCTIONS = int(_env("PROFILE_TOP_FUNCTIONS", "40"))
+
+# DELETE /analytics/_cache and /analytics/_dimensions need this token as
+# X-Admin-Token; while it is unset they are refused.
+ADMIN_TOKEN = _env("ADMIN_TOKEN", "")
@@ -1,29 +1,41 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from .dispatch import call_cached, requested_fields
 from ..services.admin_service import (
     get_admin_overall,
+    get_admin_overall_async,
     get_admin_learning,
+    get_admin_learning_async,
     get_admin_engagement,
+    get_admin_engagement_async,
     get_admin_ideas,
+    get_admin_ideas_async,
+    get_admin_dashboard,
+    get_admin_dashboard_async,
 )
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 
 @router.get("/admin-overall")
-def admin_overall():
-    return get_admin_overall()
+async def admin_overall(fields: frozenset[str] | None = Depends(requested_fields)):
+    return await call_cached("admin-overall", get_admin_overall, get_admin_overall_async, fields)
 
 
 @router.get("/admin-learning")
-def admin_learning():
-    return get_admin_learning()
+async def admin_learning(fields: frozenset[str] | None = Depends(requested_fields)):
+    return await call_cached("admin-learning", get_admin_learning, get_admin_learning_async, fields)
 
 
 @router.get("/admin-engagement")
-def admin_engagement():
-    return get_admin_engagement()
+async def admin_engagement(fields: frozenset[str] | None = Depends(requested_fields)):
+    return await call_cached("admin-engagement", get_admin_engagement, get_admin_engagement_async, fields)
 
 
 @router.get("/admin-ideas")
-def admin_ideas():
-    return get_admin_ideas()
+async def admin_ideas(fields: frozenset[str] | None = Depends(requested_fields)):
+    return await call_cached("admin-ideas", get_admin_ideas, get_admin_ideas_async, fields)
+
+
+@router.get("/admin-dashboard")
+async def admin_dashboard(fields: frozenset[str] | None = Depends(requested_fields)):
+    return await call_cached("admin-dashboard", get_admin_dashboard, get_admin_dashboard_async, fields)
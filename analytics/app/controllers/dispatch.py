@@ -0,0 +1,57 @@
+from fastapi import Query
+from starlette.concurrency import run_in_threadpool
+
+from ..config import COALESCE_REQUESTS, DB_ASYNC
+from ..profiling import profile_call, profiling_active
+from ..request_context import current_context
+from ..response_cache import cached
+from ..single_flight import single_flight
+
+
+def requested_fields(
+    fields: str | None = Query(
+        None, description="Comma-separated top-level fields to return (default: all)"
+    ),
+) -> frozenset[str] | None:
+    if not fields:
+        return None
+    names = frozenset(name.strip() for name in fields.split(",") if name.strip())
+    return names or None
+
+
+def _run_sync(sync_fn, *args):
+    # Connections shared by the request are handed back from the worker thread
+    # that used them, not from the event loop.
+    try:
+        return profile_call(sync_fn, *args)
+    finally:
+        ctx = current_context()
+        if ctx is not None:
+            ctx.release_connections()
+
+
+# Routes are async; the sync services stay available as the fallback mode and
+# run in the threadpool exactly as sync routes did.
+async def _run_service(sync_fn, async_fn, *args):
+    if DB_ASYNC:
+        return await async_fn(*args)
+    return await run_in_threadpool(_run_sync, sync_fn, *args)
+
+
+# Concurrent calls of one service with the same arguments are coalesced.
+async def call_service(sync_fn, async_fn, *args):
+    # A profiled request computes its own result.
+    if not COALESCE_REQUESTS or profiling_active():
+        return await _run_service(sync_fn, async_fn, *args)
+    name = sync_fn.__name__
+    return await single_flight(
+        name, (name, args), lambda: _run_service(sync_fn, async_fn, *args)
+    )
+
+
+# Same as call_service, with the result kept in the response cache under the
+# endpoint name and arguments.
+async def call_cached(endpoint: str, sync_fn, async_fn, *args):
+    if profiling_active():
+        return await _run_service(sync_fn, async_fn, *args)
+    return await cached(endpoint, args, lambda: call_service(sync_fn, async_fn, *args))
@@ -0,0 +1,80 @@
+import hmac
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from ..compression import compression_stats
+from ..config import ADMIN_TOKEN
+from ..db import pool_stats, replica_stats
+from ..dimension_cache import dimension_stats, invalidate_dimensions
+from ..metrics import render_metrics
+from ..response_cache import cache_stats, invalidate
+from ..responses import serialization_stats
+from ..rollups import rollup_stats
+from ..single_flight import single_flight_stats
+
+router = APIRouter(prefix="/analytics", tags=["internal"], include_in_schema=False)
+
+
+def _require_admin_token(request: Request) -> None:
+    sent = request.headers.get("x-admin-token", "").encode()
+    if not ADMIN_TOKEN or not hmac.compare_digest(sent, ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@router.get("/_pool")
+def pool():
+    return pool_stats()
+
+
+@router.get("/_replicas")
+def replicas():
+    return replica_stats()
+
+
+@router.get("/_rollups")
+def rollups():
+    return rollup_stats()
+
+
+@router.get("/_cache")
+async def cache():
+    return await cache_stats()
+
+
+@router.delete("/_cache", dependencies=[Depends(_require_admin_token)])
+async def clear_cache(endpoint: str | None = None):
+    return {"invalidated": await invalidate(endpoint)}
+
+
+@router.get("/_coalescing")
+async def coalescing():
+    return single_flight_stats()
+
+
+@router.get("/_dimensions")
+def dimensions():
+    return dimension_stats()
+
+
+@router.delete("/_dimensions", dependencies=[Depends(_require_admin_token)])
+def clear_dimensions(table: str | None = None):
+    return {"invalidated": invalidate_dimensions(table)}
+
+
+@router.get("/_serialization")
+async def serialization():
+    return serialization_stats()
+
+
+@router.get("/_compression")
+def compression():
+    return compression_stats()
+
+
+# Prometheus text exposition format.
+@router.get("/_metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(
+        render_metrics(serialization_stats(), compression_stats()),
+        media_type="text/plain; version=0.0.4",
+    )
@@ -1,28 +1,51 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, Query
+from .dispatch import call_service, requested_fields
 from ..services.investor_service import (
     get_investor_overall,
+    get_investor_overall_async,
     get_investor_invested_ideas,
+    get_investor_invested_ideas_async,
     get_investor_per_idea,
+    get_investor_per_idea_async,
 )
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 
 @router.get("/investor-overall")
-def investor_overall(investor_id: str = Query(..., description="Investor userId (LMS)")):
-    return get_investor_overall(investor_id)
+async def investor_overall(
+    investor_id: str = Query(..., description="Investor userId (LMS)"),
+    fields: frozenset[str] | None = Depends(requested_fields),
+):
+    return await call_service(
+        get_investor_overall, get_investor_overall_async, investor_id, fields
+    )
 
 
 @router.get("/investor-invested-ideas")
-def investor_invested_ideas(investor_id: str = Query(..., description="Investor userId (LMS)")):
-    return get_investor_invested_ideas(investor_id)
+async def investor_invested_ideas(
+    investor_id: str = Query(..., description="Investor userId (LMS)"),
+    fields: frozenset[str] | None = Depends(requested_fields),
+):
+    return await call_service(
+        get_investor_invested_ideas, get_investor_invested_ideas_async, investor_id, fields
+    )
 
 
 @router.get("/investor-per-idea")
-def investor_per_idea(
+async def investor_per_idea(
     investor_id: str = Query(..., description="Investor userId (LMS)"),
     idea_id: str | None = Query(None, description="Filter by idea id"),
     mentor_id: str | None = Query(None, description="Filter by mentor userId"),
     student_id: str | None = Query(None, description="Filter by student userId"),
+    fields: frozenset[str] | None = Depends(requested_fields),
 ):
-    return get_investor_per_idea(investor_id, idea_id, mentor_id, student_id)
+    return await call_service(
+        get_investor_per_idea,
+        get_investor_per_idea_async,
+        investor_id,
+        idea_id,
+        mentor_id,
+        student_id,
+        fields,
+    )
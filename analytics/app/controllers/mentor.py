@@ -1,17 +1,29 @@
-from fastapi import APIRouter, Query
-from ..services.mentor_service import get_mentor_overall, get_mentor_per_idea
+from fastapi import APIRouter, Depends, Query
+from .dispatch import call_service, requested_fields
+from ..services.mentor_service import (
+    get_mentor_overall,
+    get_mentor_overall_async,
+    get_mentor_per_idea,
+    get_mentor_per_idea_async,
+)
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 
 @router.get("/mentor-overall")
-def mentor_overall(mentor_id: int = Query(..., description="Moodle mentor user id")):
-    return get_mentor_overall(mentor_id)
+async def mentor_overall(
+    mentor_id: int = Query(..., description="Moodle mentor user id"),
+    fields: frozenset[str] | None = Depends(requested_fields),
+):
+    return await call_service(get_mentor_overall, get_mentor_overall_async, mentor_id, fields)
 
 
 @router.get("/mentor-per-idea")
-def mentor_per_idea(
+async def mentor_per_idea(
     mentor_id: int = Query(..., description="Moodle mentor user id"),
     idea_id: str | None = Query(None, description="Idea id"),
+    fields: frozenset[str] | None = Depends(requested_fields),
 ):
-    return get_mentor_per_idea(mentor_id, idea_id)
+    return await call_service(
+        get_mentor_per_idea, get_mentor_per_idea_async, mentor_id, idea_id, fields
+    )
@@ -1,17 +1,60 @@
-from fastapi import APIRouter, Query
-from ..services.student_service import get_student_overall, get_student_per_course
+from fastapi import APIRouter, Depends, HTTPException, Query
+from .dispatch import call_service, requested_fields
+from ..config import STUDENT_BULK_MAX_IDS
+from ..services.student_service import (
+    get_students_overall,
+    get_students_overall_async,
+    get_student_overall,
+    get_student_overall_async,
+    get_student_per_course,
+    get_student_per_course_async,
+)
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 
 @router.get("/student-overall")
-def student_overall(moodle_user_id: int = Query(..., description="Moodle user id")):
-    return get_student_overall(moodle_user_id)
+async def student_overall(
+    moodle_user_id: int = Query(..., description="Moodle user id"),
+    fields: frozenset[str] | None = Depends(requested_fields),
+):
+    return await call_service(
+        get_student_overall, get_student_overall_async, moodle_user_id, fields
+    )
 
 
 @router.get("/student-per-course")
-def student_per_course(
+async def student_per_course(
     moodle_user_id: int = Query(..., description="Moodle user id"),
     course_id: int = Query(..., description="Moodle course id"),
+    fields: frozenset[str] | None = Depends(requested_fields),
+):
+    return await call_service(
+        get_student_per_course, get_student_per_course_async, moodle_user_id, course_id, fields
+    )
+
+
+def requested_user_ids(
+    moodle_user_ids: str = Query(..., description="Comma-separated Moodle user ids"),
+) -> tuple[int, ...]:
+    try:
+        ids = tuple(dict.fromkeys(int(v) for v in moodle_user_ids.split(",") if v.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="moodle_user_ids must be integers")
+    if not ids:
+        raise HTTPException(status_code=400, detail="moodle_user_ids is empty")
+    if len(ids) > STUDENT_BULK_MAX_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {STUDENT_BULK_MAX_IDS} moodle_user_ids per request"
+        )
+    return ids
+
+
+@router.get("/student-overall-bulk")
+async def student_overall_bulk(
+    moodle_user_ids: tuple[int, ...] = Depends(requested_user_ids),
+    fields: frozenset[str] | None = Depends(requested_fields),
 ):
-    return get_student_per_course(moodle_user_id, course_id)
+    return await call_service(
+        get_students_overall, get_students_overall_async, moodle_user_ids, fields
+    )
@@ -1,17 +1,69 @@
-from fastapi import APIRouter, Query
-from ..services.teacher_service import get_teacher_overall, get_teacher_per_course
+from typing import Literal
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from .dispatch import _run_service, call_service, requested_fields
+from ..config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+from ..services.teacher_service import (
+    get_teacher_course_page,
+    get_teacher_course_page_async,
+    get_teacher_overall,
+    get_teacher_overall_async,
+    get_teacher_per_course,
+    get_teacher_per_course_async,
+    get_teacher_students_export,
+    get_teacher_students_export_async,
+)
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 
 @router.get("/teacher-overall")
-def teacher_overall(teacher_id: int = Query(..., description="Moodle teacher user id")):
-    return get_teacher_overall(teacher_id)
+async def teacher_overall(
+    teacher_id: int = Query(..., description="Moodle teacher user id"),
+    fields: frozenset[str] | None = Depends(requested_fields),
+):
+    return await call_service(get_teacher_overall, get_teacher_overall_async, teacher_id, fields)
 
 
 @router.get("/teacher-per-course")
-def teacher_per_course(
+async def teacher_per_course(
+    teacher_id: int = Query(..., description="Moodle teacher user id"),
+    course_id: int = Query(..., description="Moodle course id"),
+    fields: frozenset[str] | None = Depends(requested_fields),
+):
+    return await call_service(
+        get_teacher_per_course, get_teacher_per_course_async, teacher_id, course_id, fields
+    )
+
+
+@router.get("/teacher-per-course-page")
+async def teacher_per_course_page(
+    teacher_id: int = Query(..., description="Moodle teacher user id"),
+    course_id: int = Query(..., description="Moodle course id"),
+    section: Literal["missing_details", "ungraded_submissions", "missing_per_student"] = Query(...),
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: str | None = Query(None, description="nextCursor of the previous page"),
+):
+    return await call_service(
+        get_teacher_course_page, get_teacher_course_page_async, teacher_id, course_id, section, limit, cursor
+    )
+
+
+_EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+# Not coalesced: every caller streams its own body.
+@router.get("/teacher-students-export")
+async def teacher_students_export(
     teacher_id: int = Query(..., description="Moodle teacher user id"),
     course_id: int = Query(..., description="Moodle course id"),
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
 ):
-    return get_teacher_per_course(teacher_id, course_id)
+    chunks = await _run_service(
+        get_teacher_students_export, get_teacher_students_export_async, teacher_id, course_id, format
+    )
+    return StreamingResponse(
+        chunks,
+        media_type=_EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="course-{course_id}-students.{format}"'},
+    )
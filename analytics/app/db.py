@@ -1,5 +1,15 @@
-from sqlalchemy import create_engine
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import create_engine, event
 from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.util import await_only, greenlet_spawn
 from urllib.parse import quote_plus
 from .config import (
     LMS_DB_HOST,
@@ -12,7 +22,28 @@ from .config import (
     MOODLE_DB_NAME,
     MOODLE_DB_USER,
     MOODLE_DB_PASS,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    GATHER_PARALLEL,
+    REQUEST_DEADLINE_SECONDS,
+    LMS_DB_REPLICA_URL,
+    MOODLE_DB_REPLICA_URL,
+    REPLICA_MAX_LAG_SECONDS,
+    REPLICA_LAG_CHECK_SECONDS,
+    IN_LIST_PARALLEL,
+    ROLLUP_DB_URL,
+    SECTION_PARALLEL,
+    METRICS_ENABLED,
+    SERVER_TIMING,
+    PROFILING_ENABLED,
 )
+from .metrics import attributed_to, count_query_error, current_helper, observe_query
+from .profiling import log_query, profile_call
+from .request_context import current_context
+from .server_timing import add_span
 
 
 def _mysql_url(host: str, port: int, db: str, user: str, pwd: str) -> str:
@@ -21,14 +52,555 @@ def _mysql_url(host: str, port: int, db: str, user: str, pwd: str) -> str:
     return f"mysql+pymysql://{safe_user}:{safe_pwd}@{host}:{port}/{db}"
 
 
-LMS_ENGINE: Engine = create_engine(
-    _mysql_url(LMS_DB_HOST, LMS_DB_PORT, LMS_DB_NAME, LMS_DB_USER, LMS_DB_PASS),
-    pool_pre_ping=True,
+def _pool_options(url: str) -> dict:
+    # SQLite stand-ins use a non-queue pool that rejects sizing arguments.
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    ctx = current_context()
+    if ctx is not None:
+        ctx.count_query()
+
+
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._analytics_query = (current_helper(), time.perf_counter())
+
+
+def _engine_label(engine: Engine) -> str:
+    return ENGINE_NAMES.get(engine) or _ASYNC_ENGINE_NAMES.get(engine, "other")
+
+
+def _end_query(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_analytics_query", None)
+    if started is not None:
+        helper, start = started
+        seconds = time.perf_counter() - start
+        rows = cursor.rowcount if cursor.rowcount > 0 else 0
+        engine = _engine_label(conn.engine)
+        if METRICS_ENABLED:
+            observe_query(helper, engine, seconds, rows)
+        add_span("db", seconds)
+        add_span(f"db.{helper}", seconds)
+        log_query(helper, engine, statement, parameters, seconds, rows)
+
+
+def _query_error(exception_context):
+    started = getattr(exception_context.execution_context, "_analytics_query", None)
+    helper = started[0] if started is not None else current_helper()
+    count_query_error(helper, _engine_label(exception_context.engine))
+
+
+def _instrument(engine: Engine) -> None:
+    event.listen(engine, "before_cursor_execute", _count_query)
+    if METRICS_ENABLED or SERVER_TIMING != "off" or PROFILING_ENABLED:
+        event.listen(engine, "before_cursor_execute", _start_query)
+        event.listen(engine, "after_cursor_execute", _end_query)
+    if METRICS_ENABLED:
+        event.listen(engine, "handle_error", _query_error)
+
+
+def _create_engine(url: str) -> Engine:
+    engine = create_engine(url, **_pool_options(url))
+    _instrument(engine)
+    return engine
+
+
+LMS_ENGINE: Engine = _create_engine(
+    _mysql_url(LMS_DB_HOST, LMS_DB_PORT, LMS_DB_NAME, LMS_DB_USER, LMS_DB_PASS)
 )
 
-MOODLE_ENGINE: Engine = create_engine(
+MOODLE_ENGINE: Engine = _create_engine(
     _mysql_url(
         MOODLE_DB_HOST, MOODLE_DB_PORT, MOODLE_DB_NAME, MOODLE_DB_USER, MOODLE_DB_PASS
-    ),
-    pool_pre_ping=True,
+    )
 )
+
+ENGINE_NAMES: dict[Engine, str] = {
+    LMS_ENGINE: "lms",
+    MOODLE_ENGINE: "moodle",
+}
+
+# primary engine -> read replica engine
+REPLICAS: dict[Engine, Engine] = {}
+if LMS_DB_REPLICA_URL:
+    REPLICAS[LMS_ENGINE] = _create_engine(LMS_DB_REPLICA_URL)
+    ENGINE_NAMES[REPLICAS[LMS_ENGINE]] = "lms:replica"
+if MOODLE_DB_REPLICA_URL:
+    REPLICAS[MOODLE_ENGINE] = _create_engine(MOODLE_DB_REPLICA_URL)
+    ENGINE_NAMES[REPLICAS[MOODLE_ENGINE]] = "moodle:replica"
+
+# Local rollup tables maintained by app.rollups (None when not configured).
+ROLLUP_ENGINE: Engine | None = None
+if ROLLUP_DB_URL:
+    ROLLUP_ENGINE = _create_engine(ROLLUP_DB_URL)
+    ENGINE_NAMES[ROLLUP_ENGINE] = "rollup"
+
+
+# Async driver per backend; the async engine mirrors the sync engine's URL.
+# Only MySQL has one in requirements.txt (aiomysql), so DB_ASYNC needs MySQL URLs.
+_ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+}
+_ASYNC_ENGINES: dict[Engine, AsyncEngine] = {}
+# sync side of an async engine -> pool name, for metric labels
+_ASYNC_ENGINE_NAMES: dict[Engine, str] = {}
+_IN_ASYNC_CALL: ContextVar[bool] = ContextVar("_IN_ASYNC_CALL", default=False)
+_FRESH_READS: ContextVar[bool] = ContextVar("_FRESH_READS", default=False)
+# Connections of the helper call running in a run_calls worker; they are
+# closed by that worker when the call ends instead of with the request.
+_CALL_CONNECTIONS: ContextVar[dict | None] = ContextVar("_CALL_CONNECTIONS", default=None)
+# in_use: (thread id, engine) -> open connect() blocks on this thread's shared
+# connection, which must not be released under them.
+_THREAD = threading.local()
+
+
+def get_async_engine(engine: Engine) -> AsyncEngine:
+    async_engine = _ASYNC_ENGINES.get(engine)
+    if async_engine is None:
+        url = engine.url.set(drivername=_ASYNC_DRIVERS[engine.url.get_backend_name()])
+        async_engine = create_async_engine(url, **_pool_options(url.drivername))
+        _ASYNC_ENGINE_NAMES[async_engine.sync_engine] = _pool_name(engine, True)
+        _instrument(async_engine.sync_engine)
+        _ASYNC_ENGINES[engine] = async_engine
+    return async_engine
+
+
+# Time spent waiting for a pooled connection, per pool name.
+_POOL_WAITS: dict[str, dict] = {}
+_POOL_WAITS_LOCK = threading.Lock()
+
+
+def _empty_waits() -> dict:
+    return {"count": 0, "total": 0.0, "max": 0.0, "timeouts": 0}
+
+
+def _record_pool_wait(pool_name: str, seconds: float | None) -> None:
+    with _POOL_WAITS_LOCK:
+        stats = _POOL_WAITS.setdefault(pool_name, _empty_waits())
+        if seconds is None:
+            stats["timeouts"] += 1
+            return
+        stats["count"] += 1
+        stats["total"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+
+
+def _pool_name(engine: Engine, is_async: bool = False) -> str:
+    name = ENGINE_NAMES.get(engine, engine.url.render_as_string(hide_password=True))
+    return f"{name}:async" if is_async else name
+
+
+def _open(engine: Engine, is_async: bool):
+    pool_name = _pool_name(engine, is_async)
+    started = time.perf_counter()
+    try:
+        if is_async:
+            conn = await_only(get_async_engine(engine).connect().start())
+        else:
+            conn = engine.connect()
+    except PoolTimeoutError:
+        _record_pool_wait(pool_name, None)
+        raise
+    _record_pool_wait(pool_name, time.perf_counter() - started)
+    return conn
+
+
+def _close(conn, is_async: bool) -> None:
+    if is_async:
+        await_only(conn.close())
+    else:
+        conn.close()
+
+
+# replica -> (checked_at, lag in seconds or None while unavailable)
+_REPLICA_LAG: dict[Engine, tuple[float, float | None]] = {}
+_REPLICA_LAG_LOCK = threading.Lock()
+
+
+def _probe_replica_lag(replica: Engine, is_async: bool) -> float | None:
+    # Stand-ins that cannot report replication status are treated as in sync.
+    if replica.url.get_backend_name() != "mysql":
+        return 0.0
+    try:
+        conn = _open(replica, is_async)
+        try:
+            sync_conn = conn.sync_connection if is_async else conn
+            try:
+                row = sync_conn.exec_driver_sql("SHOW REPLICA STATUS").mappings().first()
+            except DBAPIError:
+                row = sync_conn.exec_driver_sql("SHOW SLAVE STATUS").mappings().first()
+        finally:
+            _close(conn, is_async)
+    except SQLAlchemyError:
+        return None
+    if row is None:
+        return 0.0
+    lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+    return float(lag) if lag is not None else None
+
+
+def _replica_lag(replica: Engine) -> float | None:
+    checked_at, lag = _REPLICA_LAG.get(replica, (None, None))
+    if checked_at is not None and time.monotonic() - checked_at < REPLICA_LAG_CHECK_SECONDS:
+        return lag
+    # One caller refreshes the probe; the others keep using the last value.
+    if not _REPLICA_LAG_LOCK.acquire(blocking=False):
+        return lag
+    try:
+        lag = _probe_replica_lag(replica, _IN_ASYNC_CALL.get())
+        _REPLICA_LAG[replica] = (time.monotonic(), lag)
+    finally:
+        _REPLICA_LAG_LOCK.release()
+    return lag
+
+
+# engine -> whether the server runs window functions (MySQL 8+, MariaDB
+# 10.2+). Probed once per process; an unreachable server is probed again on
+# the next call.
+_WINDOW_FUNCTIONS: dict[Engine, bool] = {}
+_WINDOW_FUNCTIONS_LOCK = threading.Lock()
+
+
+def _probe_window_functions(engine: Engine, is_async: bool) -> bool | None:
+    try:
+        conn = _open(engine, is_async)
+    except SQLAlchemyError:
+        return None
+    try:
+        sync_conn = conn.sync_connection if is_async else conn
+        sync_conn.exec_driver_sql("SELECT ROW_NUMBER() OVER () AS n").all()
+        return True
+    except DBAPIError:
+        return False
+    finally:
+        _close(conn, is_async)
+
+
+def window_functions_supported(engine: Engine) -> bool | None:
+    engine = route_engine(engine)
+    supported = _WINDOW_FUNCTIONS.get(engine)
+    if supported is not None:
+        return supported
+    # One caller probes and sync callers wait for it; on the event loop the
+    # others see None (unknown) until it is done.
+    is_async = _IN_ASYNC_CALL.get()
+    if not _WINDOW_FUNCTIONS_LOCK.acquire(blocking=not is_async):
+        return None
+    try:
+        supported = _WINDOW_FUNCTIONS.get(engine)
+        if supported is None:
+            supported = _probe_window_functions(engine, is_async)
+            if supported is not None:
+                _WINDOW_FUNCTIONS[engine] = supported
+    finally:
+        _WINDOW_FUNCTIONS_LOCK.release()
+    return supported
+
+
+def route_engine(engine: Engine) -> Engine:
+    replica = REPLICAS.get(engine)
+    if replica is None or _FRESH_READS.get():
+        return engine
+    lag = _replica_lag(replica)
+    if lag is None or lag > REPLICA_MAX_LAG_SECONDS:
+        return engine
+    return replica
+
+
+@contextmanager
+def fresh_reads():
+    token = _FRESH_READS.set(True)
+    try:
+        yield
+    finally:
+        _FRESH_READS.reset(token)
+
+
+def _shared_connections() -> dict | None:
+    connections = _CALL_CONNECTIONS.get()
+    if connections is None:
+        ctx = current_context()
+        connections = ctx.connections if ctx is not None else None
+    return connections
+
+
+# Reads go through route_engine, and inside run_async the connection comes
+# from the matching async engine, so the same helper code runs on either driver.
+# Sync helpers inside a request share one connection per engine; concurrent
+# async calls each need their own.
+@contextmanager
+def connect(engine: Engine):
+    is_async = _IN_ASYNC_CALL.get()
+    routed = route_engine(engine)
+    connections = _shared_connections()
+    if connections is not None and not is_async:
+        key = (threading.get_ident(), routed)
+        conn = connections.get(key)
+        if conn is None or conn.invalidated:
+            if conn is not None:
+                conn.close()
+            conn = connections[key] = _open(routed, False)
+        in_use = _THREAD.__dict__.setdefault("in_use", {})
+        in_use[key] = in_use.get(key, 0) + 1
+        try:
+            yield conn
+        finally:
+            in_use[key] -= 1
+        return
+    conn = _open(routed, is_async)
+    try:
+        yield conn.sync_connection if is_async else conn
+    finally:
+        _close(conn, is_async)
+
+
+# A connection of its own, outside the request's shared ones: for work that
+# outlives the request handler, e.g. a streamed response body.
+@contextmanager
+def dedicated_connection(engine: Engine):
+    conn = _open(engine, False)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _call_in_async_context(fn, args):
+    token = _IN_ASYNC_CALL.set(True)
+    try:
+        return fn(*args)
+    finally:
+        _IN_ASYNC_CALL.reset(token)
+
+
+async def run_async(fn, *args):
+    return await greenlet_spawn(_call_in_async_context, fn, args)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+# Each worker holds at most one connection per engine at a time. The three
+# pools share one budget of DB_POOL_SIZE + DB_MAX_OVERFLOW - 1 busy workers
+# (see _fan_out), so nested fan-outs cannot hold every connection of an engine
+# either.
+def _worker_count(wanted: int) -> int:
+    return max(1, min(wanted, DB_POOL_SIZE + DB_MAX_OVERFLOW - 1))
+
+
+_WORKER_SLOTS = threading.BoundedSemaphore(_worker_count(DB_POOL_SIZE + DB_MAX_OVERFLOW))
+_PARALLEL_POOL = ThreadPoolExecutor(
+    max_workers=_worker_count(IN_LIST_PARALLEL), thread_name_prefix="analytics-parallel"
+)
+_SECTION_POOL = ThreadPoolExecutor(
+    max_workers=_worker_count(SECTION_PARALLEL), thread_name_prefix="analytics-section"
+)
+_CALL_WORKERS = _worker_count(GATHER_PARALLEL)
+_CALL_POOL = ThreadPoolExecutor(max_workers=_CALL_WORKERS, thread_name_prefix="analytics-call")
+
+
+def request_deadline() -> float | None:
+    ctx = current_context()
+    if ctx is None or REQUEST_DEADLINE_SECONDS <= 0:
+        return None
+    return ctx.started + REQUEST_DEADLINE_SECONDS
+
+
+def _remaining(deadline: float | None) -> float | None:
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    return remaining
+
+
+def _run_call(fn, args):
+    connections = {}
+    token = _CALL_CONNECTIONS.set(connections)
+    try:
+        return profile_call(fn, *args)
+    finally:
+        _CALL_CONNECTIONS.reset(token)
+        for conn in connections.values():
+            conn.close()
+
+
+# Returns the calling thread's shared connections that no connect() block is
+# using to the pool, before it blocks on other threads' work.
+def _release_idle_connections() -> None:
+    connections = _shared_connections()
+    if not connections:
+        return
+    ident = threading.get_ident()
+    in_use = _THREAD.__dict__.get("in_use", {})
+    for key in list(connections):
+        if key[0] == ident and not in_use.get(key):
+            conn = connections.pop(key, None)
+            if conn is not None:
+                conn.close()
+
+
+def _submit(pool: ThreadPoolExecutor, fn, args):
+    if not _WORKER_SLOTS.acquire(blocking=False):
+        return None
+    future = pool.submit(contextvars.copy_context().run, _run_call, fn, args)
+    # also runs when the call is cancelled (taken back) before it started
+    future.add_done_callback(lambda _: _WORKER_SLOTS.release())
+    return future
+
+
+# calls: [(fn, *args)]; returns the results in order and raises the first
+# failure in order. The calls after the first are queued on pool as far as the
+# shared worker budget allows while the calling thread runs the first on its
+# own connections; calls over the budget, and any call no worker has started
+# yet, are run by the caller. Before waiting on calls already running, the
+# caller returns its idle shared connections to the pool, so no thread holds a
+# connection while it waits for others. Workers use connections of their own
+# and close them when their call ends. Waiting stops with DeadlineExceeded once
+# the deadline (time.monotonic()) has passed; calls still running then finish
+# on their own.
+def _fan_out(pool: ThreadPoolExecutor, calls: list, deadline: float | None = None) -> list:
+    futures = [_submit(pool, fn, args) for fn, *args in calls[1:]]
+    released = False
+    try:
+        _remaining(deadline)
+        fn, *args = calls[0]
+        results = [fn(*args)]
+        for (fn, *args), future in zip(calls[1:], futures):
+            if future is None or future.cancel():
+                _remaining(deadline)
+                results.append(fn(*args))
+                continue
+            if not released and not future.done():
+                _release_idle_connections()
+                released = True
+            try:
+                results.append(future.result(_remaining(deadline)))
+            except FuturesTimeoutError:
+                raise DeadlineExceeded() from None
+        return results
+    finally:
+        for future in futures:
+            if future is not None:
+                future.cancel()
+
+
+# Runs fn(*args) for every args tuple at once and returns the results in
+# order; the first failure (in order) is raised. Sync callers fan out to the
+# IN_LIST_PARALLEL workers (see _fan_out); inside run_async the calls are
+# gathered on the event loop.
+def run_parallel(fn, arg_list: list[tuple]) -> list:
+    if len(arg_list) <= 1:
+        return [fn(*args) for args in arg_list]
+    with attributed_to(current_helper()):
+        return _run_parallel(fn, arg_list)
+
+
+def _run_parallel(fn, arg_list: list[tuple]) -> list:
+    if _IN_ASYNC_CALL.get():
+        results = await_only(
+            asyncio.gather(*(run_async(fn, *args) for args in arg_list), return_exceptions=True)
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+    return _fan_out(_PARALLEL_POOL, [(fn, *args) for args in arg_list])
+
+
+# Runs the independent no-argument calls of a composite response at once on
+# the SECTION_PARALLEL workers (see _fan_out) and returns {name: result}; the
+# first failure (in order) is raised. Each call shares the request memo.
+def run_sections(calls: dict) -> dict:
+    names = list(calls)
+    if not names:
+        return {}
+    return dict(zip(names, _fan_out(_SECTION_POOL, [(calls[name],) for name in names])))
+
+
+# calls: {name: (fn, *args)} for independent sync helpers; returns {name: result}
+# and raises the first failure in declaration order. They run side by side on
+# the GATHER_PARALLEL workers (see _fan_out); the deadline bounds the wait.
+def run_calls(calls: dict, deadline: float | None = None) -> dict:
+    names = list(calls)
+    if _CALL_WORKERS <= 1 or len(names) <= 1 or _IN_ASYNC_CALL.get():
+        results = {}
+        for name in names:
+            _remaining(deadline)
+            fn, *args = calls[name]
+            results[name] = fn(*args)
+        return results
+    return dict(zip(names, _fan_out(_CALL_POOL, [calls[name] for name in names], deadline)))
+
+
+async def dispose_async_engines() -> None:
+    for async_engine in list(_ASYNC_ENGINES.values()):
+        await async_engine.dispose()
+    _ASYNC_ENGINES.clear()
+    _ASYNC_ENGINE_NAMES.clear()
+
+
+def _pool_status(pool_name: str, pool) -> dict:
+    with _POOL_WAITS_LOCK:
+        waits = dict(_POOL_WAITS.get(pool_name) or _empty_waits())
+    status = {"pool": type(pool).__name__}
+    if hasattr(pool, "checkedout"):
+        # QueuePool reports overflow relative to pool_size (negative while the
+        # pool is still filling up).
+        overflow = pool.overflow()
+        status.update(
+            {
+                "size": pool.size(),
+                "checkedOut": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(0, overflow),
+                "maxOverflow": DB_MAX_OVERFLOW,
+                "timeoutSeconds": pool.timeout(),
+            }
+        )
+    status["waits"] = {
+        "count": waits["count"],
+        "avgMs": round(waits["total"] / waits["count"] * 1000, 2) if waits["count"] else 0,
+        "maxMs": round(waits["max"] * 1000, 2),
+        "totalMs": round(waits["total"] * 1000, 2),
+        "timeouts": waits["timeouts"],
+    }
+    return status
+
+
+def pool_stats() -> dict:
+    stats = {}
+    for engine in ENGINE_NAMES:
+        stats[_pool_name(engine)] = _pool_status(_pool_name(engine), engine.pool)
+    for engine, async_engine in list(_ASYNC_ENGINES.items()):
+        stats[_pool_name(engine, True)] = _pool_status(
+            _pool_name(engine, True), async_engine.sync_engine.pool
+        )
+    return stats
+
+
+def replica_stats() -> dict:
+    stats = {}
+    now = time.monotonic()
+    for primary, replica in REPLICAS.items():
+        checked_at, lag = _REPLICA_LAG.get(replica, (None, None))
+        stats[ENGINE_NAMES[replica]] = {
+            "primary": ENGINE_NAMES[primary],
+            "lagSeconds": lag,
+            "checkedSecondsAgo": round(now - checked_at, 1) if checked_at is not None else None,
+            "maxLagSeconds": REPLICA_MAX_LAG_SECONDS,
+            "serving": lag is not None and lag <= REPLICA_MAX_LAG_SECONDS,
+        }
+    return stats
@@ -0,0 +1,146 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from .config import (
+    DIMENSION_CACHE_MAX_ENTRIES,
+    DIMENSION_CACHE_TTL_SECONDS,
+    DIMENSION_CACHE_TTLS,
+)
+
+
+def _sizeof(value) -> int:
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_sizeof(v) for v in value)
+    return size
+
+
+# Cached values are shared across requests and threads; callers get their own
+# lists and dicts so that changing a result leaves the cache intact.
+def _copy(value):
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+# Rarely changing rows (users, courses, id mappings) shared across requests.
+# Entries expire after the table TTL; past max_entries the least recently used
+# go first. Only rows that exist are cached, so new rows show up immediately.
+class DimensionCache:
+    def __init__(self, name: str, ttl: int, max_entries: int):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        # key -> (expires_at, value), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # load(missing_keys) -> {key: value} for the keys that exist; only the
+    # misses are loaded, in one call.
+    def get_many(self, keys, load) -> dict:
+        keys = list(dict.fromkeys(keys))
+        if self.ttl <= 0:
+            return load(keys) if keys else {}
+        found = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[1]
+                else:
+                    missing.append(key)
+            self.hits += len(found)
+            self.misses += len(missing)
+        if missing:
+            loaded = load(missing)
+            self.put_many(loaded)
+            found.update(loaded)
+        return {key: _copy(value) for key, value in found.items()}
+
+    # load(key) -> value, or None when the row does not exist
+    def get(self, key, load):
+        loaded = self.get_many(
+            [key], lambda keys: {k: v for k in keys if (v := load(k)) is not None}
+        )
+        return loaded.get(key)
+
+    def put_many(self, values: dict) -> None:
+        if self.ttl <= 0 or not values:
+            return
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in values.items():
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys=None) -> int:
+        with self._lock:
+            if keys is None:
+                count = len(self._entries)
+                self._entries.clear()
+                return count
+            return sum(self._entries.pop(key, None) is not None for key in keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = list(self._entries.items())
+            hits, misses, evictions = self.hits, self.misses, self.evictions
+        lookups = hits + misses
+        return {
+            "entries": len(entries),
+            "maxEntries": self.max_entries,
+            "ttlSeconds": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "hitRatio": round(hits / lookups, 3) if lookups else 0,
+            "evictions": evictions,
+            "approxBytes": sum(_sizeof(key) + _sizeof(value) for key, (_, value) in entries),
+        }
+
+
+_CACHES: dict[str, DimensionCache] = {}
+
+
+def dimension_cache(name: str) -> DimensionCache:
+    cache = _CACHES.get(name)
+    if cache is None:
+        cache = _CACHES[name] = DimensionCache(
+            name,
+            DIMENSION_CACHE_TTLS.get(name, DIMENSION_CACHE_TTL_SECONDS),
+            DIMENSION_CACHE_MAX_ENTRIES,
+        )
+    return cache
+
+
+def invalidate_dimensions(name: str | None = None, keys=None) -> dict:
+    if name is None:
+        caches = list(_CACHES.values())
+    else:
+        caches = [_CACHES[name]] if name in _CACHES else []
+    return {cache.name: cache.invalidate(keys) for cache in caches}
+
+
+def dimension_stats() -> dict:
+    stats = {name: cache.stats() for name, cache in sorted(_CACHES.items())}
+    hits = sum(s["hits"] for s in stats.values())
+    lookups = hits + sum(s["misses"] for s in stats.values())
+    return {
+        "hitRatio": round(hits / lookups, 3) if lookups else 0,
+        "approxBytes": sum(s["approxBytes"] for s in stats.values()),
+        "tables": stats,
+    }
@@ -1,20 +1,142 @@
-import json
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from .compression import cached_compressed, choose_encoding, compress, encoded_etag
+from .config import COMPRESSION_MIN_BYTES, FRESH_ENDPOINTS, METRICS_ENABLED, SESSIONIZATION_MODE
+from .db import MOODLE_ENGINE, dispose_async_engines, fresh_reads, window_functions_supported
+from .metrics import observe_request
+from .profiling import profile_allowed, profile_report, profile_requested, profiled_block, profiling
+from .request_context import request_context
+from .server_timing import collect_timings, server_timing_header, span, timing_requested
+from .responses import VARY, AnalyticsJSONResponse, etag_matches, json_format, wants_pretty
 from .controllers.student import router as student_router
 from .controllers.teacher import router as teacher_router
 from .controllers.mentor import router as mentor_router
 from .controllers.admin import router as admin_router
 from .controllers.investor import router as investor_router
+from .controllers.internal import router as internal_router
 
-class PrettyJSONResponse(JSONResponse):
-    def render(self, content) -> bytes:
-        return json.dumps(content, ensure_ascii=False, indent=2).encode("utf-8")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if SESSIONIZATION_MODE == "sql":
+        await run_in_threadpool(window_functions_supported, MOODLE_ENGINE)
+    yield
+    await dispose_async_engines()
 
 
-app = FastAPI(title="Founders Academy Analytics", default_response_class=PrettyJSONResponse)
+app = FastAPI(
+    title="Founders Academy Analytics",
+    default_response_class=AnalyticsJSONResponse,
+    lifespan=lifespan,
+)
 app.include_router(student_router)
 app.include_router(teacher_router)
 app.include_router(mentor_router)
 app.include_router(admin_router)
 app.include_router(investor_router)
+app.include_router(internal_router)
+
+
+@app.middleware("http")
+async def route_fresh_endpoints(request: Request, call_next):
+    endpoint = request.url.path.rstrip("/").rsplit("/", 1)[-1]
+    if endpoint in FRESH_ENDPOINTS:
+        with fresh_reads():
+            return await call_next(request)
+    return await call_next(request)
+
+
+# JSON responses of at least COMPRESSION_MIN_BYTES are sent br/gzip encoded
+# when the client accepts it. Runs inside conditional_get, which compares
+# If-None-Match against the encoded ETag.
+@app.middleware("http")
+async def compress_response(request: Request, call_next):
+    response = await call_next(request)
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    if (
+        encoding is None
+        or response.status_code != 200
+        or "content-encoding" in response.headers
+        or not response.headers.get("content-type", "").startswith("application/json")
+        or int(response.headers.get("content-length", 0)) < COMPRESSION_MIN_BYTES
+    ):
+        return response
+    etag = response.headers.get("etag")
+    body = cached_compressed(etag, encoding)
+    if body is None:
+        raw = b"".join([chunk async for chunk in response.body_iterator])
+        with span("compress"):
+            body = await run_in_threadpool(compress, raw, encoding, etag)
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    headers["content-encoding"] = encoding
+    headers["vary"] = VARY
+    if etag:
+        headers["etag"] = encoded_etag(etag, encoding)
+    return Response(content=body, status_code=200, headers=headers)
+
+
+# Every 200 JSON response carries a strong ETag; a matching If-None-Match
+# gets an empty 304 instead of the body.
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    response = await call_next(request)
+    etag = response.headers.get("etag")
+    if (
+        request.method == "GET"
+        and response.status_code == 200
+        and etag
+        and etag_matches(request.headers.get("if-none-match"), etag)
+    ):
+        return Response(status_code=304, headers={"ETag": etag, "Vary": VARY})
+    return response
+
+
+# ?profile=1 (when PROFILING_ENABLED): the request runs under cProfile, bypassing
+# the response cache and coalescing, and the response is the profile report
+# with the request's SQL log. The event loop thread is profiled too, so its
+# part of the report includes other requests served meanwhile.
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    if not profile_requested(request):
+        return await call_next(request)
+    if not profile_allowed(request):
+        return AnalyticsJSONResponse({"detail": "Profiling not allowed"}, status_code=403)
+    started = time.perf_counter()
+    with profiling() as session:
+        with profiled_block():
+            response = await call_next(request)
+            async for _ in response.body_iterator:
+                pass
+    report = await run_in_threadpool(
+        profile_report, session, request.url.path, response.status_code, time.perf_counter() - started
+    )
+    return AnalyticsJSONResponse(report, headers={"Cache-Control": "no-store"})
+
+
+# Registered last so it wraps every other middleware.
+@app.middleware("http")
+async def scope_request(request: Request, call_next):
+    started = time.perf_counter()
+    endpoint = request.url.path.rstrip("/").rsplit("/", 1)[-1]
+    with (
+        request_context() as ctx,
+        json_format(endpoint, wants_pretty(request)),
+        collect_timings(timing_requested(request)) as timings,
+    ):
+        response = await call_next(request)
+    response.headers["X-Query-Count"] = str(ctx.query_count)
+    if timings is not None:
+        response.headers["Server-Timing"] = server_timing_header(
+            timings, time.perf_counter() - started
+        )
+    if METRICS_ENABLED:
+        # Unrouted paths share one label so they cannot grow the series count.
+        route = request.scope.get("route")
+        observe_request(
+            route.path if route is not None else "unmatched",
+            response.status_code,
+            time.perf_counter() - started,
+        )
+    return response
@@ -0,0 +1,222 @@
+import os
+import sys
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Prometheus metrics kept in process and rendered in the text exposition
+# format by /analytics/_metrics. Each worker process reports its own values.
+
+QUERY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+# Frames that run queries on behalf of a helper; the helper is the first frame
+# above them.
+_PLUMBING_FILES = {
+    os.path.join(_APP_DIR, name)
+    for name in ("db.py", "metrics.py", "request_context.py", "dimension_cache.py")
+}
+_PLUMBING_FUNCTIONS = {
+    "_safe_fetch",
+    "_safe_fetch_rows",
+    "_fetch_id_chunk",
+    "_fetch_id_table",
+    "_fetch_by_ids",
+    "_gather_calls",
+    "wrapper",
+}
+# id(code object) -> helper label or None; hashing code objects themselves is
+# slow (they hash by value).
+_LABELS: dict = {}
+_CODES: list = []
+_MISSING = object()
+# Helper that fanned work out to other threads, whose stacks do not show it.
+_CALLER: ContextVar[str] = ContextVar("_QUERY_CALLER", default="unknown")
+
+_LOCK = threading.Lock()
+# (helper, engine) -> [bucket counts..., +Inf count, sum]
+_QUERY_SECONDS: dict = {}
+# (helper, engine) -> count
+_QUERY_ROWS: dict = {}
+_QUERY_ERRORS: dict = {}
+_SWALLOWED_ERRORS: dict = {}
+# (endpoint, status) -> [bucket counts..., +Inf count, sum]
+_REQUEST_SECONDS: dict = {}
+
+
+def _label_for(code) -> str | None:
+    filename = os.path.abspath(code.co_filename)
+    if (
+        not filename.startswith(_APP_DIR)
+        or filename in _PLUMBING_FILES
+        or code.co_name in _PLUMBING_FUNCTIONS
+        or code.co_name.startswith("<")
+    ):
+        return None
+    return code.co_name
+
+
+# Name of the innermost app function (outside the query plumbing) on the
+# calling stack; decided once per code object.
+def current_helper() -> str:
+    labels = _LABELS
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        label = labels.get(id(code), _MISSING)
+        if label is _MISSING:
+            label = _label_for(code)
+            # The code object is kept so its id is never reused.
+            labels[id(code)] = label
+            _CODES.append(code)
+        if label:
+            return label
+        frame = frame.f_back
+    return _CALLER.get()
+
+
+@contextmanager
+def attributed_to(helper: str):
+    token = _CALLER.set(helper)
+    try:
+        yield
+    finally:
+        _CALLER.reset(token)
+
+
+def _observe(histograms: dict, key, buckets: tuple, seconds: float) -> None:
+    values = histograms.get(key)
+    if values is None:
+        values = histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+    values[bisect_left(buckets, seconds)] += 1
+    values[-1] += seconds
+
+
+def observe_query(helper: str, engine: str, seconds: float, rows: int) -> None:
+    key = (helper, engine)
+    with _LOCK:
+        _observe(_QUERY_SECONDS, key, QUERY_BUCKETS, seconds)
+        _QUERY_ROWS[key] = _QUERY_ROWS.get(key, 0) + rows
+
+
+def count_query_error(helper: str, engine: str) -> None:
+    key = (helper, engine)
+    with _LOCK:
+        _QUERY_ERRORS[key] = _QUERY_ERRORS.get(key, 0) + 1
+
+
+# For handlers that turn a failed query into an empty result.
+def count_swallowed_error() -> None:
+    helper = current_helper()
+    with _LOCK:
+        _SWALLOWED_ERRORS[helper] = _SWALLOWED_ERRORS.get(helper, 0) + 1
+
+
+def observe_request(endpoint: str, status: int, seconds: float) -> None:
+    with _LOCK:
+        _observe(_REQUEST_SECONDS, (endpoint, str(status)), REQUEST_BUCKETS, seconds)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _family(lines: list, name: str, kind: str, help_text: str) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _samples(lines: list, name: str, names: tuple, values: dict) -> None:
+    for key, value in sorted(values.items()):
+        key = key if isinstance(key, tuple) else (key,)
+        lines.append(f"{name}{{{_labels(names, key)}}} {value}")
+
+
+def _histogram(lines: list, name: str, names: tuple, buckets: tuple, histograms: dict) -> None:
+    for key, values in sorted(histograms.items()):
+        labels = _labels(names, key)
+        cumulative = 0
+        for bound, count in zip(buckets + ("+Inf",), values):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {values[-1]:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+
+def _copy(values: dict) -> dict:
+    return {key: list(v) if isinstance(v, list) else v for key, v in values.items()}
+
+
+# serialization: responses.serialization_stats(); compression:
+# compression.compression_stats().
+def render_metrics(serialization: dict, compression: dict) -> str:
+    with _LOCK:
+        query_seconds = _copy(_QUERY_SECONDS)
+        rows = dict(_QUERY_ROWS)
+        errors = dict(_QUERY_ERRORS)
+        swallowed = dict(_SWALLOWED_ERRORS)
+        request_seconds = _copy(_REQUEST_SECONDS)
+    query_labels = ("helper", "engine")
+    queries = {key: sum(values[:-1]) for key, values in query_seconds.items()}
+    lines = []
+    _family(lines, "analytics_query_duration_seconds", "histogram", "SQL statement time per helper.")
+    _histogram(lines, "analytics_query_duration_seconds", query_labels, QUERY_BUCKETS, query_seconds)
+    _family(lines, "analytics_queries_total", "counter", "SQL statements per helper.")
+    _samples(lines, "analytics_queries_total", query_labels, queries)
+    _family(lines, "analytics_query_rows_total", "counter", "Rows reported by the driver per helper.")
+    _samples(lines, "analytics_query_rows_total", query_labels, rows)
+    _family(lines, "analytics_query_errors_total", "counter", "Failed SQL statements per helper.")
+    _samples(lines, "analytics_query_errors_total", query_labels, errors)
+    _family(
+        lines,
+        "analytics_swallowed_errors_total",
+        "counter",
+        "Query errors turned into empty results per helper.",
+    )
+    _samples(lines, "analytics_swallowed_errors_total", ("helper",), swallowed)
+    _family(lines, "analytics_request_duration_seconds", "histogram", "Request latency per endpoint.")
+    _histogram(
+        lines, "analytics_request_duration_seconds", ("endpoint", "status"), REQUEST_BUCKETS, request_seconds
+    )
+    _family(lines, "analytics_serialized_responses_total", "counter", "JSON bodies rendered per endpoint.")
+    _samples(
+        lines,
+        "analytics_serialized_responses_total",
+        ("endpoint",),
+        {endpoint: stats["count"] for endpoint, stats in serialization.items()},
+    )
+    _family(lines, "analytics_serialized_bytes_total", "counter", "JSON bytes rendered per endpoint.")
+    _samples(
+        lines,
+        "analytics_serialized_bytes_total",
+        ("endpoint",),
+        {endpoint: stats["bytes"] for endpoint, stats in serialization.items()},
+    )
+    _family(lines, "analytics_serialization_seconds_total", "counter", "JSON rendering time per endpoint.")
+    _samples(
+        lines,
+        "analytics_serialization_seconds_total",
+        ("endpoint",),
+        {endpoint: round(stats["totalMs"] / 1000, 6) for endpoint, stats in serialization.items()},
+    )
+    _family(lines, "analytics_compression_total", "counter", "Compressed bodies by outcome.")
+    _samples(
+        lines,
+        "analytics_compression_total",
+        ("result",),
+        {"hit": compression["hits"], "miss": compression["misses"]},
+    )
+    _family(lines, "analytics_compression_bytes_total", "counter", "Bytes before and after compression.")
+    _samples(
+        lines,
+        "analytics_compression_bytes_total",
+        ("direction",),
+        {"in": compression["bytesIn"], "out": compression["bytesOut"]},
+    )
+    return "\n".join(lines) + "\n"
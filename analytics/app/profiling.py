@@ -0,0 +1,161 @@
+import cProfile
+import hmac
+import io
+import itertools
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import orjson
+from fastapi import Request
+
+from .config import PROFILE_DIR, PROFILE_TOKEN, PROFILE_TOP_FUNCTIONS, PROFILING_ENABLED
+
+_SQL_CHARS = 500
+_PARAM_CHARS = 200
+_SAVED = itertools.count(1)
+
+
+# Profiles and SQL statements of one profiled request. Every thread that
+# works for the request adds its own cProfile run.
+class _Session:
+    def __init__(self):
+        self.profiles = []
+        self.queries = []
+        self.lock = threading.Lock()
+
+
+_SESSION: ContextVar[_Session | None] = ContextVar("_PROFILE_SESSION", default=None)
+_THREAD = threading.local()
+
+
+def profile_requested(request: Request) -> bool:
+    return PROFILING_ENABLED and request.query_params.get("profile", "").lower() in ("1", "true", "yes")
+
+
+def profile_allowed(request: Request) -> bool:
+    sent = request.headers.get("x-profile-token", "").encode()
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(sent, PROFILE_TOKEN.encode())
+
+
+def profiling_active() -> bool:
+    return _SESSION.get() is not None
+
+
+@contextmanager
+def profiling():
+    session = _Session()
+    token = _SESSION.set(session)
+    try:
+        yield session
+    finally:
+        _SESSION.reset(token)
+
+
+# Runs fn(*args) under cProfile when the current request is profiled. Used
+# where request work enters a thread (service threads and the worker pools);
+# a thread already profiling runs fn as is.
+def profile_call(fn, *args):
+    session = _SESSION.get()
+    if session is None or getattr(_THREAD, "active", False):
+        return fn(*args)
+    profile = cProfile.Profile()
+    _THREAD.active = True
+    try:
+        return profile.runcall(fn, *args)
+    finally:
+        _THREAD.active = False
+        with session.lock:
+            session.profiles.append(profile)
+
+
+# For the event loop thread in async mode; it also runs other requests'
+# coroutines while this one waits.
+@contextmanager
+def profiled_block():
+    session = _SESSION.get()
+    if session is None or getattr(_THREAD, "active", False):
+        yield
+        return
+    profile = cProfile.Profile()
+    _THREAD.active = True
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        _THREAD.active = False
+        with session.lock:
+            session.profiles.append(profile)
+
+
+def log_query(helper: str, engine: str, statement: str, parameters, seconds: float, rows: int) -> None:
+    session = _SESSION.get()
+    if session is None:
+        return
+    entry = {
+        "helper": helper,
+        "engine": engine,
+        "ms": round(seconds * 1000, 3),
+        "rows": rows,
+        "sql": re.sub(r"\s+", " ", statement).strip()[:_SQL_CHARS],
+        "params": repr(parameters)[:_PARAM_CHARS],
+    }
+    with session.lock:
+        session.queries.append(entry)
+
+
+def _stats(session: _Session) -> pstats.Stats | None:
+    with session.lock:
+        profiles = list(session.profiles)
+    if not profiles:
+        return None
+    stats = pstats.Stats(profiles[0])
+    for profile in profiles[1:]:
+        stats.add(profile)
+    return stats.sort_stats("cumulative")
+
+
+# The report as returned to the client; with PROFILE_DIR set, the pstats dump
+# (.prof, e.g. for snakeviz), the text report and the query log are written
+# there as well and "savedTo" names the files' common prefix.
+def profile_report(session: _Session, endpoint: str, status: int, seconds: float) -> dict:
+    stats = _stats(session)
+    text = ""
+    if stats is not None:
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.print_stats(PROFILE_TOP_FUNCTIONS)
+        text = stream.getvalue()
+    with session.lock:
+        queries = list(session.queries)
+    report = {
+        "endpoint": endpoint,
+        "status": status,
+        "totalMs": round(seconds * 1000, 1),
+        "threads": len(session.profiles),
+        "queryCount": len(queries),
+        "queryMs": round(sum(q["ms"] for q in queries), 1),
+        "queries": queries,
+        "profile": text,
+    }
+    if PROFILE_DIR:
+        report["savedTo"] = _save(report, stats, endpoint)
+    return report
+
+
+def _save(report: dict, stats: pstats.Stats | None, endpoint: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = re.sub(r"[^A-Za-z0-9_-]+", "_", endpoint.strip("/")) or "root"
+    prefix = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_SAVED)}-{name}")
+    if stats is not None:
+        stats.dump_stats(f"{prefix}.prof")
+    with open(f"{prefix}.txt", "w", encoding="utf-8") as f:
+        f.write(report["profile"])
+    with open(f"{prefix}.queries.json", "wb") as f:
+        f.write(orjson.dumps(report["queries"], option=orjson.OPT_INDENT_2))
+    return prefix
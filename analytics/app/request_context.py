@@ -0,0 +1,71 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class RequestContext:
+    def __init__(self):
+        # (thread id, routed engine) -> Connection reused by the sync helpers
+        # of the request; helpers fanned out to worker threads get their own.
+        self.connections = {}
+        self.memo = {}
+        self.query_count = 0
+        self.memo_hits = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def count_query(self, count: int = 1) -> None:
+        with self._lock:
+            self.query_count += count
+
+    def release_connections(self) -> None:
+        connections, self.connections = self.connections, {}
+        for conn in connections.values():
+            conn.close()
+
+
+_CURRENT: ContextVar[RequestContext | None] = ContextVar("_CURRENT_REQUEST", default=None)
+
+
+def current_context() -> RequestContext | None:
+    return _CURRENT.get()
+
+
+@contextmanager
+def request_context():
+    ctx = RequestContext()
+    token = _CURRENT.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _CURRENT.reset(token)
+        ctx.release_connections()
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+# Helper results are cached per request by arguments, so repeated lookups in
+# one request run a single query. Outside a request the helper runs as is.
+def memoized(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        ctx = _CURRENT.get()
+        if ctx is None:
+            return fn(*args, **kwargs)
+        key = (fn.__qualname__, _freeze(args), _freeze(kwargs))
+        if key in ctx.memo:
+            ctx.memo_hits += 1
+            return ctx.memo[key]
+        result = fn(*args, **kwargs)
+        ctx.memo[key] = result
+        return result
+
+    return wrapper
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from .cache_backends import BACKEND_ERRORS, create_backend
+from .config import (
+    FRESH_ENDPOINTS,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_PREFIX,
+    RESPONSE_CACHE_STALE_SECONDS,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_TTLS,
+    RESPONSE_CACHE_URL,
+)
+from .request_context import request_context
+from .responses import etag_for, render_json, rendered_json_response
+
+# Entries are a JSON header line {"storedAt": epoch seconds, "etag": ...}
+# followed by the rendered response body, kept in the backend for TTL + stale
+# seconds so any worker can serve them without re-serializing.
+_BACKEND = create_backend(RESPONSE_CACHE_URL, RESPONSE_CACHE_MAX_ENTRIES)
+# A refresh takes this lock key so only one worker recomputes a stale entry.
+_REFRESH_LOCK_SECONDS = 60
+_REFRESHING: set = set()
+_TASKS: set = set()
+_STATS = {
+    "hits": 0,
+    "staleHits": 0,
+    "misses": 0,
+    "refreshes": 0,
+    "refreshErrors": 0,
+    "backendErrors": 0,
+}
+_LAST_ERRORS: dict = {}
+
+
+def endpoint_ttl(endpoint: str) -> int:
+    return RESPONSE_CACHE_TTLS.get(endpoint, RESPONSE_CACHE_TTL_SECONDS)
+
+
+def _param_key(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return value
+
+
+def _cache_key(endpoint: str, params: tuple) -> str:
+    return f"{RESPONSE_CACHE_PREFIX}{endpoint}:" + json.dumps(
+        [_param_key(p) for p in params], separators=(",", ":"), default=str
+    )
+
+
+async def _call_backend(method: str, *args):
+    fn = getattr(_BACKEND, method)
+    try:
+        if _BACKEND.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+    except BACKEND_ERRORS as exc:
+        _STATS["backendErrors"] += 1
+        _LAST_ERRORS["backend"] = repr(exc)
+        return None
+
+
+async def _load(key: str):
+    raw = await _call_backend("get", key)
+    if raw is None:
+        return None
+    head, _, body = raw.partition(b"\n")
+    header = json.loads(head)
+    return header["storedAt"], header["etag"], body
+
+
+async def _store(endpoint: str, key: str, payload) -> tuple[bytes, str]:
+    body = render_json(jsonable_encoder(payload))
+    etag = etag_for(body)
+    head = json.dumps({"storedAt": time.time(), "etag": etag}, separators=(",", ":"))
+    await _call_backend(
+        "set", key, head.encode() + b"\n" + body, endpoint_ttl(endpoint) + RESPONSE_CACHE_STALE_SECONDS
+    )
+    return body, etag
+
+
+async def _refresh(endpoint: str, key: str, compute) -> None:
+    lock_key = f"{key}:refresh"
+    try:
+        if not await _call_backend("add", lock_key, b"1", _REFRESH_LOCK_SECONDS):
+            return
+        try:
+            # The refresh outlives the request that triggered it.
+            with request_context():
+                payload = await compute()
+        except Exception as exc:
+            _STATS["refreshErrors"] += 1
+            _LAST_ERRORS[endpoint] = repr(exc)
+        else:
+            _STATS["refreshes"] += 1
+            await _store(endpoint, key, payload)
+        await _call_backend("delete", lock_key)
+    finally:
+        _REFRESHING.discard(key)
+
+
+# compute: no-argument coroutine function building the payload. Endpoints in
+# FRESH_ENDPOINTS are never cached (the payload is returned as is); otherwise
+# the result is a ready Response with the stored body and its ETag.
+async def cached(endpoint: str, params: tuple, compute):
+    ttl = endpoint_ttl(endpoint)
+    if ttl <= 0 or endpoint in FRESH_ENDPOINTS:
+        return await compute()
+    key = _cache_key(endpoint, params)
+    entry = await _load(key)
+    if entry is not None:
+        stored_at, etag, body = entry
+        age = time.time() - stored_at
+        if age < ttl:
+            _STATS["hits"] += 1
+            return rendered_json_response(body, etag)
+        if age < ttl + RESPONSE_CACHE_STALE_SECONDS:
+            _STATS["staleHits"] += 1
+            if key not in _REFRESHING:
+                _REFRESHING.add(key)
+                task = asyncio.create_task(_refresh(endpoint, key, compute))
+                _TASKS.add(task)
+                task.add_done_callback(_TASKS.discard)
+            return rendered_json_response(body, etag)
+    _STATS["misses"] += 1
+    body, etag = await _store(endpoint, key, await compute())
+    return rendered_json_response(body, etag)
+
+
+async def invalidate(endpoint: str | None = None) -> int:
+    prefix = f"{RESPONSE_CACHE_PREFIX}{endpoint}:" if endpoint else RESPONSE_CACHE_PREFIX
+    return await _call_backend("clear", prefix) or 0
+
+
+async def cache_stats() -> dict:
+    served = _STATS["hits"] + _STATS["staleHits"] + _STATS["misses"]
+    return {
+        **_STATS,
+        "hitRatio": round((_STATS["hits"] + _STATS["staleHits"]) / served, 3) if served else 0,
+        "backend": _BACKEND.name,
+        "entries": await _call_backend("size", RESPONSE_CACHE_PREFIX),
+        "refreshing": len(_REFRESHING),
+        "ttlSeconds": {**RESPONSE_CACHE_TTLS, "default": RESPONSE_CACHE_TTL_SECONDS},
+        "staleSeconds": RESPONSE_CACHE_STALE_SECONDS,
+        "lastErrors": dict(_LAST_ERRORS),
+    }
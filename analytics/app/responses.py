@@ -0,0 +1,110 @@
+import hashlib
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import orjson
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from .server_timing import add_span
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+# (endpoint, pretty) of the current request, set by the middleware in main.py.
+_FORMAT: ContextVar[tuple[str | None, bool]] = ContextVar("json_format", default=(None, False))
+# Representations differ by pretty output and content coding.
+VARY = "Accept, Accept-Encoding"
+# endpoint -> serialization counters
+_STATS: dict = {}
+
+
+# Pretty output is opt-in: ?pretty=1 or a "pretty=1" parameter on the Accept
+# media type, e.g. "Accept: application/json; pretty=1".
+def wants_pretty(request: Request) -> bool:
+    if request.query_params.get("pretty", "").lower() in ("1", "true", "yes"):
+        return True
+    for media_type in request.headers.get("accept", "").split(","):
+        params = [p.strip().lower() for p in media_type.split(";")[1:]]
+        if "pretty=1" in params or "pretty=true" in params:
+            return True
+    return False
+
+
+@contextmanager
+def json_format(endpoint: str, pretty: bool):
+    token = _FORMAT.set((endpoint, pretty))
+    try:
+        yield
+    finally:
+        _FORMAT.reset(token)
+
+
+def pretty_requested() -> bool:
+    return _FORMAT.get()[1]
+
+
+def _record(seconds: float, size: int) -> None:
+    add_span("json", seconds)
+    endpoint = _FORMAT.get()[0]
+    if endpoint is None:
+        return
+    stats = _STATS.setdefault(endpoint, {"count": 0, "bytes": 0, "totalMs": 0.0, "maxMs": 0.0})
+    ms = seconds * 1000
+    stats["count"] += 1
+    stats["bytes"] += size
+    stats["totalMs"] += ms
+    stats["maxMs"] = max(stats["maxMs"], ms)
+
+
+def render_json(content, pretty: bool = False) -> bytes:
+    start = time.perf_counter()
+    body = orjson.dumps(content, option=(_OPTIONS | orjson.OPT_INDENT_2) if pretty else _OPTIONS)
+    _record(time.perf_counter() - start, len(body))
+    return body
+
+
+def serialization_stats() -> dict:
+    return {
+        endpoint: {
+            **stats,
+            "totalMs": round(stats["totalMs"], 3),
+            "maxMs": round(stats["maxMs"], 3),
+            "avgMs": round(stats["totalMs"] / stats["count"], 3),
+        }
+        for endpoint, stats in sorted(_STATS.items())
+    }
+
+
+# Strong validator: hash of the exact response bytes.
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+# Compact JSON unless the request asked for pretty output.
+class AnalyticsJSONResponse(JSONResponse):
+    def __init__(self, content, *args, **kwargs):
+        super().__init__(content, *args, **kwargs)
+        self.headers["vary"] = VARY
+        if self.status_code == 200:
+            self.headers.setdefault("etag", etag_for(self.body))
+
+    def render(self, content) -> bytes:
+        return render_json(content, pretty_requested())
+
+
+# A compact body rendered earlier (e.g. by the response cache), sent as is
+# unless pretty output was asked for.
+def rendered_json_response(body: bytes, etag: str) -> Response:
+    if pretty_requested():
+        body = render_json(orjson.loads(body), pretty=True)
+        etag = etag_for(body)
+    return Response(
+        content=body, media_type="application/json", headers={"ETag": etag, "Vary": VARY}
+    )
@@ -0,0 +1,375 @@
+import argparse
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from .config import (
+    MOODLE_DB_PREFIX,
+    ROLLUP_MAX_LAG_SECONDS,
+    ROLLUP_STATE_CHECK_SECONDS,
+    ROLLUP_BATCH_SIZE,
+    ROLLUP_CONCURRENCY_DAYS,
+    ROLLUP_SETTLE_SECONDS,
+)
+from .db import MOODLE_ENGINE, ROLLUP_ENGINE, connect
+
+DAY_SECONDS = 86400
+SLOT_SECONDS = 300
+
+# events, first and last timestamp per UTC day, course and user
+DAILY_TABLE = "log_daily_user"
+# users seen per 5-minute slot, kept for the last ROLLUP_CONCURRENCY_DAYS
+CONCURRENCY_TABLE = "log_concurrency_5m"
+STATE_TABLE = "rollup_state"
+_STATE_NAME = "logstore"
+
+
+def day_key(day: int) -> str:
+    return (date(1970, 1, 1) + timedelta(days=day)).strftime("%Y-%m-%d")
+
+
+def _create_tables(conn) -> None:
+    existing = set(inspect(conn).get_table_names())
+    if DAILY_TABLE not in existing:
+        conn.execute(
+            text(
+                f"""
+                CREATE TABLE {DAILY_TABLE} (
+                  day INT NOT NULL,
+                  courseid BIGINT NOT NULL,
+                  userid BIGINT NOT NULL,
+                  events INT NOT NULL,
+                  first_ts BIGINT NOT NULL,
+                  last_ts BIGINT NOT NULL,
+                  PRIMARY KEY (day, courseid, userid)
+                )
+                """
+            )
+        )
+        conn.execute(
+            text(
+                f"CREATE INDEX ix_{DAILY_TABLE}_user ON {DAILY_TABLE} (userid, courseid, last_ts)"
+            )
+        )
+    if CONCURRENCY_TABLE not in existing:
+        conn.execute(
+            text(
+                f"""
+                CREATE TABLE {CONCURRENCY_TABLE} (
+                  slot BIGINT NOT NULL,
+                  userid BIGINT NOT NULL,
+                  PRIMARY KEY (slot, userid)
+                )
+                """
+            )
+        )
+    if STATE_TABLE not in existing:
+        conn.execute(
+            text(
+                f"""
+                CREATE TABLE {STATE_TABLE} (
+                  name VARCHAR(64) NOT NULL PRIMARY KEY,
+                  last_id BIGINT NOT NULL,
+                  covered_from BIGINT NOT NULL,
+                  covered_to BIGINT NOT NULL,
+                  concurrency_from BIGINT NOT NULL,
+                  updated_at BIGINT NOT NULL
+                )
+                """
+            )
+        )
+
+
+# MySQL and SQLite spell upserts differently.
+def _upsert_daily_sql(dialect: str) -> str:
+    insert = f"""
+        INSERT INTO {DAILY_TABLE} (day, courseid, userid, events, first_ts, last_ts)
+        VALUES (:day, :courseid, :userid, :events, :first_ts, :last_ts)
+    """
+    if dialect == "mysql":
+        return insert + """
+        ON DUPLICATE KEY UPDATE
+          events = events + VALUES(events),
+          first_ts = LEAST(first_ts, VALUES(first_ts)),
+          last_ts = GREATEST(last_ts, VALUES(last_ts))
+        """
+    return insert + """
+        ON CONFLICT (day, courseid, userid) DO UPDATE SET
+          events = events + excluded.events,
+          first_ts = MIN(first_ts, excluded.first_ts),
+          last_ts = MAX(last_ts, excluded.last_ts)
+        """
+
+
+def _insert_slots_sql(dialect: str) -> str:
+    ignore = "INSERT IGNORE" if dialect == "mysql" else "INSERT OR IGNORE"
+    return f"{ignore} INTO {CONCURRENCY_TABLE} (slot, userid) VALUES (:slot, :userid)"
+
+
+def _read_state(conn):
+    return conn.execute(
+        text(
+            f"""
+            SELECT last_id, covered_from, covered_to, concurrency_from, updated_at
+            FROM {STATE_TABLE}
+            WHERE name = :name
+            """
+        ),
+        {"name": _STATE_NAME},
+    ).mappings().first()
+
+
+def _write_state(conn, state: dict, is_new: bool) -> None:
+    columns = ("last_id", "covered_from", "covered_to", "concurrency_from", "updated_at")
+    params = {"name": _STATE_NAME, **{c: state[c] for c in columns}}
+    if is_new:
+        conn.execute(
+            text(
+                f"""
+                INSERT INTO {STATE_TABLE} (name, {", ".join(columns)})
+                VALUES (:name, {", ".join(f":{c}" for c in columns)})
+                """
+            ),
+            params,
+        )
+        return
+    conn.execute(
+        text(
+            f"""
+            UPDATE {STATE_TABLE}
+            SET {", ".join(f"{c} = :{c}" for c in columns)}
+            WHERE name = :name
+            """
+        ),
+        params,
+    )
+
+
+def _initial_state(src, log_table: str, since_days: int | None, started: int) -> dict:
+    covered_from = 0
+    last_id = 0
+    if since_days:
+        covered_from = (started // DAY_SECONDS - since_days + 1) * DAY_SECONDS
+        first_id = src.execute(
+            text(f"SELECT MIN(id) FROM {log_table} WHERE timecreated >= :ts"),
+            {"ts": covered_from},
+        ).scalar()
+        last_id = int(first_id) - 1 if first_id else None
+    return {
+        "last_id": last_id,
+        "covered_from": covered_from,
+        "covered_to": covered_from,
+        "concurrency_from": covered_from,
+        "updated_at": started,
+    }
+
+
+# Last id the run may fold: the one below the first row written after
+# settled_ts (ids of younger rows may still be committing out of order).
+def _settled_max_id(src, log_table: str, settled_ts: int) -> int:
+    first_unsettled = src.execute(
+        text(f"SELECT MIN(id) FROM {log_table} WHERE timecreated > :ts"),
+        {"ts": settled_ts},
+    ).scalar()
+    if first_unsettled is not None:
+        return int(first_unsettled) - 1
+    return int(src.execute(text(f"SELECT MAX(id) FROM {log_table}")).scalar() or 0)
+
+
+# Folds log rows past the stored id watermark into the rollup tables, one id
+# range per transaction, so an interrupted run resumes where it stopped. Rows
+# written up to ROLLUP_SETTLE_SECONDS before the run started are covered once
+# it finishes.
+def refresh_rollups(
+    since_days: int | None = None,
+    batch_size: int = ROLLUP_BATCH_SIZE,
+    rebuild: bool = False,
+    log=print,
+) -> dict:
+    if ROLLUP_ENGINE is None:
+        raise RuntimeError("ROLLUP_DB_URL is not set")
+    started = int(time.time())
+    settled_ts = started - max(0, ROLLUP_SETTLE_SECONDS)
+    log_table = f"{MOODLE_DB_PREFIX}logstore_standard_log"
+    dialect = ROLLUP_ENGINE.dialect.name
+    horizon = (started - ROLLUP_CONCURRENCY_DAYS * DAY_SECONDS) // SLOT_SECONDS * SLOT_SECONDS
+
+    with ROLLUP_ENGINE.begin() as conn:
+        _create_tables(conn)
+        if rebuild:
+            for table in (DAILY_TABLE, CONCURRENCY_TABLE, STATE_TABLE):
+                conn.execute(text(f"DELETE FROM {table}"))
+        stored = _read_state(conn)
+
+    totals = {"batches": 0, "dailyRows": 0, "slotRows": 0}
+    with MOODLE_ENGINE.connect() as src:
+        max_id = _settled_max_id(src, log_table, settled_ts)
+        is_new = stored is None
+        state = _initial_state(src, log_table, since_days, started) if is_new else dict(stored)
+        if state["last_id"] is None:
+            state["last_id"] = max_id
+        max_id = max(max_id, state["last_id"])
+
+        while True:
+            lo = state["last_id"]
+            hi = min(lo + max(1, batch_size), max_id)
+            daily_rows = []
+            slot_rows = []
+            if hi > lo:
+                daily_rows = src.execute(
+                    text(
+                        f"""
+                        SELECT FLOOR(timecreated / {DAY_SECONDS}) AS day,
+                               COALESCE(courseid, 0) AS courseid,
+                               userid,
+                               COUNT(*) AS events,
+                               MIN(timecreated) AS first_ts,
+                               MAX(timecreated) AS last_ts
+                        FROM {log_table}
+                        WHERE id > :lo AND id <= :hi
+                        GROUP BY day, courseid, userid
+                        """
+                    ),
+                    {"lo": lo, "hi": hi},
+                ).mappings().all()
+                slot_rows = src.execute(
+                    text(
+                        f"""
+                        SELECT DISTINCT FLOOR(timecreated / {SLOT_SECONDS}) * {SLOT_SECONDS} AS slot,
+                               userid
+                        FROM {log_table}
+                        WHERE id > :lo AND id <= :hi AND timecreated >= :horizon
+                        """
+                    ),
+                    {"lo": lo, "hi": hi, "horizon": horizon},
+                ).mappings().all()
+
+            state["last_id"] = hi
+            if hi >= max_id:
+                state["covered_to"] = max(state["covered_to"], settled_ts)
+            elif daily_rows:
+                state["covered_to"] = max(
+                    state["covered_to"], max(int(r["last_ts"]) for r in daily_rows)
+                )
+            state["concurrency_from"] = max(state["covered_from"], horizon)
+            state["updated_at"] = int(time.time())
+
+            with ROLLUP_ENGINE.begin() as conn:
+                if daily_rows:
+                    conn.execute(
+                        text(_upsert_daily_sql(dialect)),
+                        [
+                            {
+                                "day": int(r["day"]),
+                                "courseid": int(r["courseid"]),
+                                "userid": int(r["userid"]),
+                                "events": int(r["events"]),
+                                "first_ts": int(r["first_ts"]),
+                                "last_ts": int(r["last_ts"]),
+                            }
+                            for r in daily_rows
+                        ],
+                    )
+                if slot_rows:
+                    conn.execute(
+                        text(_insert_slots_sql(dialect)),
+                        [{"slot": int(r["slot"]), "userid": int(r["userid"])} for r in slot_rows],
+                    )
+                _write_state(conn, state, is_new)
+            is_new = False
+
+            totals["batches"] += 1
+            totals["dailyRows"] += len(daily_rows)
+            totals["slotRows"] += len(slot_rows)
+            if hi > lo:
+                log(f"ids {lo + 1}-{hi}: {len(daily_rows)} daily rows, {len(slot_rows)} slot rows")
+            if hi >= max_id:
+                break
+
+    with ROLLUP_ENGINE.begin() as conn:
+        conn.execute(text(f"DELETE FROM {CONCURRENCY_TABLE} WHERE slot < :horizon"), {"horizon": horizon})
+    _reset_state_cache()
+    return {**totals, "lastId": state["last_id"], "coveredTo": state["covered_to"]}
+
+
+# (checked_at, state) for the request path; re-read every ROLLUP_STATE_CHECK_SECONDS.
+_STATE_CACHE: tuple[float, dict | None] | None = None
+
+
+def _reset_state_cache() -> None:
+    global _STATE_CACHE
+    _STATE_CACHE = None
+
+
+def rollup_state() -> dict | None:
+    global _STATE_CACHE
+    if ROLLUP_ENGINE is None:
+        return None
+    cached = _STATE_CACHE
+    if cached is not None and time.monotonic() - cached[0] < ROLLUP_STATE_CHECK_SECONDS:
+        return cached[1]
+    try:
+        with connect(ROLLUP_ENGINE) as conn:
+            row = _read_state(conn)
+    except SQLAlchemyError:
+        row = None
+    state = dict(row) if row else None
+    _STATE_CACHE = (time.monotonic(), state)
+    return state
+
+
+# Whether [start_ts, end_ts] (end defaults to now) can be answered from the
+# rollup tables.
+def rollup_covers(start_ts: int, end_ts: int | None = None, table: str = DAILY_TABLE) -> bool:
+    state = rollup_state()
+    if state is None:
+        return False
+    covered_from = state["concurrency_from"] if table == CONCURRENCY_TABLE else state["covered_from"]
+    end_ts = time.time() if end_ts is None else end_ts
+    return covered_from <= start_ts and end_ts <= state["covered_to"] + ROLLUP_MAX_LAG_SECONDS
+
+
+def rollup_stats() -> dict:
+    if ROLLUP_ENGINE is None:
+        return {"configured": False}
+    _reset_state_cache()
+    state = rollup_state()
+    if state is None:
+        return {"configured": True, "serving": False}
+    lag = max(0, int(time.time()) - state["covered_to"])
+    return {
+        "configured": True,
+        "lastId": state["last_id"],
+        "coveredFrom": state["covered_from"],
+        "coveredTo": state["covered_to"],
+        "concurrencyFrom": state["concurrency_from"],
+        "lagSeconds": lag,
+        "maxLagSeconds": ROLLUP_MAX_LAG_SECONDS,
+        "serving": lag <= ROLLUP_MAX_LAG_SECONDS,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.rollups",
+        description="Fold new logstore rows into the rollup tables.",
+    )
+    parser.add_argument(
+        "--since-days",
+        type=int,
+        help="first run only: start from this many days back instead of the whole log",
+    )
+    parser.add_argument("--batch-size", type=int, default=ROLLUP_BATCH_SIZE, help="log ids per transaction")
+    parser.add_argument("--rebuild", action="store_true", help="clear the rollups and start over")
+    args = parser.parse_args(argv)
+    result = refresh_rollups(args.since_days, args.batch_size, args.rebuild)
+    print(
+        f"done: {result['batches']} batches, watermark id {result['lastId']}, "
+        f"covered to {result['coveredTo']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
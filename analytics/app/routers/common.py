@@ -1,10 +1,37 @@
+import asyncio
+import base64
+import binascii
+import itertools
+import json
 from datetime import datetime, timedelta, date
 from fastapi import HTTPException
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 
-from ..db import LMS_ENGINE, MOODLE_ENGINE
-from ..config import MOODLE_DB_PREFIX
+from ..db import (
+    LMS_ENGINE,
+    MOODLE_ENGINE,
+    ROLLUP_ENGINE,
+    DeadlineExceeded,
+    connect,
+    request_deadline,
+    run_async,
+    run_calls,
+    run_parallel,
+    window_functions_supported,
+)
+from ..config import (
+    MOODLE_DB_PREFIX,
+    SESSIONIZATION_MODE,
+    IN_LIST_CHUNK_SIZE,
+    IN_LIST_TEMP_TABLE_MIN,
+)
+from ..dimension_cache import dimension_cache
+from ..metrics import count_swallowed_error
+from ..request_context import memoized
+from ..rollups import DAILY_TABLE, rollup_covers
+from ..server_timing import traced
+from ..sessionization import log_columns, sessionize
 
 
 def _date_keys(days: int) -> list[str]:
@@ -51,6 +78,15 @@ def _safe_fetch(conn, sql: str, params: dict):
     try:
         return conn.execute(text(sql), params).mappings().all()
     except SQLAlchemyError:
+        count_swallowed_error()
+        return []
+
+
+def _safe_fetch_rows(conn, sql: str, params: dict):
+    try:
+        return conn.execute(text(sql), params).all()
+    except SQLAlchemyError:
+        count_swallowed_error()
         return []
 
 
@@ -64,17 +100,205 @@ def _in_params(values, prefix: str):
     return ", ".join(placeholders), params
 
 
-def _get_lms_user_id(moodle_user_id: int) -> str:
-    with LMS_ENGINE.connect() as conn:
+# Opaque keyset cursors: the sort key of the last row of a page, tagged with
+# the list it belongs to.
+def _encode_cursor(kind: str, key) -> str:
+    raw = json.dumps([kind, *key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(kind: str, cursor: str | None, size: int) -> list | None:
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        values = None
+    if (
+        not isinstance(values, list)
+        or len(values) != size + 1
+        or values[0] != kind
+        or not all(isinstance(v, int) for v in values[1:])
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values[1:]
+
+
+def _fetch_id_chunk(engine, sql: str, params: dict, ids: list, safe: bool):
+    in_ids, params_ids = _in_params(ids, "id")
+    query = sql.replace("{ids}", in_ids)
+    with connect(engine) as conn:
+        if safe:
+            return _safe_fetch(conn, query, {**params, **params_ids})
+        return conn.execute(text(query), {**params, **params_ids}).mappings().all()
+
+
+_TEMP_TABLE_IDS = itertools.count(1)
+
+
+def _fetch_id_table(engine, sql: str, params: dict, ids: list, safe: bool):
+    table = f"tmp_in_ids_{next(_TEMP_TABLE_IDS)}"
+    with connect(engine) as conn:
+        try:
+            conn.execute(text(f"CREATE TEMPORARY TABLE {table} (id BIGINT PRIMARY KEY)"))
+            try:
+                conn.execute(
+                    text(f"INSERT INTO {table} (id) VALUES (:id)"), [{"id": i} for i in ids]
+                )
+                query = sql.replace("{ids}", f"SELECT id FROM {table}")
+                return conn.execute(text(query), params).mappings().all()
+            finally:
+                conn.execute(text(f"DROP TABLE {table}"))
+        except SQLAlchemyError:
+            if safe:
+                count_swallowed_error()
+                return []
+            raise
+
+
+# sql marks where the id list goes with an "{ids}" slot, e.g. "userid IN ({ids})".
+# Large lists run as disjoint chunks in parallel, or through a temporary table
+# from IN_LIST_TEMP_TABLE_MIN ids on; the rows of every chunk come back together.
+# Queries grouped by the id need no merging, others go through _merge_rows.
+def _fetch_by_ids(engine, sql: str, params: dict, ids, safe: bool = True) -> list:
+    ids = sorted(set(ids))
+    if not ids:
+        return []
+    if (
+        IN_LIST_TEMP_TABLE_MIN
+        and len(ids) >= IN_LIST_TEMP_TABLE_MIN
+        and all(isinstance(i, int) for i in ids)
+    ):
+        return list(_fetch_id_table(engine, sql, params, ids, safe))
+    size = max(1, IN_LIST_CHUNK_SIZE)
+    chunks = [ids[i : i + size] for i in range(0, len(ids), size)]
+    results = run_parallel(
+        _fetch_id_chunk, [(engine, sql, params, chunk, safe) for chunk in chunks]
+    )
+    return [row for rows in results for row in rows]
+
+
+def _merge_max(a, b):
+    return b if a is None or (b is not None and b > a) else a
+
+
+def _merge_min(a, b):
+    return b if a is None or (b is not None and b < a) else a
+
+
+_MERGES = {
+    "sum": lambda a, b: (a or 0) + (b or 0),
+    "max": _merge_max,
+    "min": _merge_min,
+}
+
+
+# Folds per-chunk partial aggregates: rows sharing the key columns are combined
+# with "sum", "max" or "min" per column. Distinct counts over disjoint id chunks sum.
+@traced
+def _merge_rows(rows, keys: tuple, aggregates: dict) -> list[dict]:
+    merged = {}
+    for r in rows:
+        key = tuple(r[k] for k in keys)
+        current = merged.get(key)
+        if current is None:
+            merged[key] = dict(r)
+            continue
+        for column, how in aggregates.items():
+            current[column] = _MERGES[how](current[column], r[column])
+    return list(merged.values())
+
+
+_LMS_USER_IDS = dimension_cache("lms_user_id")
+_LMS_USERS = dimension_cache("lms_user")
+_MOODLE_USERS = dimension_cache("moodle_user")
+_COURSE_NAMES = dimension_cache("course_name")
+_COURSE_TAGS = dimension_cache("course_tags")
+_COURSE_TEACHERS = dimension_cache("course_teacher")
+_ALL_COURSES = dimension_cache("all_courses")
+
+
+# calls: {name: (helper, *args)} for helpers that do not depend on each other.
+# They run side by side on the GATHER_PARALLEL workers (see db.run_calls).
+def _gather_calls(calls: dict) -> dict:
+    try:
+        return run_calls(calls, request_deadline())
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="Request deadline exceeded") from None
+
+
+async def _gather_calls_async(calls: dict) -> dict:
+    names = list(calls)
+    results = await asyncio.gather(
+        *(run_async(*calls[name]) for name in names), return_exceptions=True
+    )
+    # Raise in declaration order so errors match the sequential path.
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return dict(zip(names, results))
+
+
+# fields= support. field_calls maps every top-level payload key to the calls
+# it reads. Calls that no requested key reads are skipped and their result is
+# taken from `empty`, so payload builders run unchanged; calls without an
+# empty stand-in (existence checks) always run.
+def _plan_calls(calls: dict, field_calls: dict, empty: dict, fields) -> tuple[dict, dict]:
+    if fields is None:
+        return calls, {}
+    unknown = fields - field_calls.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    needed = set()
+    for field in fields:
+        needed.update(field_calls[field])
+    planned = {}
+    skipped = {}
+    for name, call in calls.items():
+        if name in needed or name not in empty:
+            planned[name] = call
+        else:
+            skipped[name] = empty[name]
+    return planned, skipped
+
+
+def _gather_fields(calls: dict, field_calls: dict, empty: dict, fields) -> dict:
+    planned, skipped = _plan_calls(calls, field_calls, empty, fields)
+    return {**skipped, **_gather_calls(planned)}
+
+
+async def _gather_fields_async(calls: dict, field_calls: dict, empty: dict, fields) -> dict:
+    planned, skipped = _plan_calls(calls, field_calls, empty, fields)
+    return {**skipped, **(await _gather_calls_async(planned))}
+
+
+def _pick_fields(payload: dict, fields) -> dict:
+    if fields is None:
+        return payload
+    unknown = fields - payload.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return {key: value for key, value in payload.items() if key in fields}
+
+
+def _load_lms_user_id(moodle_user_id: int):
+    with connect(LMS_ENGINE) as conn:
         row = conn.execute(
             text("SELECT userId FROM account WHERE moodleUserId = :mid LIMIT 1"),
             {"mid": moodle_user_id},
         ).mappings().first()
-    if not row:
+    return row["userId"] if row else None
+
+
+@memoized
+def _get_lms_user_id(moodle_user_id: int) -> str:
+    lms_user_id = _LMS_USER_IDS.get(moodle_user_id, _load_lms_user_id)
+    if lms_user_id is None:
         raise HTTPException(status_code=404, detail="LMS user not found")
-    return row["userId"]
+    return lms_user_id
 
 
+@memoized
 def _get_course_progress(moodle_user_id: int, course_id: int | None = None):
     prefix = MOODLE_DB_PREFIX
     params = {"uid": moodle_user_id}
@@ -83,7 +307,7 @@ def _get_course_progress(moodle_user_id: int, course_id: int | None = None):
         course_filter = " AND c.id = :courseid"
         params["courseid"] = course_id
 
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         course_rows = _safe_fetch(
             conn,
             f"""
@@ -124,9 +348,10 @@ def _get_course_progress(moodle_user_id: int, course_id: int | None = None):
     return result
 
 
+@memoized
 def _get_continue_learning(moodle_user_id: int):
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             f"""
@@ -179,9 +404,10 @@ def _get_continue_learning(moodle_user_id: int):
     return result
 
 
+@memoized
 def _get_overall_courses(moodle_user_id: int):
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         total_courses_row = conn.execute(
             text(
                 f"""
@@ -219,9 +445,10 @@ def _get_overall_courses(moodle_user_id: int):
     }
 
 
+@memoized
 def _get_learning_trend(moodle_user_id: int, days: int = 7):
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         learning_rows = _safe_fetch(
             conn,
             f"""
@@ -236,8 +463,9 @@ def _get_learning_trend(moodle_user_id: int, days: int = 7):
     return _bucketize(learning_rows, "d", "c", days)
 
 
+@memoized
 def _get_engagement(lms_user_id: str, days: int = 7):
-    with LMS_ENGINE.connect() as conn:
+    with connect(LMS_ENGINE) as conn:
         posts = conn.execute(
             text("SELECT COUNT(*) AS c FROM post WHERE authorId = :uid"),
             {"uid": lms_user_id},
@@ -272,9 +500,10 @@ def _get_engagement(lms_user_id: str, days: int = 7):
     }
 
 
+@memoized
 def _get_missing_tasks(moodle_user_id: int, limit: int = 20):
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             f"""
@@ -311,9 +540,10 @@ def _get_missing_tasks(moodle_user_id: int, limit: int = 20):
     ]
 
 
+@memoized
 def _get_due_soon_tasks(moodle_user_id: int, days: int = 7, limit: int = 20):
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             f"""
@@ -351,9 +581,16 @@ def _get_due_soon_tasks(moodle_user_id: int, days: int = 7, limit: int = 20):
     ]
 
 
-def _get_course_avg_grade(moodle_user_id: int):
+@memoized
+def _get_course_avg_grade(moodle_user_id: int, course_id: int | None = None):
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    params = {"uid": moodle_user_id}
+    course_filter = ""
+    if course_id is not None:
+        course_filter = " AND gi.courseid = :courseid"
+        params["courseid"] = course_id
+
+    with connect(MOODLE_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             f"""
@@ -365,28 +602,43 @@ def _get_course_avg_grade(moodle_user_id: int):
             WHERE gg.userid = :uid
               AND gi.courseid IS NOT NULL
               AND gi.grademax > 0
-              AND gg.finalgrade IS NOT NULL
+              AND gg.finalgrade IS NOT NULL{course_filter}
             GROUP BY gi.courseid
             """,
-            {"uid": moodle_user_id},
+            params,
         )
     return {int(r["course_id"]): float(r["avg_grade_pct"] or 0) for r in rows}
 
 
-def _get_last_activity_by_course(moodle_user_id: int):
-    prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+# Last-activity lookups read the daily rollup once it covers the whole log:
+# (engine, table, timestamp column) to query.
+def _last_activity_source() -> tuple:
+    if rollup_covers(0):
+        return ROLLUP_ENGINE, DAILY_TABLE, "last_ts"
+    return MOODLE_ENGINE, f"{MOODLE_DB_PREFIX}logstore_standard_log", "timecreated"
+
+
+@memoized
+def _get_last_activity_by_course(moodle_user_id: int, course_id: int | None = None):
+    engine, table, ts_column = _last_activity_source()
+    params = {"uid": moodle_user_id}
+    course_filter = ""
+    if course_id is not None:
+        course_filter = " AND courseid = :courseid"
+        params["courseid"] = course_id
+
+    with connect(engine) as conn:
         rows = _safe_fetch(
             conn,
             f"""
             SELECT
               courseid AS course_id,
-              MAX(timecreated) AS last_ts
-            FROM {prefix}logstore_standard_log
-            WHERE userid = :uid AND courseid IS NOT NULL AND courseid != 0
+              MAX({ts_column}) AS last_ts
+            FROM {table}
+            WHERE userid = :uid AND courseid IS NOT NULL AND courseid != 0{course_filter}
             GROUP BY courseid
             """,
-            {"uid": moodle_user_id},
+            params,
         )
     result = {}
     for r in rows:
@@ -396,14 +648,15 @@ def _get_last_activity_by_course(moodle_user_id: int):
     return result
 
 
+@memoized
 def _get_last_activity_overall(moodle_user_id: int):
-    prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    engine, table, ts_column = _last_activity_source()
+    with connect(engine) as conn:
         row = conn.execute(
             text(
                 f"""
-                SELECT MAX(timecreated) AS last_ts
-                FROM {prefix}logstore_standard_log
+                SELECT MAX({ts_column}) AS last_ts
+                FROM {table}
                 WHERE userid = :uid
                 """
             ),
@@ -412,9 +665,298 @@ def _get_last_activity_overall(moodle_user_id: int):
     return int(row["last_ts"]) if row and row["last_ts"] else None
 
 
+def _load_lms_user_ids(moodle_user_ids: list[int]):
+    rows = _fetch_by_ids(
+        LMS_ENGINE,
+        "SELECT moodleUserId, userId FROM account WHERE moodleUserId IN ({ids})",
+        {},
+        moodle_user_ids,
+    )
+    result = {}
+    for r in rows:
+        result.setdefault(int(r["moodleUserId"]), r["userId"])
+    return result
+
+
+# Bulk variants of the student-overall helpers: one query per helper for the
+# whole id list, with a value for every requested user.
+@memoized
+def _get_lms_user_ids(moodle_user_ids: list[int]) -> dict:
+    if not moodle_user_ids:
+        return {}
+    return _LMS_USER_IDS.get_many(moodle_user_ids, _load_lms_user_ids)
+
+
+@memoized
+def _get_overall_courses_by_user(user_ids: list[int]):
+    prefix = MOODLE_DB_PREFIX
+    totals = _fetch_by_ids(
+        MOODLE_ENGINE,
+        f"""
+        SELECT ue.userid AS user_id, COUNT(DISTINCT c.id) AS total
+        FROM {prefix}course c
+        JOIN {prefix}enrol e ON e.courseid = c.id
+        JOIN {prefix}user_enrolments ue ON ue.enrolid = e.id
+        WHERE ue.userid IN ({{ids}}) AND c.id != 1
+        GROUP BY ue.userid
+        """,
+        {},
+        user_ids,
+        safe=False,
+    )
+    completed = _fetch_by_ids(
+        MOODLE_ENGINE,
+        f"""
+        SELECT cc.userid AS user_id, COUNT(*) AS completed
+        FROM {prefix}course_completions cc
+        WHERE cc.userid IN ({{ids}}) AND cc.timecompleted IS NOT NULL
+        GROUP BY cc.userid
+        """,
+        {},
+        user_ids,
+        safe=False,
+    )
+    total_map = {int(r["user_id"]): int(r["total"] or 0) for r in totals}
+    completed_map = {int(r["user_id"]): int(r["completed"] or 0) for r in completed}
+    result = {}
+    for uid in user_ids:
+        total_courses = total_map.get(uid, 0)
+        completed_courses = completed_map.get(uid, 0)
+        result[uid] = {
+            "total": total_courses,
+            "completed": completed_courses,
+            "completionRate": (
+                round((completed_courses / total_courses) * 100) if total_courses else 0
+            ),
+        }
+    return result
+
+
+@memoized
+def _get_course_avg_grade_by_user(user_ids: list[int]):
+    prefix = MOODLE_DB_PREFIX
+    rows = _fetch_by_ids(
+        MOODLE_ENGINE,
+        f"""
+        SELECT
+          gg.userid AS user_id,
+          gi.courseid AS course_id,
+          AVG(gg.finalgrade / NULLIF(gi.grademax, 0)) * 100 AS avg_grade_pct
+        FROM {prefix}grade_items gi
+        JOIN {prefix}grade_grades gg ON gg.itemid = gi.id
+        WHERE gg.userid IN ({{ids}})
+          AND gi.courseid IS NOT NULL
+          AND gi.grademax > 0
+          AND gg.finalgrade IS NOT NULL
+        GROUP BY gg.userid, gi.courseid
+        """,
+        {},
+        user_ids,
+    )
+    result = {uid: {} for uid in user_ids}
+    for r in rows:
+        result[int(r["user_id"])][int(r["course_id"])] = float(r["avg_grade_pct"] or 0)
+    return result
+
+
+@memoized
+def _get_engagement_by_user(lms_user_ids: list[str], days: int = 7):
+    counts = {}
+    for kind, table in (("posts", "post"), ("comments", "comment"), ("reactions", "reaction")):
+        rows = _fetch_by_ids(
+            LMS_ENGINE,
+            f"SELECT authorId, COUNT(*) AS c FROM {table} WHERE authorId IN ({{ids}}) GROUP BY authorId",
+            {},
+            lms_user_ids,
+            safe=False,
+        )
+        counts[kind] = {r["authorId"]: int(r["c"]) for r in rows}
+    daily_rows = _fetch_by_ids(
+        LMS_ENGINE,
+        f"""
+        SELECT authorId, DATE(createdAt) AS d, COUNT(*) AS c
+        FROM post
+        WHERE authorId IN ({{ids}}) AND createdAt >= DATE_SUB(UTC_TIMESTAMP(), INTERVAL {days - 1} DAY)
+        GROUP BY authorId, d
+        """,
+        {},
+        lms_user_ids,
+    )
+    daily = {}
+    for r in daily_rows:
+        daily.setdefault(r["authorId"], []).append(r)
+    return {
+        uid: {
+            "counts": {kind: counts[kind].get(uid, 0) for kind in ("posts", "comments", "reactions")},
+            "daily": _bucketize(daily.get(uid, []), "d", "c", days),
+        }
+        for uid in lms_user_ids
+    }
+
+
+@memoized
+def _get_learning_trend_by_user(user_ids: list[int], days: int = 7):
+    prefix = MOODLE_DB_PREFIX
+    rows = _fetch_by_ids(
+        MOODLE_ENGINE,
+        f"""
+        SELECT cmc.userid AS user_id, DATE(FROM_UNIXTIME(cmc.timemodified)) AS d, COUNT(*) AS c
+        FROM {prefix}course_modules_completion cmc
+        WHERE cmc.userid IN ({{ids}})
+          AND cmc.timemodified >= UNIX_TIMESTAMP(DATE_SUB(UTC_TIMESTAMP(), INTERVAL {days - 1} DAY))
+        GROUP BY cmc.userid, d
+        """,
+        {},
+        user_ids,
+    )
+    by_user = {}
+    for r in rows:
+        by_user.setdefault(int(r["user_id"]), []).append(r)
+    return {uid: _bucketize(by_user.get(uid, []), "d", "c", days) for uid in user_ids}
+
+
+def _task_rows_by_user(rows, user_ids: list[int], limit: int) -> dict:
+    result = {uid: [] for uid in user_ids}
+    for r in rows:
+        tasks = result[int(r["user_id"])]
+        if len(tasks) < limit:
+            tasks.append(
+                {
+                    "courseId": int(r["course_id"]),
+                    "courseName": r["course_name"],
+                    "assignmentId": int(r["assignment_id"]),
+                    "assignmentName": r["assignment_name"],
+                    "dueDate": _fmt_dt(r["due_date"]) if r["due_date"] else None,
+                }
+            )
+    return result
+
+
+# The per-user LIMIT is applied while grouping the rows (no window functions,
+# so it runs on MySQL 5.7 too).
+@memoized
+def _get_missing_tasks_by_user(user_ids: list[int], limit: int = 20):
+    prefix = MOODLE_DB_PREFIX
+    rows = _fetch_by_ids(
+        MOODLE_ENGINE,
+        f"""
+        SELECT
+          ue.userid AS user_id,
+          c.id AS course_id,
+          c.fullname AS course_name,
+          a.id AS assignment_id,
+          a.name AS assignment_name,
+          FROM_UNIXTIME(a.duedate) AS due_date
+        FROM {prefix}assign a
+        JOIN {prefix}course c ON c.id = a.course
+        JOIN {prefix}enrol e ON e.courseid = c.id
+        JOIN {prefix}user_enrolments ue ON ue.enrolid = e.id
+        LEFT JOIN {prefix}assign_submission s
+          ON s.assignment = a.id AND s.userid = ue.userid AND s.latest = 1
+        WHERE ue.userid IN ({{ids}})
+          AND a.duedate > 0
+          AND a.duedate < UNIX_TIMESTAMP(UTC_TIMESTAMP())
+          AND (s.id IS NULL OR s.status != 'submitted')
+        ORDER BY ue.userid, a.duedate ASC
+        """,
+        {},
+        user_ids,
+    )
+    return _task_rows_by_user(rows, user_ids, limit)
+
+
+@memoized
+def _get_due_soon_tasks_by_user(user_ids: list[int], days: int = 7, limit: int = 20):
+    prefix = MOODLE_DB_PREFIX
+    rows = _fetch_by_ids(
+        MOODLE_ENGINE,
+        f"""
+        SELECT
+          ue.userid AS user_id,
+          c.id AS course_id,
+          c.fullname AS course_name,
+          a.id AS assignment_id,
+          a.name AS assignment_name,
+          FROM_UNIXTIME(a.duedate) AS due_date
+        FROM {prefix}assign a
+        JOIN {prefix}course c ON c.id = a.course
+        JOIN {prefix}enrol e ON e.courseid = c.id
+        JOIN {prefix}user_enrolments ue ON ue.enrolid = e.id
+        LEFT JOIN {prefix}assign_submission s
+          ON s.assignment = a.id AND s.userid = ue.userid AND s.latest = 1
+        WHERE ue.userid IN ({{ids}})
+          AND a.duedate > 0
+          AND a.duedate >= UNIX_TIMESTAMP(UTC_TIMESTAMP())
+          AND a.duedate <= UNIX_TIMESTAMP(DATE_ADD(UTC_TIMESTAMP(), INTERVAL :days DAY))
+          AND (s.id IS NULL OR s.status != 'submitted')
+        ORDER BY ue.userid, a.duedate ASC
+        """,
+        {"days": days},
+        user_ids,
+    )
+    return _task_rows_by_user(rows, user_ids, limit)
+
+
+@memoized
+def _get_continue_learning_by_user(user_ids: list[int]):
+    prefix = MOODLE_DB_PREFIX
+    rows = _fetch_by_ids(
+        MOODLE_ENGINE,
+        f"""
+        SELECT
+          ue.userid AS user_id,
+          c.id AS course_id,
+          c.fullname AS course_name,
+          SUM(CASE WHEN cm.completion > 0 THEN 1 ELSE 0 END) AS total_activities,
+          SUM(CASE WHEN cmc.completionstate IN (1,2) THEN 1 ELSE 0 END) AS completed_activities,
+          MAX(log.timecreated) AS last_ts
+        FROM {prefix}course c
+        JOIN {prefix}enrol e ON e.courseid = c.id
+        JOIN {prefix}user_enrolments ue ON ue.enrolid = e.id AND ue.userid IN ({{ids}})
+        LEFT JOIN {prefix}course_completions cc ON cc.course = c.id AND cc.userid = ue.userid
+        LEFT JOIN {prefix}course_modules cm ON cm.course = c.id
+        LEFT JOIN {prefix}course_modules_completion cmc
+          ON cmc.coursemoduleid = cm.id AND cmc.userid = ue.userid
+        LEFT JOIN {prefix}logstore_standard_log log
+          ON log.courseid = c.id AND log.userid = ue.userid
+        WHERE c.id != 1
+          AND (cc.timecompleted IS NULL)
+        GROUP BY ue.userid, c.id, c.fullname
+        ORDER BY ue.userid, last_ts DESC
+        """,
+        {},
+        user_ids,
+    )
+    today = datetime.utcnow().date()
+    result = {uid: [] for uid in user_ids}
+    for item in rows:
+        total_act = int(item["total_activities"] or 0)
+        done_act = int(item["completed_activities"] or 0)
+        progress = round((done_act / total_act) * 100) if total_act else 0
+        last_ts = item.get("last_ts")
+        days_inactive = None
+        if last_ts:
+            last_date = datetime.utcfromtimestamp(int(last_ts)).date()
+            days_inactive = (today - last_date).days
+        result[int(item["user_id"])].append(
+            {
+                "courseId": int(item["course_id"]),
+                "courseName": item["course_name"],
+                "completed": False,
+                "progressPercent": progress,
+                "totalActivities": total_act,
+                "completedActivities": done_act,
+                "lastActive": _fmt_dt(last_ts) if last_ts else None,
+                "daysInactive": days_inactive,
+            }
+        )
+    return result
+
+
+@memoized
 def _get_teacher_courses(teacher_id: int):
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             f"""
@@ -427,15 +969,18 @@ def _get_teacher_courses(teacher_id: int):
             """,
             {"tid": teacher_id},
         )
-    return [{"courseId": int(r["course_id"]), "courseName": r["course_name"]} for r in rows]
+    courses = [{"courseId": int(r["course_id"]), "courseName": r["course_name"]} for r in rows]
+    _COURSE_NAMES.put_many({c["courseId"]: c["courseName"] for c in courses})
+    return courses
 
 
+@memoized
 def _get_students_in_courses(course_ids: list[int]):
     if not course_ids:
         return []
     prefix = MOODLE_DB_PREFIX
     in_courses, params = _in_params(course_ids, "c")
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             f"""
@@ -449,415 +994,271 @@ def _get_students_in_courses(course_ids: list[int]):
     return [int(r["user_id"]) for r in rows]
 
 
+@memoized
 def _get_last_activity_by_user(course_ids: list[int], user_ids: list[int]):
     if not course_ids or not user_ids:
         return {}
-    prefix = MOODLE_DB_PREFIX
-    in_courses, params_c = _in_params(course_ids, "c")
-    in_users, params_u = _in_params(user_ids, "u")
-    params = {**params_c, **params_u}
-    with MOODLE_ENGINE.connect() as conn:
-        rows = _safe_fetch(
-            conn,
-            f"""
-            SELECT userid, MAX(timecreated) AS last_ts
-            FROM {prefix}logstore_standard_log
-            WHERE courseid IN ({in_courses}) AND userid IN ({in_users})
-            GROUP BY userid
-            """,
-            params,
-        )
+    engine, table, ts_column = _last_activity_source()
+    in_courses, params = _in_params(course_ids, "c")
+    rows = _fetch_by_ids(
+        engine,
+        f"""
+        SELECT userid, MAX({ts_column}) AS last_ts
+        FROM {table}
+        WHERE courseid IN ({in_courses}) AND userid IN ({{ids}})
+        GROUP BY userid
+        """,
+        params,
+        user_ids,
+    )
     return {int(r["userid"]): int(r["last_ts"]) for r in rows if r["last_ts"]}
 
 
+@memoized
 def _get_avg_grade_by_user(course_ids: list[int], user_ids: list[int]):
     if not course_ids or not user_ids:
         return {}
     prefix = MOODLE_DB_PREFIX
-    in_courses, params_c = _in_params(course_ids, "c")
-    in_users, params_u = _in_params(user_ids, "u")
-    params = {**params_c, **params_u}
-    with MOODLE_ENGINE.connect() as conn:
-        rows = _safe_fetch(
-            conn,
-            f"""
-            SELECT gg.userid AS user_id,
-                   AVG(gg.finalgrade / NULLIF(gi.grademax,0)) * 100 AS avg_pct
-            FROM {prefix}grade_items gi
-            JOIN {prefix}grade_grades gg ON gg.itemid = gi.id
-            WHERE gi.courseid IN ({in_courses})
-              AND gg.userid IN ({in_users})
-              AND gi.grademax > 0
-              AND gg.finalgrade IS NOT NULL
-            GROUP BY gg.userid
-            """,
-            params,
-        )
+    in_courses, params = _in_params(course_ids, "c")
+    rows = _fetch_by_ids(
+        MOODLE_ENGINE,
+        f"""
+        SELECT gg.userid AS user_id,
+               AVG(gg.finalgrade / NULLIF(gi.grademax,0)) * 100 AS avg_pct
+        FROM {prefix}grade_items gi
+        JOIN {prefix}grade_grades gg ON gg.itemid = gi.id
+        WHERE gi.courseid IN ({in_courses})
+          AND gg.userid IN ({{ids}})
+          AND gi.grademax > 0
+          AND gg.finalgrade IS NOT NULL
+        GROUP BY gg.userid
+        """,
+        params,
+        user_ids,
+    )
     return {int(r["user_id"]): float(r["avg_pct"] or 0) for r in rows}
 
 
+@memoized
 def _get_missing_by_user(course_ids: list[int], user_ids: list[int]):
     if not course_ids or not user_ids:
         return {}
     prefix = MOODLE_DB_PREFIX
-    in_courses, params_c = _in_params(course_ids, "c")
-    in_users, params_u = _in_params(user_ids, "u")
-    params = {**params_c, **params_u}
-    with MOODLE_ENGINE.connect() as conn:
-        rows = _safe_fetch(
-            conn,
-            f"""
-            SELECT ue.userid AS user_id, COUNT(*) AS miss_cnt
-            FROM {prefix}assign a
-            JOIN {prefix}enrol e ON e.courseid = a.course
-            JOIN {prefix}user_enrolments ue ON ue.enrolid = e.id
-            LEFT JOIN {prefix}assign_submission s
-              ON s.assignment = a.id AND s.userid = ue.userid AND s.latest = 1
-            WHERE a.course IN ({in_courses})
-              AND ue.userid IN ({in_users})
-              AND a.duedate > 0
-              AND a.duedate < UNIX_TIMESTAMP(UTC_TIMESTAMP())
-              AND (s.id IS NULL OR s.status != 'submitted')
-            GROUP BY ue.userid
-            """,
-            params,
-        )
+    in_courses, params = _in_params(course_ids, "c")
+    rows = _fetch_by_ids(
+        MOODLE_ENGINE,
+        f"""
+        SELECT ue.userid AS user_id, COUNT(*) AS miss_cnt
+        FROM {prefix}assign a
+        JOIN {prefix}enrol e ON e.courseid = a.course
+        JOIN {prefix}user_enrolments ue ON ue.enrolid = e.id
+        LEFT JOIN {prefix}assign_submission s
+          ON s.assignment = a.id AND s.userid = ue.userid AND s.latest = 1
+        WHERE a.course IN ({in_courses})
+          AND ue.userid IN ({{ids}})
+          AND a.duedate > 0
+          AND a.duedate < UNIX_TIMESTAMP(UTC_TIMESTAMP())
+          AND (s.id IS NULL OR s.status != 'submitted')
+        GROUP BY ue.userid
+        """,
+        params,
+        user_ids,
+    )
     return {int(r["user_id"]): int(r["miss_cnt"] or 0) for r in rows}
 
 
+@memoized
 def _get_ungraded_submissions_count(course_ids: list[int], user_ids: list[int]):
     if not course_ids or not user_ids:
         return 0
     prefix = MOODLE_DB_PREFIX
-    in_courses, params_c = _in_params(course_ids, "c")
-    in_users, params_u = _in_params(user_ids, "u")
-    params = {**params_c, **params_u}
-    with MOODLE_ENGINE.connect() as conn:
-        row = conn.execute(
-            text(
-                f"""
-                SELECT COUNT(*) AS c
-                FROM {prefix}assign_submission s
-                JOIN {prefix}assign a ON a.id = s.assignment
-                LEFT JOIN {prefix}grade_items gi
-                  ON gi.itemmodule = 'assign' AND gi.iteminstance = a.id
-                LEFT JOIN {prefix}grade_grades gg
-                  ON gg.itemid = gi.id AND gg.userid = s.userid
-                WHERE a.course IN ({in_courses})
-                  AND s.userid IN ({in_users})
-                  AND s.status = 'submitted'
-                  AND a.duedate > 0
-                  AND a.duedate < UNIX_TIMESTAMP(UTC_TIMESTAMP())
-                  AND gg.id IS NULL
-                """
-            ),
-            params,
-        ).mappings().first()
-    return int(row["c"] or 0) if row else 0
-
-
-def _avg_learning_hours(course_ids: list[int], user_ids: list[int]):
-    if not course_ids or not user_ids:
-        return 0
-    prefix = MOODLE_DB_PREFIX
-    in_courses, params_c = _in_params(course_ids, "c")
-    in_users, params_u = _in_params(user_ids, "u")
-    params = {**params_c, **params_u}
-    with MOODLE_ENGINE.connect() as conn:
-        rows = _safe_fetch(
-            conn,
-            f"""
-            SELECT userid, timecreated
-            FROM {prefix}logstore_standard_log
-            WHERE courseid IN ({in_courses}) AND userid IN ({in_users})
-            ORDER BY userid, timecreated
-            """,
-            params,
-        )
-    gaps = []
-    last_by_user = {}
-    for r in rows:
-        uid = int(r["userid"])
-        ts = int(r["timecreated"])
-        if uid in last_by_user:
-            gap_min = (ts - last_by_user[uid]) / 60
-            if 1 <= gap_min <= 30:
-                gaps.append(gap_min)
-        last_by_user[uid] = ts
-    if not gaps:
-        return 0
-    return round(sum(gaps) / len(gaps) / 60, 2)
-
-
-def _avg_learning_hours_window(course_ids: list[int], user_ids: list[int], start_ts: int, end_ts: int):
-    if not course_ids or not user_ids:
-        return 0
-    prefix = MOODLE_DB_PREFIX
-    in_courses, params_c = _in_params(course_ids, "c")
-    in_users, params_u = _in_params(user_ids, "u")
-    params = {**params_c, **params_u, "start_ts": start_ts, "end_ts": end_ts}
-    with MOODLE_ENGINE.connect() as conn:
-        rows = _safe_fetch(
-            conn,
-            f"""
-            SELECT userid, timecreated
-            FROM {prefix}logstore_standard_log
-            WHERE courseid IN ({in_courses})
-              AND userid IN ({in_users})
-              AND timecreated BETWEEN :start_ts AND :end_ts
-            ORDER BY userid, timecreated
-            """,
-            params,
-        )
-    gaps = []
-    last_by_user = {}
-    for r in rows:
-        uid = int(r["userid"])
-        ts = int(r["timecreated"])
-        if uid in last_by_user:
-            gap_min = (ts - last_by_user[uid]) / 60
-            if 1 <= gap_min <= 30:
-                gaps.append(gap_min)
-        last_by_user[uid] = ts
-    if not gaps:
-        return 0
-    return round(sum(gaps) / len(gaps) / 60, 2)
-
-
-def _get_active_students_in_window(course_ids: list[int], start_ts: int, end_ts: int):
-    if not course_ids:
-        return []
-    prefix = MOODLE_DB_PREFIX
     in_courses, params = _in_params(course_ids, "c")
-    params.update({"start_ts": start_ts, "end_ts": end_ts})
-    with MOODLE_ENGINE.connect() as conn:
-        rows = _safe_fetch(
-            conn,
-            f"""
-            SELECT DISTINCT ra.userid AS user_id
-            FROM {prefix}logstore_standard_log log
-            JOIN {prefix}role_assignments ra ON ra.userid = log.userid
-            JOIN {prefix}context ctx ON ctx.id = ra.contextid AND ctx.contextlevel = 50
-            WHERE log.courseid IN ({in_courses})
-              AND log.timecreated BETWEEN :start_ts AND :end_ts
-              AND ctx.instanceid = log.courseid
-              AND ra.roleid = 5
-            """,
-            params,
-        )
-    return [int(r["user_id"]) for r in rows]
+    rows = _fetch_by_ids(
+        MOODLE_ENGINE,
+        f"""
+        SELECT COUNT(*) AS c
+        FROM {prefix}assign_submission s
+        JOIN {prefix}assign a ON a.id = s.assignment
+        LEFT JOIN {prefix}grade_items gi
+          ON gi.itemmodule = 'assign' AND gi.iteminstance = a.id
+        LEFT JOIN {prefix}grade_grades gg
+          ON gg.itemid = gi.id AND gg.userid = s.userid
+        WHERE a.course IN ({in_courses})
+          AND s.userid IN ({{ids}})
+          AND s.status = 'submitted'
+          AND a.duedate > 0
+          AND a.duedate < UNIX_TIMESTAMP(UTC_TIMESTAMP())
+          AND gg.id IS NULL
+        """,
+        params,
+        user_ids,
+        safe=False,
+    )
+    return sum(int(r["c"] or 0) for r in rows)
 
 
-def _get_last_activity_by_user_window(course_ids: list[int], user_ids: list[int], start_ts: int, end_ts: int):
-    if not course_ids or not user_ids:
-        return {}
+# A learning session step is a 1-30 minute gap between consecutive log events
+# of the same user; hours are averaged over those gaps. With ids, filters holds
+# an "{ids}" slot for the user ids and runs through _fetch_by_ids; sessions
+# never span users, so the per-chunk results need no merging.
+def _session_gap_totals(filters: str, params: dict, ids=None):
     prefix = MOODLE_DB_PREFIX
-    in_courses, params_c = _in_params(course_ids, "c")
-    in_users, params_u = _in_params(user_ids, "u")
-    params = {**params_c, **params_u, "start_ts": start_ts, "end_ts": end_ts}
-    with MOODLE_ENGINE.connect() as conn:
-        rows = _safe_fetch(
-            conn,
-            f"""
-            SELECT userid, MAX(timecreated) AS last_ts
-            FROM {prefix}logstore_standard_log
-            WHERE courseid IN ({in_courses})
-              AND userid IN ({in_users})
-              AND timecreated BETWEEN :start_ts AND :end_ts
-            GROUP BY userid
-            """,
-            params,
-        )
-    return {int(r["userid"]): int(r["last_ts"]) for r in rows if r["last_ts"]}
-
-
-def _get_missing_by_user_window(course_ids: list[int], user_ids: list[int], end_ts: int):
-    if not course_ids or not user_ids:
-        return {}
+    sql = f"""
+        SELECT userid, COUNT(*) AS gap_count, SUM(gap) AS gap_seconds
+        FROM (
+          SELECT
+            userid,
+            timecreated - LAG(timecreated) OVER (
+              PARTITION BY userid ORDER BY timecreated
+            ) AS gap
+          FROM {prefix}logstore_standard_log
+          WHERE {filters}
+        ) g
+        WHERE gap BETWEEN 60 AND 1800
+        GROUP BY userid
+        """
+    if ids is not None:
+        return _fetch_by_ids(MOODLE_ENGINE, sql, params, ids)
+    with connect(MOODLE_ENGINE) as conn:
+        return _safe_fetch(conn, sql, params)
+
+
+def _session_log_python(filters: str, params: dict, ids=None):
     prefix = MOODLE_DB_PREFIX
-    in_courses, params_c = _in_params(course_ids, "c")
-    in_users, params_u = _in_params(user_ids, "u")
-    params = {**params_c, **params_u, "end_ts": end_ts}
-    with MOODLE_ENGINE.connect() as conn:
-        rows = _safe_fetch(
-            conn,
-            f"""
-            SELECT ue.userid AS user_id, COUNT(*) AS miss_cnt
-            FROM {prefix}assign a
-            JOIN {prefix}enrol e ON e.courseid = a.course
-            JOIN {prefix}user_enrolments ue ON ue.enrolid = e.id
-            LEFT JOIN {prefix}assign_submission s
-              ON s.assignment = a.id AND s.userid = ue.userid AND s.latest = 1
-            WHERE a.course IN ({in_courses})
-              AND ue.userid IN ({in_users})
-              AND a.duedate > 0
-              AND a.duedate < :end_ts
-              AND (s.id IS NULL OR s.status != 'submitted')
-            GROUP BY ue.userid
-            """,
-            params,
-        )
-    return {int(r["user_id"]): int(r["miss_cnt"] or 0) for r in rows}
-
-
-def _get_ungraded_submissions_count_window(course_ids: list[int], user_ids: list[int], start_ts: int, end_ts: int):
-    if not course_ids or not user_ids:
+    sql = f"""
+        SELECT userid, timecreated
+        FROM {prefix}logstore_standard_log
+        WHERE {filters}
+        ORDER BY userid, timecreated
+        """
+    if ids is not None:
+        rows = [(r["userid"], r["timecreated"]) for r in _fetch_by_ids(MOODLE_ENGINE, sql, params, ids)]
+    else:
+        with connect(MOODLE_ENGINE) as conn:
+            rows = _safe_fetch_rows(conn, sql, params)
+    return sessionize(*log_columns(rows))
+
+
+# SESSIONIZATION_MODE=sql needs LAG(); a Moodle server without window
+# functions (MySQL < 8) gets the python mode instead of empty results.
+def _sessionization_mode() -> str:
+    if SESSIONIZATION_MODE == "sql" and window_functions_supported(MOODLE_ENGINE) is False:
+        return "python"
+    return SESSIONIZATION_MODE
+
+
+def _avg_session_hours(filters: str, params: dict, ids=None):
+    if _sessionization_mode() == "python":
+        stats = _session_log_python(filters, params, ids)
+        return round(stats["avg_gap_hours"], 2) if stats["gap_count"] else 0
+    rows = _session_gap_totals(filters, params, ids)
+    gap_count = sum(int(r["gap_count"] or 0) for r in rows)
+    if not gap_count:
         return 0
-    prefix = MOODLE_DB_PREFIX
-    in_courses, params_c = _in_params(course_ids, "c")
-    in_users, params_u = _in_params(user_ids, "u")
-    params = {**params_c, **params_u, "start_ts": start_ts, "end_ts": end_ts}
-    with MOODLE_ENGINE.connect() as conn:
-        row = conn.execute(
-            text(
-                f"""
-                SELECT COUNT(*) AS c
-                FROM {prefix}assign_submission s
-                JOIN {prefix}assign a ON a.id = s.assignment
-                LEFT JOIN {prefix}grade_items gi
-                  ON gi.itemmodule = 'assign' AND gi.iteminstance = a.id
-                LEFT JOIN {prefix}grade_grades gg
-                  ON gg.itemid = gi.id AND gg.userid = s.userid
-                WHERE a.course IN ({in_courses})
-                  AND s.userid IN ({in_users})
-                  AND s.status = 'submitted'
-                  AND a.duedate BETWEEN :start_ts AND :end_ts
-                  AND gg.id IS NULL
-                """
-            ),
-            params,
-        ).mappings().first()
-    return int(row["c"] or 0) if row else 0
+    gap_seconds = sum(float(r["gap_seconds"] or 0) for r in rows)
+    return round(gap_seconds / gap_count / 3600, 2)
 
 
-def _get_completion_rate_window(course_ids: list[int], user_ids: list[int], start_ts: int, end_ts: int):
+@memoized
+def _avg_learning_hours(course_ids: list[int], user_ids: list[int]):
     if not course_ids or not user_ids:
         return 0
-    prefix = MOODLE_DB_PREFIX
-    in_courses, params_c = _in_params(course_ids, "c")
-    in_users, params_u = _in_params(user_ids, "u")
-    params = {**params_c, **params_u, "start_ts": start_ts, "end_ts": end_ts}
-    with MOODLE_ENGINE.connect() as conn:
-        total_row = conn.execute(
-            text(
-                f"""
-                SELECT SUM(CASE WHEN completion > 0 THEN 1 ELSE 0 END) AS total_act
-                FROM {prefix}course_modules
-                WHERE course IN ({in_courses})
-                """
-            ),
-            params_c,
-        ).mappings().first()
-        completed_row = conn.execute(
-            text(
-                f"""
-                SELECT COUNT(*) AS done_act
-                FROM {prefix}course_modules_completion cmc
-                JOIN {prefix}course_modules cm ON cm.id = cmc.coursemoduleid
-                WHERE cm.course IN ({in_courses})
-                  AND cmc.userid IN ({in_users})
-                  AND cmc.completionstate IN (1,2)
-                  AND cmc.timemodified BETWEEN :start_ts AND :end_ts
-                """
-            ),
-            params,
-        ).mappings().first()
-    total_act = int(total_row["total_act"] or 0) if total_row else 0
-    done_act = int(completed_row["done_act"] or 0) if completed_row else 0
-    denom = total_act * len(user_ids)
-    return round((done_act / denom) * 100, 1) if denom else 0
+    in_courses, params = _in_params(course_ids, "c")
+    return _avg_session_hours(
+        f"courseid IN ({in_courses}) AND userid IN ({{ids}})", params, user_ids
+    )
 
 
+@memoized
 def _get_avg_grade_by_user_all(user_ids: list[int]):
     if not user_ids:
         return {}
     prefix = MOODLE_DB_PREFIX
-    in_users, params_u = _in_params(user_ids, "u")
-    with MOODLE_ENGINE.connect() as conn:
-        rows = _safe_fetch(
-            conn,
-            f"""
-            SELECT gg.userid AS user_id,
-                   AVG(gg.finalgrade / NULLIF(gi.grademax,0)) * 100 AS avg_pct
-            FROM {prefix}grade_items gi
-            JOIN {prefix}grade_grades gg ON gg.itemid = gi.id
-            WHERE gg.userid IN ({in_users})
-              AND gi.grademax > 0
-              AND gg.finalgrade IS NOT NULL
-            GROUP BY gg.userid
-            """,
-            params_u,
-        )
+    rows = _fetch_by_ids(
+        MOODLE_ENGINE,
+        f"""
+        SELECT gg.userid AS user_id,
+               AVG(gg.finalgrade / NULLIF(gi.grademax,0)) * 100 AS avg_pct
+        FROM {prefix}grade_items gi
+        JOIN {prefix}grade_grades gg ON gg.itemid = gi.id
+        WHERE gg.userid IN ({{ids}})
+          AND gi.grademax > 0
+          AND gg.finalgrade IS NOT NULL
+        GROUP BY gg.userid
+        """,
+        {},
+        user_ids,
+    )
     return {int(r["user_id"]): float(r["avg_pct"] or 0) for r in rows}
 
 
+@memoized
 def _get_missing_by_user_all(user_ids: list[int]):
     if not user_ids:
         return {}
     prefix = MOODLE_DB_PREFIX
-    in_users, params_u = _in_params(user_ids, "u")
-    with MOODLE_ENGINE.connect() as conn:
-        rows = _safe_fetch(
-            conn,
-            f"""
-            SELECT ue.userid AS user_id, COUNT(*) AS miss_cnt
-            FROM {prefix}assign a
-            JOIN {prefix}enrol e ON e.courseid = a.course
-            JOIN {prefix}user_enrolments ue ON ue.enrolid = e.id
-            LEFT JOIN {prefix}assign_submission s
-              ON s.assignment = a.id AND s.userid = ue.userid AND s.latest = 1
-            WHERE ue.userid IN ({in_users})
-              AND a.duedate > 0
-              AND a.duedate < UNIX_TIMESTAMP(UTC_TIMESTAMP())
-              AND (s.id IS NULL OR s.status != 'submitted')
-            GROUP BY ue.userid
-            """,
-            params_u,
-        )
+    rows = _fetch_by_ids(
+        MOODLE_ENGINE,
+        f"""
+        SELECT ue.userid AS user_id, COUNT(*) AS miss_cnt
+        FROM {prefix}assign a
+        JOIN {prefix}enrol e ON e.courseid = a.course
+        JOIN {prefix}user_enrolments ue ON ue.enrolid = e.id
+        LEFT JOIN {prefix}assign_submission s
+          ON s.assignment = a.id AND s.userid = ue.userid AND s.latest = 1
+        WHERE ue.userid IN ({{ids}})
+          AND a.duedate > 0
+          AND a.duedate < UNIX_TIMESTAMP(UTC_TIMESTAMP())
+          AND (s.id IS NULL OR s.status != 'submitted')
+        GROUP BY ue.userid
+        """,
+        {},
+        user_ids,
+    )
     return {int(r["user_id"]): int(r["miss_cnt"] or 0) for r in rows}
 
 
+@memoized
 def _get_last_activity_by_user_all(user_ids: list[int]):
     if not user_ids:
         return {}
-    prefix = MOODLE_DB_PREFIX
-    in_users, params_u = _in_params(user_ids, "u")
-    with MOODLE_ENGINE.connect() as conn:
-        rows = _safe_fetch(
-            conn,
-            f"""
-            SELECT userid, MAX(timecreated) AS last_ts
-            FROM {prefix}logstore_standard_log
-            WHERE userid IN ({in_users})
-            GROUP BY userid
-            """,
-            params_u,
-        )
+    engine, table, ts_column = _last_activity_source()
+    rows = _fetch_by_ids(
+        engine,
+        f"""
+        SELECT userid, MAX({ts_column}) AS last_ts
+        FROM {table}
+        WHERE userid IN ({{ids}})
+        GROUP BY userid
+        """,
+        {},
+        user_ids,
+    )
     return {int(r["userid"]): int(r["last_ts"]) for r in rows if r["last_ts"]}
 
 
+@memoized
 def _get_progress_by_user(user_ids: list[int]):
     if not user_ids:
         return {}
     prefix = MOODLE_DB_PREFIX
-    in_users, params_u = _in_params(user_ids, "u")
-    with MOODLE_ENGINE.connect() as conn:
-        rows = _safe_fetch(
-            conn,
-            f"""
-            SELECT ue.userid AS user_id,
-                   SUM(CASE WHEN cm.completion > 0 THEN 1 ELSE 0 END) AS total_activities,
-                   SUM(CASE WHEN cmc.completionstate IN (1,2) THEN 1 ELSE 0 END) AS completed_activities
-            FROM {prefix}user_enrolments ue
-            JOIN {prefix}enrol e ON e.id = ue.enrolid
-            JOIN {prefix}course_modules cm ON cm.course = e.courseid
-            LEFT JOIN {prefix}course_modules_completion cmc
-              ON cmc.coursemoduleid = cm.id AND cmc.userid = ue.userid
-            WHERE ue.userid IN ({in_users})
-            GROUP BY ue.userid
-            """,
-            params_u,
-        )
+    rows = _fetch_by_ids(
+        MOODLE_ENGINE,
+        f"""
+        SELECT ue.userid AS user_id,
+               SUM(CASE WHEN cm.completion > 0 THEN 1 ELSE 0 END) AS total_activities,
+               SUM(CASE WHEN cmc.completionstate IN (1,2) THEN 1 ELSE 0 END) AS completed_activities
+        FROM {prefix}user_enrolments ue
+        JOIN {prefix}enrol e ON e.id = ue.enrolid
+        JOIN {prefix}course_modules cm ON cm.course = e.courseid
+        LEFT JOIN {prefix}course_modules_completion cmc
+          ON cmc.coursemoduleid = cm.id AND cmc.userid = ue.userid
+        WHERE ue.userid IN ({{ids}})
+        GROUP BY ue.userid
+        """,
+        {},
+        user_ids,
+    )
     result = {}
     for r in rows:
         total_act = int(r["total_activities"] or 0)
@@ -867,8 +1268,9 @@ def _get_progress_by_user(user_ids: list[int]):
     return result
 
 
+@memoized
 def _get_mentor_matches(mentor_lms_id: str):
-    with LMS_ENGINE.connect() as conn:
+    with connect(LMS_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             """
@@ -881,11 +1283,9 @@ def _get_mentor_matches(mentor_lms_id: str):
     return rows
 
 
-def _get_lms_users_by_ids(user_ids: list[str]):
-    if not user_ids:
-        return {}
+def _load_lms_users(user_ids: list[str]):
     in_users, params = _in_params(user_ids, "u")
-    with LMS_ENGINE.connect() as conn:
+    with connect(LMS_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             f"SELECT userId, moodleUserId, username FROM account WHERE userId IN ({in_users})",
@@ -897,12 +1297,17 @@ def _get_lms_users_by_ids(user_ids: list[str]):
     }
 
 
-def _get_moodle_users(moodle_ids: list[int]):
-    if not moodle_ids:
+@memoized
+def _get_lms_users_by_ids(user_ids: list[str]):
+    if not user_ids:
         return {}
+    return _LMS_USERS.get_many(user_ids, _load_lms_users)
+
+
+def _load_moodle_users(moodle_ids: list[int]):
     prefix = MOODLE_DB_PREFIX
     in_ids, params = _in_params(moodle_ids, "m")
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             f"SELECT id, firstname, lastname FROM {prefix}user WHERE id IN ({in_ids})",
@@ -911,11 +1316,19 @@ def _get_moodle_users(moodle_ids: list[int]):
     return {int(r["id"]): f"{r['firstname']} {r['lastname']}".strip() for r in rows}
 
 
+@memoized
+def _get_moodle_users(moodle_ids: list[int]):
+    if not moodle_ids:
+        return {}
+    return _MOODLE_USERS.get_many(moodle_ids, _load_moodle_users)
+
+
+@memoized
 def _get_ideas(idea_ids: list[str]):
     if not idea_ids:
         return {}
     in_ids, params = _in_params(idea_ids, "i")
-    with LMS_ENGINE.connect() as conn:
+    with connect(LMS_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             f"SELECT id, name, status FROM businessidea WHERE id IN ({in_ids})",
@@ -924,11 +1337,12 @@ def _get_ideas(idea_ids: list[str]):
     return {r["id"]: {"name": r["name"], "status": r["status"]} for r in rows}
 
 
+@memoized
 def _get_pitch_scores(idea_ids: list[str]):
     if not idea_ids:
         return {}
     in_ids, params = _in_params(idea_ids, "i")
-    with LMS_ENGINE.connect() as conn:
+    with connect(LMS_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             f"""
@@ -958,27 +1372,60 @@ def _get_pitch_scores(idea_ids: list[str]):
 
 
 
-def _mentor_build_rows(mentor_lms_id: str):
-    matches = _get_mentor_matches(mentor_lms_id)
-    if not matches:
-        return []
-
+def _mentor_match_calls(matches) -> dict:
     student_ids = [m["studentId"] for m in matches if m.get("studentId")]
     idea_ids = [m["ideaId"] for m in matches if m.get("ideaId")]
+    return {
+        "lms_users": (_get_lms_users_by_ids, student_ids),
+        "ideas": (_get_ideas, idea_ids),
+        "pitch": (_get_pitch_scores, idea_ids),
+    }
+
 
-    lms_users = _get_lms_users_by_ids(student_ids)
+def _mentor_student_calls(lms_users: dict) -> dict:
     moodle_ids = [
         info["moodleUserId"]
         for info in lms_users.values()
         if info.get("moodleUserId") is not None
     ]
-    moodle_names = _get_moodle_users(moodle_ids)
-    progress_map = _get_progress_by_user(moodle_ids)
-    avg_grade_map = _get_avg_grade_by_user_all(moodle_ids)
-    missing_map = _get_missing_by_user_all(moodle_ids)
-    last_activity_map = _get_last_activity_by_user_all(moodle_ids)
-    ideas_map = _get_ideas(idea_ids)
-    pitch_scores, pitch_statuses, pitch_events = _get_pitch_scores(idea_ids)
+    return {
+        "moodle_names": (_get_moodle_users, moodle_ids),
+        "progress": (_get_progress_by_user, moodle_ids),
+        "avg_grade": (_get_avg_grade_by_user_all, moodle_ids),
+        "missing": (_get_missing_by_user_all, moodle_ids),
+        "last_activity": (_get_last_activity_by_user_all, moodle_ids),
+    }
+
+
+def _mentor_build_rows(mentor_lms_id: str):
+    matches = _get_mentor_matches(mentor_lms_id)
+    if not matches:
+        return []
+    lookups = _gather_calls(_mentor_match_calls(matches))
+    student_data = _gather_calls(_mentor_student_calls(lookups["lms_users"]))
+    return _mentor_rows(matches, {**lookups, **student_data})
+
+
+async def _mentor_build_rows_async(mentor_lms_id: str):
+    matches = await run_async(_get_mentor_matches, mentor_lms_id)
+    if not matches:
+        return []
+    lookups = await _gather_calls_async(_mentor_match_calls(matches))
+    student_data = await _gather_calls_async(
+        _mentor_student_calls(lookups["lms_users"])
+    )
+    return _mentor_rows(matches, {**lookups, **student_data})
+
+
+def _mentor_rows(matches, data: dict):
+    lms_users = data["lms_users"]
+    moodle_names = data["moodle_names"]
+    progress_map = data["progress"]
+    avg_grade_map = data["avg_grade"]
+    missing_map = data["missing"]
+    last_activity_map = data["last_activity"]
+    ideas_map = data["ideas"]
+    pitch_scores, pitch_statuses, pitch_events = data["pitch"]
 
     rows = []
     for match in matches:
@@ -1049,23 +1496,30 @@ def _mentor_build_rows(mentor_lms_id: str):
     return rows
 
 
-def _get_course_name(course_id: int):
+def _load_course_names(course_ids: list[int]):
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
-        row = conn.execute(
+    in_courses, params = _in_params(course_ids, "c")
+    with connect(MOODLE_ENGINE) as conn:
+        rows = conn.execute(
             text(
                 f"""
-                SELECT fullname FROM {prefix}course WHERE id = :cid
+                SELECT id, fullname FROM {prefix}course WHERE id IN ({in_courses})
                 """
             ),
-            {"cid": course_id},
-        ).mappings().first()
-    return row["fullname"] if row else None
+            params,
+        ).mappings().all()
+    return {int(r["id"]): r["fullname"] for r in rows}
+
+
+@memoized
+def _get_course_name(course_id: int):
+    return _COURSE_NAMES.get_many([course_id], _load_course_names).get(course_id)
 
 
+@memoized
 def _get_course_rating(course_id: int):
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         row = conn.execute(
             text(
                 f"""
@@ -1089,9 +1543,9 @@ def _get_course_rating(course_id: int):
     }
 
 
-def _get_course_tags(course_id: int):
+def _load_course_tags(course_id: int):
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         row = conn.execute(
             text(
                 f"""
@@ -1101,14 +1555,20 @@ def _get_course_tags(course_id: int):
             {"cid": course_id},
         ).mappings().first()
     if not row:
-        return []
+        return None
     tags = row.get("tags") or ""
     return [t.strip() for t in tags.split(",") if t.strip()]
 
 
-def _get_course_teacher_name(course_id: int):
+@memoized
+def _get_course_tags(course_id: int):
+    tags = _COURSE_TAGS.get(course_id, _load_course_tags)
+    return tags if tags is not None else []
+
+
+def _load_course_teacher_name(course_id: int):
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         row = conn.execute(
             text(
                 f"""
@@ -1128,9 +1588,15 @@ def _get_course_teacher_name(course_id: int):
     return f"{row['firstname']} {row['lastname']}".strip()
 
 
+@memoized
+def _get_course_teacher_name(course_id: int):
+    return _COURSE_TEACHERS.get(course_id, _load_course_teacher_name)
+
+
+@memoized
 def _get_course_activities(moodle_user_id: int, course_id: int):
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             f"""
@@ -1160,9 +1626,10 @@ def _get_course_activities(moodle_user_id: int, course_id: int):
     return activities
 
 
+@memoized
 def _get_missing_count(moodle_user_id: int, course_id: int):
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         row = conn.execute(
             text(
                 f"""
@@ -1181,51 +1648,71 @@ def _get_missing_count(moodle_user_id: int, course_id: int):
     return int(row["miss_cnt"] or 0) if row else 0
 
 
+@memoized
 def _get_learning_hours_per_day(moodle_user_id: int, course_id: int, days: int = 7):
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    window = f"""userid = :uid AND courseid = :cid
+              AND timecreated >= UNIX_TIMESTAMP(DATE_SUB(UTC_TIMESTAMP(), INTERVAL {days - 1} DAY))"""
+    params = {"uid": moodle_user_id, "cid": course_id}
+    per_day = {k: 0.0 for k in _date_keys(days)}
+    if _sessionization_mode() == "python":
+        hours_by_day = _session_log_python(window, params)["per_day"]
+        for day_no, hours in hours_by_day.items():
+            day_key = datetime.utcfromtimestamp(day_no * 86400).strftime("%Y-%m-%d")
+            per_day[day_key] = per_day.get(day_key, 0.0) + hours
+        return [{"date": _fmt_dt(k), "hours": round(per_day[k], 2)} for k in per_day.keys()]
+
+    # gaps are credited to the UTC day of the later event
+    with connect(MOODLE_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             f"""
-            SELECT timecreated
-            FROM {prefix}logstore_standard_log
-            WHERE userid = :uid AND courseid = :cid
-              AND timecreated >= UNIX_TIMESTAMP(DATE_SUB(UTC_TIMESTAMP(), INTERVAL {days - 1} DAY))
-            ORDER BY timecreated ASC
+            SELECT FLOOR(timecreated / 86400) AS day_no, SUM(gap) AS gap_seconds
+            FROM (
+              SELECT
+                timecreated,
+                timecreated - LAG(timecreated) OVER (ORDER BY timecreated) AS gap
+              FROM {prefix}logstore_standard_log
+              WHERE {window}
+            ) g
+            WHERE gap BETWEEN 60 AND 1800
+            GROUP BY day_no
+            ORDER BY day_no
             """,
-            {"uid": moodle_user_id, "cid": course_id},
+            params,
         )
-    # bucket by day using gaps (1-30 min)
-    per_day = {k: 0.0 for k in _date_keys(days)}
-    last_ts = None
     for r in rows:
-        ts = int(r["timecreated"])
-        if last_ts is not None:
-            gap_min = (ts - last_ts) / 60
-            if 1 <= gap_min <= 30:
-                day_key = datetime.utcfromtimestamp(ts).strftime("%Y-%m-%d")
-                per_day[day_key] = per_day.get(day_key, 0.0) + gap_min / 60
-        last_ts = ts
+        day_key = datetime.utcfromtimestamp(int(r["day_no"]) * 86400).strftime("%Y-%m-%d")
+        per_day[day_key] = per_day.get(day_key, 0.0) + float(r["gap_seconds"] or 0) / 3600
     return [{"date": _fmt_dt(k), "hours": round(per_day[k], 2)} for k in per_day.keys()]
 
 
-def _get_all_courses():
+def _load_all_courses(_keys):
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             f"SELECT id, fullname FROM {prefix}course WHERE id != 1",
             {},
         )
-    return [{"courseId": int(r["id"]), "courseName": r["fullname"]} for r in rows]
+    courses = [{"courseId": int(r["id"]), "courseName": r["fullname"]} for r in rows]
+    # the full list also prefetches the per-course name lookups
+    _COURSE_NAMES.put_many({c["courseId"]: c["courseName"] for c in courses})
+    return {"all": courses} if rows else {}
+
+
+@memoized
+def _get_all_courses():
+    return _ALL_COURSES.get_many(["all"], _load_all_courses).get("all", [])
 
 
+@memoized
 def _get_course_enrol_counts(course_ids: list[int]):
     if not course_ids:
         return {}
     prefix = MOODLE_DB_PREFIX
     in_courses, params = _in_params(course_ids, "c")
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             f"""
@@ -1240,12 +1727,13 @@ def _get_course_enrol_counts(course_ids: list[int]):
     return {int(r["course_id"]): int(r["cnt"] or 0) for r in rows}
 
 
+@memoized
 def _get_course_missing_counts(course_ids: list[int]):
     if not course_ids:
         return {}
     prefix = MOODLE_DB_PREFIX
     in_courses, params = _in_params(course_ids, "c")
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             f"""
@@ -1266,9 +1754,10 @@ def _get_course_missing_counts(course_ids: list[int]):
     return {int(r["course_id"]): int(r["miss_cnt"] or 0) for r in rows}
 
 
+@memoized
 def _get_all_students_moodle_ids():
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         rows = _safe_fetch(
             conn,
             f"""
@@ -1282,13 +1771,16 @@ def _get_all_students_moodle_ids():
     return [int(r["user_id"]) for r in rows]
 
 
-def _get_overdue_assignments_count():
+# Missing submissions of every course in one scan; the admin overdue alert is
+# their sum and the admin learning section reads its courses from it.
+@memoized
+def _get_missing_counts_by_course():
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
-        row = conn.execute(
+    with connect(MOODLE_ENGINE) as conn:
+        rows = conn.execute(
             text(
                 f"""
-                SELECT COUNT(*) AS cnt
+                SELECT a.course AS course_id, COUNT(*) AS miss_cnt
                 FROM {prefix}assign a
                 JOIN {prefix}enrol e ON e.courseid = a.course
                 JOIN {prefix}user_enrolments ue ON ue.enrolid = e.id
@@ -1297,15 +1789,22 @@ def _get_overdue_assignments_count():
                 WHERE a.duedate > 0
                   AND a.duedate < UNIX_TIMESTAMP(UTC_TIMESTAMP())
                   AND (s.id IS NULL OR s.status != 'submitted')
+                GROUP BY a.course
                 """
             )
-        ).mappings().first()
-    return int(row["cnt"] or 0) if row else 0
+        ).mappings().all()
+    return {int(r["course_id"]): int(r["miss_cnt"] or 0) for r in rows}
+
+
+@memoized
+def _get_overdue_assignments_count():
+    return sum(_get_missing_counts_by_course().values())
 
 
+@memoized
 def _get_completion_rate_overall():
     prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
+    with connect(MOODLE_ENGINE) as conn:
         total_row = conn.execute(
             text(
                 f"""
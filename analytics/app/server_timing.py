@@ -0,0 +1,111 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi import Request
+
+from .config import SERVER_TIMING, SERVER_TIMING_MAX_SPANS
+
+
+# Spans of one request: name -> [seconds, count].
+class _Collector:
+    def __init__(self):
+        self.spans = {}
+        self.lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self.lock:
+            entry = self.spans.get(name)
+            if entry is None:
+                self.spans[name] = [seconds, 1]
+            else:
+                entry[0] += seconds
+                entry[1] += 1
+
+
+# Set only while the request asked for a Server-Timing header; worker threads
+# of the request see the same collector through the copied context.
+_COLLECTOR: ContextVar[_Collector | None] = ContextVar("_SERVER_TIMING", default=None)
+
+
+# SERVER_TIMING=request: on for ?timing=1 or an "X-Server-Timing: 1" header;
+# always: on unless ?timing=0; off: never.
+def timing_requested(request: Request) -> bool:
+    if SERVER_TIMING == "off":
+        return False
+    asked = request.query_params.get("timing", request.headers.get("x-server-timing", ""))
+    if SERVER_TIMING == "always":
+        return asked.lower() not in ("0", "false", "no")
+    return asked.lower() in ("1", "true", "yes")
+
+
+@contextmanager
+def collect_timings(enabled: bool):
+    if not enabled:
+        yield None
+        return
+    collector = _Collector()
+    token = _COLLECTOR.set(collector)
+    try:
+        yield collector
+    finally:
+        _COLLECTOR.reset(token)
+
+
+def add_span(name: str, seconds: float) -> None:
+    collector = _COLLECTOR.get()
+    if collector is not None:
+        collector.add(name, seconds)
+
+
+@contextmanager
+def span(name: str):
+    collector = _COLLECTOR.get()
+    if collector is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        collector.add(name, time.perf_counter() - started)
+
+
+# Records each call of a sync function as a "py.<name>" span and in the "py"
+# total.
+def traced(fn):
+    name = f"py.{fn.__name__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        collector = _COLLECTOR.get()
+        if collector is None:
+            return fn(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - started
+            collector.add("py", seconds)
+            collector.add(name, seconds)
+
+    return wrapper
+
+
+def _entry(name: str, seconds: float, count: int) -> str:
+    return f'{name};desc="{count}x";dur={seconds * 1000:.1f}'
+
+
+# "total", the totals (db, py, json, compress), then the longest named spans
+# (db.<helper>, py.<function>) up to SERVER_TIMING_MAX_SPANS. Spans of
+# concurrent work add up, so "db" can exceed "total".
+def server_timing_header(collector: _Collector, total_seconds: float) -> str:
+    with collector.lock:
+        spans = sorted(collector.spans.items(), key=lambda item: item[1][0], reverse=True)
+    parts = [f"total;dur={total_seconds * 1000:.1f}"]
+    parts += [_entry(name, *entry) for name, entry in spans if "." not in name]
+    named = [_entry(name, *entry) for name, entry in spans if "." in name]
+    parts += named[: max(0, SERVER_TIMING_MAX_SPANS)]
+    return ", ".join(parts)
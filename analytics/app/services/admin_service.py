@@ -1,24 +1,129 @@
+import asyncio
+import time
 from datetime import datetime
+from fastapi import HTTPException
 from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 
 from ..routers.common import (
     _get_all_students_moodle_ids,
     _get_overdue_assignments_count,
     _get_all_courses,
     _get_course_enrol_counts,
-    _get_course_missing_counts,
+    _get_missing_counts_by_course,
     _get_completion_rate_overall,
     _get_progress_by_user,
     _date_keys,
     _fmt_dt,
+    _fetch_by_ids,
+    _merge_rows,
+    _last_activity_source,
+    _gather_calls,
+    _gather_calls_async,
+    _gather_fields,
+    _gather_fields_async,
+    _pick_fields,
 )
-from ..db import LMS_ENGINE, MOODLE_ENGINE
+from ..db import LMS_ENGINE, MOODLE_ENGINE, ROLLUP_ENGINE, connect, run_sections
 from ..config import MOODLE_DB_PREFIX
+from ..request_context import memoized
+from ..server_timing import traced
+from ..rollups import (
+    CONCURRENCY_TABLE,
+    DAILY_TABLE,
+    DAY_SECONDS,
+    SLOT_SECONDS,
+    day_key,
+    rollup_covers,
+)
+
+
+_POST_COMMENT_EMPTY = {"post_rows": [], "comment_rows": []}
+ADMIN_DASHBOARD_SECTIONS = ("overall", "learning", "engagement", "ideas")
+
+# payload field -> calls it reads (fields= selection)
+ADMIN_OVERALL_FIELDS = {
+    "users": ("accounts", "last_rows", "trend_rows"),
+    "logs": ("log_activity", "post_comment"),
+    "concurrentUsers": ("log_activity",),
+    "mentorLoadTop": ("accounts",),
+    "alerts": ("overdue_assignments", "review_alerts"),
+}
+ADMIN_OVERALL_EMPTY = {
+    "accounts": {
+        "total_users": 0,
+        "role_rows": [],
+        "new_users_week": 0,
+        "new_users_month": 0,
+        "moodle_ids": [],
+        "mentor_load_rows": [],
+    },
+    "log_activity": {"log_rows": [], "completion_rows": [], "concurrent_rows": []},
+    "post_comment": _POST_COMMENT_EMPTY,
+    "overdue_assignments": 0,
+    "review_alerts": {"idea_pending": 0, "mentor_overdue": 0},
+    "last_rows": [],
+    "trend_rows": [],
+}
+
+ADMIN_LEARNING_FIELDS = {
+    "coursesTotal": ("courses",),
+    "completionRate": ("completion",),
+    "avgProgressPct": ("students", "progress_map"),
+    "topCoursesByEnroll": ("courses", "enrol_counts"),
+    "topMissingCourses": ("courses", "enrol_counts", "missing_counts"),
+    "completionTrend30d": ("completion_trend_rows",),
+}
+ADMIN_LEARNING_EMPTY = {
+    "courses": [],
+    "completion": {"rate": 0},
+    "students": [],
+    "completion_trend_rows": [],
+    "progress_map": {},
+    "enrol_counts": {},
+    "missing_counts": {},
+}
+
+ADMIN_ENGAGEMENT_FIELDS = {
+    "totals": ("totals",),
+    "topUsers": ("score", "users_rows"),
+    "timeline30d": ("post_comment",),
+}
+ADMIN_ENGAGEMENT_EMPTY = {
+    "totals": {},
+    "score": {},
+    "users_rows": [],
+    "post_comment": _POST_COMMENT_EMPTY,
+}
+
+ADMIN_IDEAS_FIELDS = {
+    "ideasTotal": ("ideas",),
+    "ideasByStatus": ("ideas",),
+    "mentorMatch": ("mentor_match",),
+    "pitch": ("pitch",),
+    "ideasTrend30d": ("trend_rows",),
+    "pitchTrend30d": ("trend_rows",),
+}
+ADMIN_IDEAS_EMPTY = {
+    "ideas": {"total_ideas": 0, "status_rows": []},
+    "mentor_match": {},
+    "pitch": {},
+    "trend_rows": {"idea_rows": [], "pitch_rows": []},
+}
+
+
+# Read by the overall user counts and the engagement top users.
+@memoized
+def _get_account_rows():
+    with connect(LMS_ENGINE) as conn:
+        return conn.execute(
+            text("SELECT userId, username, moodleUserId FROM account")
+        ).mappings().all()
 
 
-def get_admin_overall():
-    with LMS_ENGINE.connect() as conn:
-        total_users = conn.execute(text("SELECT COUNT(*) AS c FROM account")).scalar()
+def _get_account_summary():
+    account_rows = _get_account_rows()
+    with connect(LMS_ENGINE) as conn:
         role_rows = conn.execute(
             text(
                 """
@@ -40,10 +145,6 @@ def get_admin_overall():
             )
         ).scalar()
 
-        moodle_ids_rows = conn.execute(
-            text("SELECT moodleUserId FROM account WHERE moodleUserId IS NOT NULL")
-        ).mappings().all()
-
         mentor_load_rows = conn.execute(
             text(
                 """
@@ -55,122 +156,323 @@ def get_admin_overall():
                 """
             )
         ).mappings().all()
-    moodle_ids = [int(r["moodleUserId"]) for r in moodle_ids_rows if r["moodleUserId"]]
+    return {
+        "total_users": len(account_rows),
+        "role_rows": role_rows,
+        "new_users_week": new_users_week,
+        "new_users_month": new_users_month,
+        "moodle_ids": [int(r["moodleUserId"]) for r in account_rows if r["moodleUserId"]],
+        "mentor_load_rows": mentor_load_rows,
+    }
+
+
+def _get_last_activity_rows(moodle_ids: list[int]):
+    if not moodle_ids:
+        return []
+    engine, table, ts_column = _last_activity_source()
+    return _fetch_by_ids(
+        engine,
+        f"""
+        SELECT userid, MAX({ts_column}) AS last_ts
+        FROM {table}
+        WHERE userid IN ({{ids}})
+        GROUP BY userid
+        """,
+        {},
+        moodle_ids,
+        safe=False,
+    )
+
+
+# Both the rollup and the raw log path bucket by UTC day number
+# (timecreated // DAY_SECONDS) and by SLOT_SECONDS slot start (epoch seconds),
+# over the same windows, so they return the same rows.
+def _get_active_users_trend_rows(moodle_ids: list[int]):
+    if not moodle_ids:
+        return []
+    first_day = _first_day(7)
+    rows = None
+    if rollup_covers(first_day * DAY_SECONDS):
+        rows = _from_rollup(_get_rollup_active_users_rows, moodle_ids, first_day)
+    if rows is None:
+        prefix = MOODLE_DB_PREFIX
+        rows = _fetch_by_ids(
+            MOODLE_ENGINE,
+            f"""
+            SELECT FLOOR(timecreated / {DAY_SECONDS}) AS day,
+                   COUNT(DISTINCT userid) AS c
+            FROM {prefix}logstore_standard_log
+            WHERE userid IN ({{ids}})
+              AND timecreated >= :since
+            GROUP BY day
+            """,
+            {"since": first_day * DAY_SECONDS},
+            moodle_ids,
+            safe=False,
+        )
+    rows = _merge_rows(rows, ("day",), {"c": "sum"})
+    return _day_rows(rows)
+
+
+# UTC day number of the first of the last `days` days.
+def _first_day(days: int) -> int:
+    return int(time.time()) // DAY_SECONDS - (days - 1)
+
+
+# First slot of the last 24 hours.
+def _first_slot() -> int:
+    return (int(time.time()) - DAY_SECONDS) // SLOT_SECONDS * SLOT_SECONDS
+
+
+def _day_rows(rows) -> list[dict]:
+    return [{"d": day_key(int(r["day"])), "c": r["c"]} for r in rows]
+
+
+def _slot_rows(rows) -> list[dict]:
+    return [{"t": int(r["t"]), "c": r["c"]} for r in rows]
+
+
+# A failing rollup read (table missing, database down since the coverage
+# check) returns None and the caller queries the raw log instead.
+def _from_rollup(fn, *args):
+    try:
+        return fn(*args)
+    except SQLAlchemyError:
+        return None
+
+
+def _get_rollup_active_users_rows(moodle_ids: list[int], first_day: int):
+    return _fetch_by_ids(
+        ROLLUP_ENGINE,
+        f"""
+        SELECT day, COUNT(DISTINCT userid) AS c
+        FROM {DAILY_TABLE}
+        WHERE day >= :first_day AND userid IN ({{ids}})
+        GROUP BY day
+        """,
+        {"first_day": first_day},
+        moodle_ids,
+        safe=False,
+    )
+
+
+def _get_rollup_log_volume_rows(first_day: int):
+    with connect(ROLLUP_ENGINE) as conn:
+        rows = conn.execute(
+            text(
+                f"""
+                SELECT day, SUM(events) AS c
+                FROM {DAILY_TABLE}
+                WHERE day >= :first_day
+                GROUP BY day
+                """
+            ),
+            {"first_day": first_day},
+        ).mappings().all()
+    return _day_rows(rows)
+
+
+def _get_rollup_concurrent_rows(first_slot: int):
+    with connect(ROLLUP_ENGINE) as conn:
+        rows = conn.execute(
+            text(
+                f"""
+                SELECT slot AS t, COUNT(*) AS c
+                FROM {CONCURRENCY_TABLE}
+                WHERE slot >= :first_slot
+                GROUP BY slot
+                ORDER BY slot
+                """
+            ),
+            {"first_slot": first_slot},
+        ).mappings().all()
+    return _slot_rows(rows)
+
 
+# Log volume + event mix (7d) based on existing tables (no new table); the log
+# aggregates come from the rollups when they cover the window.
+def _get_log_activity_rows():
     prefix = MOODLE_DB_PREFIX
-    active_7d = 0
-    active_30d = 0
-    if moodle_ids:
-        in_users = ",".join(str(i) for i in moodle_ids)
-        with MOODLE_ENGINE.connect() as conn:
-            last_rows = conn.execute(
+    first_day = _first_day(7)
+    first_slot = _first_slot()
+    log_rows = None
+    concurrent_rows = None
+    if rollup_covers(first_day * DAY_SECONDS):
+        log_rows = _from_rollup(_get_rollup_log_volume_rows, first_day)
+    if rollup_covers(first_slot, table=CONCURRENCY_TABLE):
+        concurrent_rows = _from_rollup(_get_rollup_concurrent_rows, first_slot)
+    with connect(MOODLE_ENGINE) as conn:
+        if log_rows is None:
+            rows = conn.execute(
                 text(
                     f"""
-                    SELECT userid, MAX(timecreated) AS last_ts
+                    SELECT FLOOR(timecreated / {DAY_SECONDS}) AS day, COUNT(*) AS c
                     FROM {prefix}logstore_standard_log
-                    WHERE userid IN ({in_users})
-                    GROUP BY userid
+                    WHERE timecreated >= :since
+                    GROUP BY day
                     """
-                )
+                ),
+                {"since": first_day * DAY_SECONDS},
             ).mappings().all()
-        today = datetime.utcnow().date()
-        for r in last_rows:
-            ts = r["last_ts"]
-            if not ts:
-                continue
-            last_date = datetime.utcfromtimestamp(int(ts)).date()
-            if (today - last_date).days <= 7:
-                active_7d += 1
-            if (today - last_date).days <= 30:
-                active_30d += 1
-    inactive_7d = max(0, (len(moodle_ids) - active_7d))
-    inactive_30d = max(0, (len(moodle_ids) - active_30d))
-
-    users_trend = []
-    if moodle_ids:
-        in_users = ",".join(str(i) for i in moodle_ids)
-        with MOODLE_ENGINE.connect() as conn:
-            trend_rows = conn.execute(
+            log_rows = _day_rows(rows)
+        if concurrent_rows is None:
+            rows = conn.execute(
                 text(
                     f"""
-                    SELECT FROM_UNIXTIME(timecreated, '%Y-%m-%d') AS d,
+                    SELECT FLOOR(timecreated / {SLOT_SECONDS}) * {SLOT_SECONDS} AS t,
                            COUNT(DISTINCT userid) AS c
                     FROM {prefix}logstore_standard_log
-                    WHERE userid IN ({in_users})
-                      AND timecreated >= UNIX_TIMESTAMP(DATE_SUB(UTC_TIMESTAMP(), INTERVAL 6 DAY))
-                    GROUP BY d
+                    WHERE timecreated >= :first_slot
+                    GROUP BY t
+                    ORDER BY t
                     """
-                )
+                ),
+                {"first_slot": first_slot},
             ).mappings().all()
-        trend_map = {r["d"]: int(r["c"] or 0) for r in trend_rows}
-        for d in _date_keys(7):
-            users_trend.append(
-                {"date": f"{d} 00:00:00", "activeUsers": int(trend_map.get(d, 0))}
-            )
-
-    # Log volume + event mix (7d) based on existing tables (no new table)
-    log_volume = []
-    event_mix = []
-    concurrent_users = []
-    with MOODLE_ENGINE.connect() as conn:
-        log_rows = conn.execute(
-            text(
-                f"""
-                SELECT FROM_UNIXTIME(timecreated, '%Y-%m-%d') AS d, COUNT(*) AS c
-                FROM {prefix}logstore_standard_log
-                WHERE timecreated >= UNIX_TIMESTAMP(DATE_SUB(UTC_TIMESTAMP(), INTERVAL 6 DAY))
-                GROUP BY d
-                """
-            )
-        ).mappings().all()
-        concurrent_rows = conn.execute(
-            text(
-                f"""
-                SELECT FROM_UNIXTIME(FLOOR(timecreated/300)*300) AS t, COUNT(DISTINCT userid) AS c
-                FROM {prefix}logstore_standard_log
-                WHERE timecreated >= UNIX_TIMESTAMP(DATE_SUB(UTC_TIMESTAMP(), INTERVAL 1 DAY))
-                GROUP BY t
-                ORDER BY t
-                """
-            )
-        ).mappings().all()
-        completion_rows = conn.execute(
+            concurrent_rows = _slot_rows(rows)
+        rows = conn.execute(
             text(
                 f"""
-                SELECT FROM_UNIXTIME(cmc.timemodified, '%Y-%m-%d') AS d, COUNT(*) AS c
+                SELECT FLOOR(cmc.timemodified / {DAY_SECONDS}) AS day, COUNT(*) AS c
                 FROM {prefix}course_modules_completion cmc
-                WHERE cmc.timemodified >= UNIX_TIMESTAMP(DATE_SUB(UTC_TIMESTAMP(), INTERVAL 6 DAY))
-                GROUP BY d
+                WHERE cmc.timemodified >= :since
+                GROUP BY day
                 """
-            )
+            ),
+            {"since": first_day * DAY_SECONDS},
         ).mappings().all()
+        completion_rows = _day_rows(rows)
+    return {
+        "log_rows": log_rows,
+        "concurrent_rows": concurrent_rows,
+        "completion_rows": completion_rows,
+    }
+
 
-    with LMS_ENGINE.connect() as conn:
+@memoized
+def _get_post_comment_daily_rows(days: int):
+    with connect(LMS_ENGINE) as conn:
         post_rows = conn.execute(
             text(
-                """
+                f"""
                 SELECT DATE(createdAt) AS d, COUNT(*) AS c
                 FROM post
-                WHERE createdAt >= DATE_SUB(UTC_TIMESTAMP(), INTERVAL 6 DAY)
+                WHERE createdAt >= DATE_SUB(UTC_TIMESTAMP(), INTERVAL {days - 1} DAY)
                 GROUP BY d
                 """
             )
         ).mappings().all()
         comment_rows = conn.execute(
             text(
-                """
+                f"""
                 SELECT DATE(createdAt) AS d, COUNT(*) AS c
                 FROM comment
-                WHERE createdAt >= DATE_SUB(UTC_TIMESTAMP(), INTERVAL 6 DAY)
+                WHERE createdAt >= DATE_SUB(UTC_TIMESTAMP(), INTERVAL {days - 1} DAY)
                 GROUP BY d
                 """
             )
         ).mappings().all()
+    return {"post_rows": post_rows, "comment_rows": comment_rows}
+
+
+# Read by the overall alerts and the ideas mentorMatch block.
+@memoized
+def _get_mentor_overdue_count():
+    with connect(LMS_ENGINE) as conn:
+        return conn.execute(
+            text(
+                """
+                SELECT COUNT(*) AS c
+                FROM studentmentormatch
+                WHERE dueDate IS NOT NULL
+                  AND dueDate < UTC_TIMESTAMP()
+                  AND status NOT IN ('approve','reject','completed')
+                """
+            )
+        ).scalar()
+
+
+def _get_review_alert_counts():
+    with connect(LMS_ENGINE) as conn:
+        idea_pending = conn.execute(
+            text(
+                "SELECT COUNT(*) AS c FROM businessidea WHERE status IN ('submitted','underreview')"
+            )
+        ).scalar()
+    return {"idea_pending": idea_pending, "mentor_overdue": _get_mentor_overdue_count()}
+
+
+# The payload reads the last 7 days of post_comment; the dashboard passes 30 to
+# reuse the engagement section's rows.
+def _admin_overall_calls(post_comment_days: int = 7) -> dict:
+    return {
+        "accounts": (_get_account_summary,),
+        "log_activity": (_get_log_activity_rows,),
+        "post_comment": (_get_post_comment_daily_rows, post_comment_days),
+        "overdue_assignments": (_get_overdue_assignments_count,),
+        "review_alerts": (_get_review_alert_counts,),
+    }
 
-    log_map = {r["d"]: int(r["c"] or 0) for r in log_rows}
-    completion_map = {r["d"]: int(r["c"] or 0) for r in completion_rows}
-    post_map = {str(r["d"]): int(r["c"] or 0) for r in post_rows}
-    comment_map = {str(r["d"]): int(r["c"] or 0) for r in comment_rows}
+
+def _admin_user_activity_calls(moodle_ids: list[int]) -> dict:
+    return {
+        "last_rows": (_get_last_activity_rows, moodle_ids),
+        "trend_rows": (_get_active_users_trend_rows, moodle_ids),
+    }
+
+
+def get_admin_overall(fields: frozenset[str] | None = None, post_comment_days: int = 7):
+    plan = (ADMIN_OVERALL_FIELDS, ADMIN_OVERALL_EMPTY, fields)
+    data = _gather_fields(_admin_overall_calls(post_comment_days), *plan)
+    moodle_ids = data["accounts"]["moodle_ids"]
+    data.update(_gather_fields(_admin_user_activity_calls(moodle_ids), *plan))
+    return _pick_fields(_admin_overall_payload(data), fields)
+
+
+async def get_admin_overall_async(fields: frozenset[str] | None = None, post_comment_days: int = 7):
+    plan = (ADMIN_OVERALL_FIELDS, ADMIN_OVERALL_EMPTY, fields)
+    data = await _gather_fields_async(_admin_overall_calls(post_comment_days), *plan)
+    moodle_ids = data["accounts"]["moodle_ids"]
+    data.update(await _gather_fields_async(_admin_user_activity_calls(moodle_ids), *plan))
+    return _pick_fields(_admin_overall_payload(data), fields)
+
+
+@traced
+def _admin_overall_payload(data: dict):
+    accounts = data["accounts"]
+    moodle_ids = accounts["moodle_ids"]
+
+    active_7d = 0
+    active_30d = 0
+    today = datetime.utcnow().date()
+    for r in data["last_rows"]:
+        ts = r["last_ts"]
+        if not ts:
+            continue
+        last_date = datetime.utcfromtimestamp(int(ts)).date()
+        if (today - last_date).days <= 7:
+            active_7d += 1
+        if (today - last_date).days <= 30:
+            active_30d += 1
+    inactive_7d = max(0, (len(moodle_ids) - active_7d))
+    inactive_30d = max(0, (len(moodle_ids) - active_30d))
+
+    users_trend = []
+    if moodle_ids:
+        trend_map = {r["d"]: int(r["c"] or 0) for r in data["trend_rows"]}
+        for d in _date_keys(7):
+            users_trend.append(
+                {"date": f"{d} 00:00:00", "activeUsers": int(trend_map.get(d, 0))}
+            )
+
+    log_volume = []
+    event_mix = []
+    log_activity = data["log_activity"]
+    post_comment = data["post_comment"]
+    log_map = {r["d"]: int(r["c"] or 0) for r in log_activity["log_rows"]}
+    completion_map = {r["d"]: int(r["c"] or 0) for r in log_activity["completion_rows"]}
+    post_map = {str(r["d"]): int(r["c"] or 0) for r in post_comment["post_rows"]}
+    comment_map = {str(r["d"]): int(r["c"] or 0) for r in post_comment["comment_rows"]}
     for d in _date_keys(7):
         log_volume.append({"date": f"{d} 00:00:00", "logs": log_map.get(d, 0)})
         event_mix.append(
@@ -184,35 +486,21 @@ def get_admin_overall():
         )
 
     concurrent_users = [
-        {"date": _fmt_dt(r["t"]), "users": int(r["c"] or 0)} for r in concurrent_rows
+        {"date": _fmt_dt(r["t"]), "users": int(r["c"] or 0)}
+        for r in log_activity["concurrent_rows"]
     ]
 
-    overdue_assignments = _get_overdue_assignments_count()
-
-    with LMS_ENGINE.connect() as conn:
-        idea_pending = conn.execute(
-            text(
-                "SELECT COUNT(*) AS c FROM businessidea WHERE status IN ('submitted','underreview')"
-            )
-        ).scalar()
-        mentor_overdue = conn.execute(
-            text(
-                """
-                SELECT COUNT(*) AS c
-                FROM studentmentormatch
-                WHERE dueDate IS NOT NULL
-                  AND dueDate < UTC_TIMESTAMP()
-                  AND status NOT IN ('approve','reject','completed')
-                """
-            )
-        ).scalar()
+    overdue_assignments = data["overdue_assignments"]
+    review_alerts = data["review_alerts"]
 
     return {
         "users": {
-            "total": int(total_users or 0),
-            "byRole": {r["role"] or "unknown": int(r["c"] or 0) for r in role_rows},
-            "newWeek": int(new_users_week or 0),
-            "newMonth": int(new_users_month or 0),
+            "total": int(accounts["total_users"] or 0),
+            "byRole": {
+                r["role"] or "unknown": int(r["c"] or 0) for r in accounts["role_rows"]
+            },
+            "newWeek": int(accounts["new_users_week"] or 0),
+            "newMonth": int(accounts["new_users_month"] or 0),
             "active7d": int(active_7d),
             "inactive7d": int(inactive_7d),
             "active30d": int(active_30d),
@@ -226,32 +514,83 @@ def get_admin_overall():
         "concurrentUsers": concurrent_users,
         "mentorLoadTop": [
             {"mentorId": r["mentorId"], "matchCount": int(r["c"] or 0)}
-            for r in mentor_load_rows
+            for r in accounts["mentor_load_rows"]
         ],
         "alerts": {
             "assignmentOverdue": int(overdue_assignments),
-            "ideaPendingReview": int(idea_pending or 0),
-            "mentorMatchOverdue": int(mentor_overdue or 0),
+            "ideaPendingReview": int(review_alerts["idea_pending"] or 0),
+            "mentorMatchOverdue": int(review_alerts["mentor_overdue"] or 0),
         },
     }
 
 
-def get_admin_learning():
-    courses = _get_all_courses()
+def _get_completion_trend_rows():
+    prefix = MOODLE_DB_PREFIX
+    with connect(MOODLE_ENGINE) as conn:
+        return conn.execute(
+            text(
+                f"""
+                SELECT FROM_UNIXTIME(cmc.timemodified, '%Y-%m-%d') AS d,
+                       ROUND(100.0 * SUM(CASE WHEN cmc.completionstate IN (1,2) THEN 1 ELSE 0 END) / NULLIF(COUNT(*),0), 1) AS pct
+                FROM {prefix}course_modules_completion cmc
+                WHERE cmc.timemodified >= UNIX_TIMESTAMP(DATE_SUB(UTC_TIMESTAMP(), INTERVAL 29 DAY))
+                GROUP BY d
+                """
+            )
+        ).mappings().all()
+
+
+def _admin_learning_lookup_calls() -> dict:
+    return {
+        "courses": (_get_all_courses,),
+        "completion": (_get_completion_rate_overall,),
+        "students": (_get_all_students_moodle_ids,),
+        "completion_trend_rows": (_get_completion_trend_rows,),
+        "missing_counts": (_get_missing_counts_by_course,),
+    }
+
+
+def _admin_learning_calls(course_ids: list[int], students: list[int]) -> dict:
+    return {
+        "progress_map": (_get_progress_by_user, students),
+        "enrol_counts": (_get_course_enrol_counts, course_ids),
+    }
+
+
+def get_admin_learning(fields: frozenset[str] | None = None):
+    plan = (ADMIN_LEARNING_FIELDS, ADMIN_LEARNING_EMPTY, fields)
+    lookup = _gather_fields(_admin_learning_lookup_calls(), *plan)
+    course_ids = [c["courseId"] for c in lookup["courses"]]
+    data = _gather_fields(_admin_learning_calls(course_ids, lookup["students"]), *plan)
+    return _pick_fields(_admin_learning_payload(lookup, data), fields)
+
+
+async def get_admin_learning_async(fields: frozenset[str] | None = None):
+    plan = (ADMIN_LEARNING_FIELDS, ADMIN_LEARNING_EMPTY, fields)
+    lookup = await _gather_fields_async(_admin_learning_lookup_calls(), *plan)
+    course_ids = [c["courseId"] for c in lookup["courses"]]
+    data = await _gather_fields_async(
+        _admin_learning_calls(course_ids, lookup["students"]), *plan
+    )
+    return _pick_fields(_admin_learning_payload(lookup, data), fields)
+
+
+@traced
+def _admin_learning_payload(lookup: dict, data: dict):
+    courses = lookup["courses"]
     course_ids = [c["courseId"] for c in courses]
 
     total_courses = len(course_ids)
-    completion = _get_completion_rate_overall()
+    completion = lookup["completion"]
 
-    students = _get_all_students_moodle_ids()
-    progress_map = _get_progress_by_user(students)
+    progress_map = data["progress_map"]
     avg_progress = (
         round(sum(progress_map.values()) / len(progress_map), 1)
         if progress_map
         else 0
     )
 
-    enrol_counts = _get_course_enrol_counts(course_ids)
+    enrol_counts = data["enrol_counts"]
     top_courses = sorted(
         courses,
         key=lambda c: enrol_counts.get(c["courseId"], 0),
@@ -266,7 +605,7 @@ def get_admin_learning():
         for c in top_courses
     ]
 
-    missing_counts = _get_course_missing_counts(course_ids)
+    missing_counts = lookup["missing_counts"]
     missing_rows = []
     for c in courses:
         cid = c["courseId"]
@@ -285,20 +624,7 @@ def get_admin_learning():
     top_missing = sorted(missing_rows, key=lambda r: r["missingRate"], reverse=True)[:5]
 
     completion_trend = []
-    prefix = MOODLE_DB_PREFIX
-    with MOODLE_ENGINE.connect() as conn:
-        rows = conn.execute(
-            text(
-                f"""
-                SELECT FROM_UNIXTIME(cmc.timemodified, '%Y-%m-%d') AS d,
-                       ROUND(100.0 * SUM(CASE WHEN cmc.completionstate IN (1,2) THEN 1 ELSE 0 END) / NULLIF(COUNT(*),0), 1) AS pct
-                FROM {prefix}course_modules_completion cmc
-                WHERE cmc.timemodified >= UNIX_TIMESTAMP(DATE_SUB(UTC_TIMESTAMP(), INTERVAL 29 DAY))
-                GROUP BY d
-                """
-            )
-        ).mappings().all()
-    trend_map = {r["d"]: float(r["pct"] or 0) for r in rows}
+    trend_map = {r["d"]: float(r["pct"] or 0) for r in lookup["completion_trend_rows"]}
     for d in _date_keys(30):
         completion_trend.append(
             {"date": f"{d} 00:00:00", "completionPct": trend_map.get(d, 0)}
@@ -314,8 +640,8 @@ def get_admin_learning():
     }
 
 
-def get_admin_engagement():
-    with LMS_ENGINE.connect() as conn:
+def _get_engagement_totals():
+    with connect(LMS_ENGINE) as conn:
         total_posts = conn.execute(text("SELECT COUNT(*) AS c FROM post")).scalar()
         total_comments = conn.execute(
             text("SELECT COUNT(*) AS c FROM comment")
@@ -323,7 +649,15 @@ def get_admin_engagement():
         total_reactions = conn.execute(
             text("SELECT COUNT(*) AS c FROM reaction")
         ).scalar()
+    return {
+        "posts": int(total_posts or 0),
+        "comments": int(total_comments or 0),
+        "reactions": int(total_reactions or 0),
+    }
 
+
+def _get_engagement_scores():
+    with connect(LMS_ENGINE) as conn:
         post_rows = conn.execute(
             text("SELECT authorId, COUNT(*) AS c FROM post GROUP BY authorId")
         ).mappings().all()
@@ -333,12 +667,6 @@ def get_admin_engagement():
         reaction_rows = conn.execute(
             text("SELECT authorId, COUNT(*) AS c FROM reaction GROUP BY authorId")
         ).mappings().all()
-
-        users_rows = conn.execute(
-            text("SELECT userId, username, moodleUserId FROM account")
-        ).mappings().all()
-
-    user_map = {r["userId"]: r for r in users_rows}
     score = {}
     for r in post_rows:
         score[r["authorId"]] = score.get(r["authorId"], 0) + int(r["c"] or 0)
@@ -346,6 +674,36 @@ def get_admin_engagement():
         score[r["authorId"]] = score.get(r["authorId"], 0) + int(r["c"] or 0)
     for r in reaction_rows:
         score[r["authorId"]] = score.get(r["authorId"], 0) + int(r["c"] or 0)
+    return score
+
+
+def _admin_engagement_calls() -> dict:
+    return {
+        "totals": (_get_engagement_totals,),
+        "score": (_get_engagement_scores,),
+        "users_rows": (_get_account_rows,),
+        "post_comment": (_get_post_comment_daily_rows, 30),
+    }
+
+
+def get_admin_engagement(fields: frozenset[str] | None = None):
+    data = _gather_fields(
+        _admin_engagement_calls(), ADMIN_ENGAGEMENT_FIELDS, ADMIN_ENGAGEMENT_EMPTY, fields
+    )
+    return _pick_fields(_admin_engagement_payload(data), fields)
+
+
+async def get_admin_engagement_async(fields: frozenset[str] | None = None):
+    data = await _gather_fields_async(
+        _admin_engagement_calls(), ADMIN_ENGAGEMENT_FIELDS, ADMIN_ENGAGEMENT_EMPTY, fields
+    )
+    return _pick_fields(_admin_engagement_payload(data), fields)
+
+
+@traced
+def _admin_engagement_payload(data: dict):
+    user_map = {r["userId"]: r for r in data["users_rows"]}
+    score = data["score"]
 
     top_users = sorted(score.items(), key=lambda x: x[1], reverse=True)[:5]
     top_users = [
@@ -358,30 +716,9 @@ def get_admin_engagement():
         for uid, cnt in top_users
     ]
 
-    with LMS_ENGINE.connect() as conn:
-        post_rows = conn.execute(
-            text(
-                """
-                SELECT DATE(createdAt) AS d, COUNT(*) AS c
-                FROM post
-                WHERE createdAt >= DATE_SUB(UTC_TIMESTAMP(), INTERVAL 29 DAY)
-                GROUP BY d
-                """
-            )
-        ).mappings().all()
-        comment_rows = conn.execute(
-            text(
-                """
-                SELECT DATE(createdAt) AS d, COUNT(*) AS c
-                FROM comment
-                WHERE createdAt >= DATE_SUB(UTC_TIMESTAMP(), INTERVAL 29 DAY)
-                GROUP BY d
-                """
-            )
-        ).mappings().all()
-
-    post_map = {str(r["d"]): int(r["c"] or 0) for r in post_rows}
-    comment_map = {str(r["d"]): int(r["c"] or 0) for r in comment_rows}
+    post_comment = data["post_comment"]
+    post_map = {str(r["d"]): int(r["c"] or 0) for r in post_comment["post_rows"]}
+    comment_map = {str(r["d"]): int(r["c"] or 0) for r in post_comment["comment_rows"]}
     timeline = []
     for d in _date_keys(30):
         timeline.append(
@@ -393,18 +730,14 @@ def get_admin_engagement():
         )
 
     return {
-        "totals": {
-            "posts": int(total_posts or 0),
-            "comments": int(total_comments or 0),
-            "reactions": int(total_reactions or 0),
-        },
+        "totals": data["totals"],
         "topUsers": top_users,
         "timeline30d": timeline,
     }
 
 
-def get_admin_ideas():
-    with LMS_ENGINE.connect() as conn:
+def _get_idea_counts():
+    with connect(LMS_ENGINE) as conn:
         total_ideas = conn.execute(
             text("SELECT COUNT(*) AS c FROM businessidea")
         ).scalar()
@@ -417,21 +750,14 @@ def get_admin_ideas():
                 """
             )
         ).mappings().all()
+    return {"total_ideas": total_ideas, "status_rows": status_rows}
+
 
+def _get_mentor_match_counts():
+    with connect(LMS_ENGINE) as conn:
         match_total = conn.execute(
             text("SELECT COUNT(*) AS c FROM studentmentormatch")
         ).scalar()
-        match_overdue = conn.execute(
-            text(
-                """
-                SELECT COUNT(*) AS c
-                FROM studentmentormatch
-                WHERE dueDate IS NOT NULL
-                  AND dueDate < UTC_TIMESTAMP()
-                  AND status NOT IN ('approve','reject','completed')
-                """
-            )
-        ).scalar()
         match_upcoming = conn.execute(
             text(
                 """
@@ -443,14 +769,29 @@ def get_admin_ideas():
                 """
             )
         ).scalar()
+    return {
+        "total": int(match_total or 0),
+        "overdue": int(_get_mentor_overdue_count() or 0),
+        "upcoming7d": int(match_upcoming or 0),
+    }
 
+
+def _get_pitch_totals():
+    with connect(LMS_ENGINE) as conn:
         pitch_total = conn.execute(
             text("SELECT COUNT(*) AS c FROM pitchperfect")
         ).scalar()
         funding_total = conn.execute(
             text("SELECT SUM(funding) AS s FROM pitchperfect")
         ).scalar()
+    return {
+        "total": int(pitch_total or 0),
+        "fundingTotal": float(funding_total or 0),
+    }
+
 
+def _get_idea_trend_rows():
+    with connect(LMS_ENGINE) as conn:
         idea_rows = conn.execute(
             text(
                 """
@@ -474,14 +815,41 @@ def get_admin_ideas():
                 """
             )
         ).mappings().all()
+    return {"idea_rows": idea_rows, "pitch_rows": pitch_rows}
+
+
+def _admin_ideas_calls() -> dict:
+    return {
+        "ideas": (_get_idea_counts,),
+        "mentor_match": (_get_mentor_match_counts,),
+        "pitch": (_get_pitch_totals,),
+        "trend_rows": (_get_idea_trend_rows,),
+    }
+
+
+def get_admin_ideas(fields: frozenset[str] | None = None):
+    data = _gather_fields(_admin_ideas_calls(), ADMIN_IDEAS_FIELDS, ADMIN_IDEAS_EMPTY, fields)
+    return _pick_fields(_admin_ideas_payload(data), fields)
+
 
-    idea_map = {str(r["d"]): int(r["c"] or 0) for r in idea_rows}
+async def get_admin_ideas_async(fields: frozenset[str] | None = None):
+    data = await _gather_fields_async(
+        _admin_ideas_calls(), ADMIN_IDEAS_FIELDS, ADMIN_IDEAS_EMPTY, fields
+    )
+    return _pick_fields(_admin_ideas_payload(data), fields)
+
+
+@traced
+def _admin_ideas_payload(data: dict):
+    ideas = data["ideas"]
+    trend_rows = data["trend_rows"]
+    idea_map = {str(r["d"]): int(r["c"] or 0) for r in trend_rows["idea_rows"]}
     pitch_map = {
         str(r["d"]): {
             "pitchCount": int(r["pitch_count"] or 0),
             "fundingTotal": float(r["funding_total"] or 0),
         }
-        for r in pitch_rows
+        for r in trend_rows["pitch_rows"]
     }
     ideas_trend = []
     pitch_trend = []
@@ -497,17 +865,101 @@ def get_admin_ideas():
         )
 
     return {
-        "ideasTotal": int(total_ideas or 0),
-        "ideasByStatus": {r["status"]: int(r["c"] or 0) for r in status_rows},
-        "mentorMatch": {
-            "total": int(match_total or 0),
-            "overdue": int(match_overdue or 0),
-            "upcoming7d": int(match_upcoming or 0),
-        },
-        "pitch": {
-            "total": int(pitch_total or 0),
-            "fundingTotal": float(funding_total or 0),
-        },
+        "ideasTotal": int(ideas["total_ideas"] or 0),
+        "ideasByStatus": {r["status"]: int(r["c"] or 0) for r in ideas["status_rows"]},
+        "mentorMatch": data["mentor_match"],
+        "pitch": data["pitch"],
         "ideasTrend30d": ideas_trend,
         "pitchTrend30d": pitch_trend,
     }
+
+
+# Sub-queries more than one section reads: name -> (sections that read it,
+# call). Those whose readers are all selected run once up front, side by side,
+# and are served to the sections from the request memo.
+_DASHBOARD_SHARED_DAYS = 30
+_DASHBOARD_SHARED = {
+    "post_comment": ({"overall", "engagement"}, (_get_post_comment_daily_rows, _DASHBOARD_SHARED_DAYS)),
+    "account_rows": ({"overall", "engagement"}, (_get_account_rows,)),
+    "missing_counts": ({"overall", "learning"}, (_get_missing_counts_by_course,)),
+    "mentor_overdue": ({"overall", "ideas"}, (_get_mentor_overdue_count,)),
+}
+
+
+def _ms_since(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    return fn(*args), _ms_since(started)
+
+
+async def _timed_async(fn, *args):
+    started = time.perf_counter()
+    return await fn(*args), _ms_since(started)
+
+
+def _admin_dashboard_sections(fields) -> list[str]:
+    sections = list(ADMIN_DASHBOARD_SECTIONS)
+    if fields is None:
+        return sections
+    unknown = fields - set(sections)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [name for name in sections if name in fields]
+
+
+def _dashboard_shared_calls(sections: list[str]) -> dict:
+    return {
+        name: call
+        for name, (readers, call) in _DASHBOARD_SHARED.items()
+        if readers.issubset(sections)
+    }
+
+
+def _admin_dashboard_payload(results: dict, shared_ms: float | None, started: float):
+    payload = {name: result for name, (result, _) in results.items()}
+    timings = {} if shared_ms is None else {"shared": shared_ms}
+    payload["timingsMs"] = {
+        **timings,
+        **{name: ms for name, (_, ms) in results.items()},
+        "total": _ms_since(started),
+    }
+    return payload
+
+
+# The four admin sections in one response, computed at once; fields= picks
+# sections. timingsMs has the wall time of each section and, when they ran,
+# of the shared sub-queries.
+def get_admin_dashboard(fields: frozenset[str] | None = None):
+    started = time.perf_counter()
+    sections = _admin_dashboard_sections(fields)
+    shared = _dashboard_shared_calls(sections)
+    shared_ms = _timed(_gather_calls, shared)[1] if shared else None
+    calls = {
+        "overall": lambda: _timed(get_admin_overall, None, _DASHBOARD_SHARED_DAYS),
+        "learning": lambda: _timed(get_admin_learning),
+        "engagement": lambda: _timed(get_admin_engagement),
+        "ideas": lambda: _timed(get_admin_ideas),
+    }
+    results = run_sections({name: calls[name] for name in sections})
+    return _admin_dashboard_payload(results, shared_ms, started)
+
+
+async def get_admin_dashboard_async(fields: frozenset[str] | None = None):
+    started = time.perf_counter()
+    sections = _admin_dashboard_sections(fields)
+    shared = _dashboard_shared_calls(sections)
+    shared_ms = (await _timed_async(_gather_calls_async, shared))[1] if shared else None
+    calls = {
+        "overall": lambda: _timed_async(get_admin_overall_async, None, _DASHBOARD_SHARED_DAYS),
+        "learning": lambda: _timed_async(get_admin_learning_async),
+        "engagement": lambda: _timed_async(get_admin_engagement_async),
+        "ideas": lambda: _timed_async(get_admin_ideas_async),
+    }
+    outcomes = await asyncio.gather(*(calls[name]() for name in sections), return_exceptions=True)
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            raise outcome
+    return _admin_dashboard_payload(dict(zip(sections, outcomes)), shared_ms, started)
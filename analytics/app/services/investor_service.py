@@ -1,8 +1,10 @@
 from fastapi import HTTPException
 from sqlalchemy import text
 
-from ..db import LMS_ENGINE
-from ..routers.common import _fmt_dt
+from ..db import LMS_ENGINE, connect, run_async
+from ..metrics import count_swallowed_error
+from ..routers.common import _fmt_dt, _gather_fields, _gather_fields_async, _pick_fields
+from ..server_timing import traced
 
 
 def _pitch_score(status: str | None, funding: float | None) -> float:
@@ -15,10 +17,28 @@ def _pitch_score(status: str | None, funding: float | None) -> float:
     return round(min(100, base + bonus), 1)
 
 
+# payload field -> calls it reads (fields= selection); pitch_rows always runs
+# because an investor without pitches is a 404.
+INVESTOR_OVERALL_FIELDS = {
+    "investorId": (),
+    "pitchTotal": ("counts",),
+    "fundingTotal": ("counts",),
+    "upcomingPitches7d": ("counts",),
+    "readyToInvest": (),
+    "investedIdeas": ("progress_map",),
+    "newIdeas": ("progress_map",),
+    "rankingTable": ("progress_map",),
+    "ideaByDomain": ("domain_rows",),
+}
+INVESTOR_OVERALL_EMPTY = {
+    "counts": {"pitch_total": 0, "funding_total": 0, "upcoming_pitches": 0},
+    "domain_rows": [],
+    "progress_map": {},
+}
 
 
-def get_investor_overall(investor_id: str):
-    with LMS_ENGINE.connect() as conn:
+def _get_investor_pitch_counts(investor_id: str):
+    with connect(LMS_ENGINE) as conn:
         pitch_total = conn.execute(
             text("SELECT COUNT(*) AS c FROM pitchperfect WHERE investorId = :iid"),
             {"iid": investor_id},
@@ -41,8 +61,16 @@ def get_investor_overall(investor_id: str):
             ),
             {"iid": investor_id},
         ).scalar()
+    return {
+        "pitch_total": pitch_total,
+        "funding_total": funding_total,
+        "upcoming_pitches": upcoming_pitches,
+    }
+
 
-        pitch_rows = conn.execute(
+def _get_investor_pitch_rows(investor_id: str):
+    with connect(LMS_ENGINE) as conn:
+        return conn.execute(
             text(
                 """
                 SELECT p.ideaId, p.status, p.funding, p.eventDate, b.name, b.status AS ideaStatus, b.tags
@@ -54,7 +82,10 @@ def get_investor_overall(investor_id: str):
             {"iid": investor_id},
         ).mappings().all()
 
-        domain_rows = conn.execute(
+
+def _get_investor_domain_rows(investor_id: str):
+    with connect(LMS_ENGINE) as conn:
+        return conn.execute(
             text(
                 """
                 SELECT
@@ -72,14 +103,11 @@ def get_investor_overall(investor_id: str):
             {"iid": investor_id},
         ).mappings().all()
 
-    scores = [
-        _pitch_score(r.get("status"), float(r.get("funding") or 0))
-        for r in pitch_rows
-    ]
-    top_ideas = []
+
+def _get_idea_progress_map():
     progress_map = {}
     try:
-        with LMS_ENGINE.connect() as conn:
+        with connect(LMS_ENGINE) as conn:
             prog_rows = conn.execute(
                 text(
                     """
@@ -98,8 +126,49 @@ def get_investor_overall(investor_id: str):
                 int(r.get("completionPercentage") or 0),
             )
     except Exception:
+        count_swallowed_error()
         progress_map = {}
+    return progress_map
+
+
+def _investor_overall_calls(investor_id: str) -> dict:
+    return {
+        "counts": (_get_investor_pitch_counts, investor_id),
+        "pitch_rows": (_get_investor_pitch_rows, investor_id),
+        "domain_rows": (_get_investor_domain_rows, investor_id),
+        "progress_map": (_get_idea_progress_map,),
+    }
+
+
+def get_investor_overall(investor_id: str, fields: frozenset[str] | None = None):
+    data = _gather_fields(
+        _investor_overall_calls(investor_id), INVESTOR_OVERALL_FIELDS, INVESTOR_OVERALL_EMPTY, fields
+    )
+    return _pick_fields(_investor_overall_payload(investor_id, data), fields)
+
 
+async def get_investor_overall_async(investor_id: str, fields: frozenset[str] | None = None):
+    data = await _gather_fields_async(
+        _investor_overall_calls(investor_id), INVESTOR_OVERALL_FIELDS, INVESTOR_OVERALL_EMPTY, fields
+    )
+    return _pick_fields(_investor_overall_payload(investor_id, data), fields)
+
+
+@traced
+def _investor_overall_payload(investor_id: str, data: dict):
+    counts = data["counts"]
+    pitch_total = counts["pitch_total"]
+    funding_total = counts["funding_total"]
+    upcoming_pitches = counts["upcoming_pitches"]
+    pitch_rows = data["pitch_rows"]
+    domain_rows = data["domain_rows"]
+    progress_map = data["progress_map"]
+
+    scores = [
+        _pitch_score(r.get("status"), float(r.get("funding") or 0))
+        for r in pitch_rows
+    ]
+    top_ideas = []
     for r in pitch_rows:
         score = _pitch_score(r.get("status"), float(r.get("funding") or 0))
         top_ideas.append(
@@ -140,8 +209,8 @@ def get_investor_overall(investor_id: str):
     }
 
 
-def get_investor_invested_ideas(investor_id: str):
-    with LMS_ENGINE.connect() as conn:
+def get_investor_invested_ideas(investor_id: str, fields: frozenset[str] | None = None):
+    with connect(LMS_ENGINE) as conn:
         rows = conn.execute(
             text(
                 """
@@ -171,15 +240,22 @@ def get_investor_invested_ideas(investor_id: str):
         for r in rows
     ]
 
-    return {
-        "investorId": investor_id,
-        "totalInvested": len(ideas),
-        "ideas": ideas,
-    }
+    return _pick_fields(
+        {
+            "investorId": investor_id,
+            "totalInvested": len(ideas),
+            "ideas": ideas,
+        },
+        fields,
+    )
 
 
-def get_investor_per_idea(investor_id: str, idea_id: str | None = None, mentor_id: str | None = None, student_id: str | None = None):
-    with LMS_ENGINE.connect() as conn:
+async def get_investor_invested_ideas_async(investor_id: str, fields: frozenset[str] | None = None):
+    return await run_async(get_investor_invested_ideas, investor_id, fields)
+
+
+def get_investor_per_idea(investor_id: str, idea_id: str | None = None, mentor_id: str | None = None, student_id: str | None = None, fields: frozenset[str] | None = None):
+    with connect(LMS_ENGINE) as conn:
         rows = conn.execute(
             text(
                 """
@@ -246,4 +322,8 @@ def get_investor_per_idea(investor_id: str, idea_id: str | None = None, mentor_i
     if not items:
         raise HTTPException(status_code=404, detail="No idea found for investor")
 
-    return {"ideas": items}
+    return _pick_fields({"ideas": items}, fields)
+
+
+async def get_investor_per_idea_async(investor_id: str, idea_id: str | None = None, mentor_id: str | None = None, student_id: str | None = None, fields: frozenset[str] | None = None):
+    return await run_async(get_investor_per_idea, investor_id, idea_id, mentor_id, student_id, fields)
@@ -1,12 +1,30 @@
 from datetime import datetime, timedelta
 from fastapi import HTTPException
 
-from ..routers.common import _get_lms_user_id, _mentor_build_rows
+from ..routers.common import (
+    _get_lms_user_id,
+    _mentor_build_rows,
+    _mentor_build_rows_async,
+    _pick_fields,
+)
+from ..db import run_async
+from ..server_timing import traced
 
 
-def get_mentor_overall(mentor_id: int):
+def get_mentor_overall(mentor_id: int, fields: frozenset[str] | None = None):
     mentor_lms_id = _get_lms_user_id(mentor_id)
     rows = _mentor_build_rows(mentor_lms_id)
+    return _pick_fields(_mentor_overall_payload(mentor_id, rows), fields)
+
+
+async def get_mentor_overall_async(mentor_id: int, fields: frozenset[str] | None = None):
+    mentor_lms_id = await run_async(_get_lms_user_id, mentor_id)
+    rows = await _mentor_build_rows_async(mentor_lms_id)
+    return _pick_fields(_mentor_overall_payload(mentor_id, rows), fields)
+
+
+@traced
+def _mentor_overall_payload(mentor_id: int, rows: list):
     if not rows:
         raise HTTPException(status_code=404, detail="mentor_id not found")
 
@@ -114,9 +132,20 @@ def get_mentor_overall(mentor_id: int):
     }
 
 
-def get_mentor_per_idea(mentor_id: int, idea_id: str | None = None):
+def get_mentor_per_idea(mentor_id: int, idea_id: str | None = None, fields: frozenset[str] | None = None):
     mentor_lms_id = _get_lms_user_id(mentor_id)
     rows = _mentor_build_rows(mentor_lms_id)
+    return _pick_fields(_mentor_per_idea_payload(mentor_id, idea_id, rows), fields)
+
+
+async def get_mentor_per_idea_async(mentor_id: int, idea_id: str | None = None, fields: frozenset[str] | None = None):
+    mentor_lms_id = await run_async(_get_lms_user_id, mentor_id)
+    rows = await _mentor_build_rows_async(mentor_lms_id)
+    return _pick_fields(_mentor_per_idea_payload(mentor_id, idea_id, rows), fields)
+
+
+@traced
+def _mentor_per_idea_payload(mentor_id: int, idea_id: str | None, rows: list):
     if not rows:
         raise HTTPException(status_code=404, detail="mentor_id not found")
 
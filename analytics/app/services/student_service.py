@@ -17,20 +17,182 @@ from ..routers.common import (
     _get_course_activities,
     _get_missing_count,
     _get_learning_hours_per_day,
+    _get_lms_user_ids,
+    _get_overall_courses_by_user,
+    _get_course_avg_grade_by_user,
+    _get_engagement_by_user,
+    _get_learning_trend_by_user,
+    _get_missing_tasks_by_user,
+    _get_due_soon_tasks_by_user,
+    _get_last_activity_by_user_all,
+    _get_continue_learning_by_user,
+    _gather_calls,
+    _gather_calls_async,
+    _gather_fields,
+    _gather_fields_async,
+    _pick_fields,
 )
+from ..db import run_async
+from ..server_timing import traced
 from fastapi import HTTPException
 
 
-def get_student_overall(moodle_user_id: int):
+# payload field -> calls it reads (fields= selection)
+STUDENT_OVERALL_FIELDS = {
+    "courses": ("courses_overall",),
+    "summary": ("courses_overall", "avg_grade_map"),
+    "activity": ("learning_daily", "last_ts"),
+    "totals": ("missing_tasks", "due_soon_tasks"),
+    "engagement": ("engagement",),
+    "trend": ("learning_daily", "engagement"),
+    "missingTasks": ("missing_tasks",),
+    "dueSoonTasks": ("due_soon_tasks",),
+    "continueLearning": ("continue_learning",),
+    "lastActive": ("last_ts",),
+    "daysInactive": ("last_ts",),
+}
+STUDENT_OVERALL_EMPTY = {
+    "courses_overall": {},
+    "avg_grade_map": {},
+    "engagement": {"counts": {}, "daily": []},
+    "learning_daily": [],
+    "missing_tasks": [],
+    "due_soon_tasks": [],
+    "last_ts": None,
+    "continue_learning": None,
+}
+
+# Bulk calls return {user id: value}; users missing from a map get the
+# single-user empty value.
+STUDENTS_OVERALL_EMPTY = {name: {} for name in STUDENT_OVERALL_EMPTY}
+
+STUDENT_COURSE_FIELDS = {
+    "courseInfo": ("teacher_name", "tags"),
+    "progress": (),
+    "avgGradePct": ("avg_grade_map",),
+    "missingTasks": ("missing_cnt",),
+    "lastActive": ("last_activity_map",),
+    "daysInactive": ("last_activity_map",),
+    "timeSpentHours": ("hours_per_day",),
+    "learningHoursPerWeek": ("hours_per_day",),
+    "hoursPerDay": ("hours_per_day",),
+    "progressDonut": (),
+    "activities": ("activities",),
+}
+STUDENT_COURSE_EMPTY = {
+    "avg_grade_map": {},
+    "last_activity_map": {},
+    "missing_cnt": 0,
+    "activities": [],
+    "hours_per_day": [],
+    "teacher_name": None,
+    "tags": [],
+}
+
+
+def _student_overall_calls(moodle_user_id: int, lms_user_id: str) -> dict:
+    return {
+        "courses_overall": (_get_overall_courses, moodle_user_id),
+        "avg_grade_map": (_get_course_avg_grade, moodle_user_id),
+        "engagement": (_get_engagement, lms_user_id, 7),
+        "learning_daily": (_get_learning_trend, moodle_user_id, 7),
+        "missing_tasks": (_get_missing_tasks, moodle_user_id),
+        "due_soon_tasks": (_get_due_soon_tasks, moodle_user_id, 7),
+        "last_ts": (_get_last_activity_overall, moodle_user_id),
+        "continue_learning": (_get_continue_learning, moodle_user_id),
+    }
+
+
+def get_student_overall(moodle_user_id: int, fields: frozenset[str] | None = None):
     lms_user_id = _get_lms_user_id(moodle_user_id)
-    courses_overall = _get_overall_courses(moodle_user_id)
-    avg_grade_map = _get_course_avg_grade(moodle_user_id)
-    engagement = _get_engagement(lms_user_id, days=7)
-    learning_daily = _get_learning_trend(moodle_user_id, days=7)
-    missing_tasks = _get_missing_tasks(moodle_user_id)
-    due_soon_tasks = _get_due_soon_tasks(moodle_user_id, days=7)
-    last_ts = _get_last_activity_overall(moodle_user_id)
-    continue_learning = _get_continue_learning(moodle_user_id)
+    data = _gather_fields(
+        _student_overall_calls(moodle_user_id, lms_user_id),
+        STUDENT_OVERALL_FIELDS,
+        STUDENT_OVERALL_EMPTY,
+        fields,
+    )
+    return _pick_fields(_student_overall_payload(data), fields)
+
+
+async def get_student_overall_async(moodle_user_id: int, fields: frozenset[str] | None = None):
+    lms_user_id = await run_async(_get_lms_user_id, moodle_user_id)
+    data = await _gather_fields_async(
+        _student_overall_calls(moodle_user_id, lms_user_id),
+        STUDENT_OVERALL_FIELDS,
+        STUDENT_OVERALL_EMPTY,
+        fields,
+    )
+    return _pick_fields(_student_overall_payload(data), fields)
+
+
+def _students_overall_calls(moodle_user_ids: list[int], lms_user_ids: list[str]) -> dict:
+    return {
+        "courses_overall": (_get_overall_courses_by_user, moodle_user_ids),
+        "avg_grade_map": (_get_course_avg_grade_by_user, moodle_user_ids),
+        "engagement": (_get_engagement_by_user, lms_user_ids, 7),
+        "learning_daily": (_get_learning_trend_by_user, moodle_user_ids, 7),
+        "missing_tasks": (_get_missing_tasks_by_user, moodle_user_ids),
+        "due_soon_tasks": (_get_due_soon_tasks_by_user, moodle_user_ids, 7),
+        "last_ts": (_get_last_activity_by_user_all, moodle_user_ids),
+        "continue_learning": (_get_continue_learning_by_user, moodle_user_ids),
+    }
+
+
+# Same payload as student-overall for every user, from one query per helper.
+# Users without an LMS account are listed in notFound.
+def get_students_overall(moodle_user_ids: tuple[int, ...], fields: frozenset[str] | None = None):
+    lms_user_ids = _get_lms_user_ids(moodle_user_ids)
+    found = [uid for uid in moodle_user_ids if uid in lms_user_ids]
+    data = _gather_fields(
+        _students_overall_calls(found, sorted(set(lms_user_ids.values()))),
+        STUDENT_OVERALL_FIELDS,
+        STUDENTS_OVERALL_EMPTY,
+        fields,
+    )
+    return _students_overall_payload(moodle_user_ids, lms_user_ids, data, fields)
+
+
+async def get_students_overall_async(moodle_user_ids: tuple[int, ...], fields: frozenset[str] | None = None):
+    lms_user_ids = await run_async(_get_lms_user_ids, moodle_user_ids)
+    found = [uid for uid in moodle_user_ids if uid in lms_user_ids]
+    data = await _gather_fields_async(
+        _students_overall_calls(found, sorted(set(lms_user_ids.values()))),
+        STUDENT_OVERALL_FIELDS,
+        STUDENTS_OVERALL_EMPTY,
+        fields,
+    )
+    return _students_overall_payload(moodle_user_ids, lms_user_ids, data, fields)
+
+
+@traced
+def _students_overall_payload(moodle_user_ids: tuple[int, ...], lms_user_ids: dict, data: dict, fields):
+    students = {}
+    for uid in moodle_user_ids:
+        if uid not in lms_user_ids:
+            continue
+        user_data = {
+            name: data[name].get(
+                lms_user_ids[uid] if name == "engagement" else uid, STUDENT_OVERALL_EMPTY[name]
+            )
+            for name in STUDENT_OVERALL_EMPTY
+        }
+        students[str(uid)] = _pick_fields(_student_overall_payload(user_data), fields)
+    return {
+        "students": students,
+        "notFound": [uid for uid in moodle_user_ids if uid not in lms_user_ids],
+    }
+
+
+@traced
+def _student_overall_payload(data: dict):
+    courses_overall = data["courses_overall"]
+    avg_grade_map = data["avg_grade_map"]
+    engagement = data["engagement"]
+    learning_daily = data["learning_daily"]
+    missing_tasks = data["missing_tasks"]
+    due_soon_tasks = data["due_soon_tasks"]
+    last_ts = data["last_ts"]
+    continue_learning = data["continue_learning"]
     if last_ts:
         last_active = _fmt_dt(last_ts)
         days_inactive = (
@@ -78,17 +240,65 @@ def get_student_overall(moodle_user_id: int):
     }
 
 
-def get_student_per_course(moodle_user_id: int, course_id: int):
-    _ = _get_lms_user_id(moodle_user_id)
-    course_progress = _get_course_progress(moodle_user_id, course_id=course_id)
-    if not course_progress:
+def _student_course_lookup_calls(moodle_user_id: int, course_id: int) -> dict:
+    return {
+        "lms_user_id": (_get_lms_user_id, moodle_user_id),
+        "course_progress": (_get_course_progress, moodle_user_id, course_id),
+    }
+
+
+def _student_course_calls(moodle_user_id: int, course_id: int) -> dict:
+    return {
+        "avg_grade_map": (_get_course_avg_grade, moodle_user_id, course_id),
+        "last_activity_map": (_get_last_activity_by_course, moodle_user_id, course_id),
+        "missing_cnt": (_get_missing_count, moodle_user_id, course_id),
+        "activities": (_get_course_activities, moodle_user_id, course_id),
+        "hours_per_day": (_get_learning_hours_per_day, moodle_user_id, course_id, 7),
+        "teacher_name": (_get_course_teacher_name, course_id),
+        "tags": (_get_course_tags, course_id),
+    }
+
+
+def get_student_per_course(moodle_user_id: int, course_id: int, fields: frozenset[str] | None = None):
+    lookup = _gather_calls(_student_course_lookup_calls(moodle_user_id, course_id))
+    if not lookup["course_progress"]:
         raise HTTPException(status_code=404, detail="Course not found for user")
-    avg_grade_map = _get_course_avg_grade(moodle_user_id)
-    last_activity_map = _get_last_activity_by_course(moodle_user_id)
+    data = _gather_fields(
+        _student_course_calls(moodle_user_id, course_id),
+        STUDENT_COURSE_FIELDS,
+        STUDENT_COURSE_EMPTY,
+        fields,
+    )
+    return _pick_fields(
+        _student_per_course_payload(course_id, lookup["course_progress"], data), fields
+    )
+
+
+async def get_student_per_course_async(moodle_user_id: int, course_id: int, fields: frozenset[str] | None = None):
+    lookup = await _gather_calls_async(
+        _student_course_lookup_calls(moodle_user_id, course_id)
+    )
+    if not lookup["course_progress"]:
+        raise HTTPException(status_code=404, detail="Course not found for user")
+    data = await _gather_fields_async(
+        _student_course_calls(moodle_user_id, course_id),
+        STUDENT_COURSE_FIELDS,
+        STUDENT_COURSE_EMPTY,
+        fields,
+    )
+    return _pick_fields(
+        _student_per_course_payload(course_id, lookup["course_progress"], data), fields
+    )
+
+
+@traced
+def _student_per_course_payload(course_id: int, course_progress: list, data: dict):
+    avg_grade_map = data["avg_grade_map"]
+    last_activity_map = data["last_activity_map"]
     last_ts = last_activity_map.get(course_id)
     item = course_progress[0]
     avg_grade = round(avg_grade_map.get(course_id, 0), 1)
-    missing_cnt = _get_missing_count(moodle_user_id, course_id)
+    missing_cnt = data["missing_cnt"]
     if last_ts:
         last_active = _fmt_dt(last_ts)
         days_inactive = (
@@ -98,12 +308,12 @@ def get_student_per_course(moodle_user_id: int, course_id: int):
         last_active = None
         days_inactive = None
 
-    activities = _get_course_activities(moodle_user_id, course_id)
+    activities = data["activities"]
     total_activities = item.get("totalActivities", 0) or 0
     completed_activities = item.get("completedActivities", 0) or 0
     progress_percent = item.get("progressPercent", 0) or 0
 
-    hours_per_day = _get_learning_hours_per_day(moodle_user_id, course_id, days=7)
+    hours_per_day = data["hours_per_day"]
     time_spent_hours = round(sum(d.get("hours", 0) for d in hours_per_day), 2)
     avg_hours_per_week = round(time_spent_hours / 1, 2)
 
@@ -111,8 +321,8 @@ def get_student_per_course(moodle_user_id: int, course_id: int):
         "courseInfo": {
             "courseId": item.get("courseId"),
             "courseName": item.get("courseName"),
-            "teacherName": _get_course_teacher_name(course_id),
-            "tags": _get_course_tags(course_id),
+            "teacherName": data["teacher_name"],
+            "tags": data["tags"],
             "totalActivities": total_activities,
             "completedActivities": completed_activities,
         },
@@ -1,4 +1,8 @@
+import csv
+import io
 from datetime import datetime, timedelta
+
+import orjson
 from fastapi import HTTPException
 from sqlalchemy import text
 
@@ -17,92 +21,137 @@ from ..routers.common import (
     _fmt_dt,
     _get_course_name,
     _get_course_rating,
-    _get_active_students_in_window,
-    _get_completion_rate_window,
-    _avg_learning_hours_window,
-    _get_last_activity_by_user_window,
-    _get_missing_by_user_window,
-    _get_ungraded_submissions_count_window,
     _get_avg_grade_by_user,
     _in_params,
+    _fetch_by_ids,
+    _merge_rows,
+    _encode_cursor,
+    _decode_cursor,
     _date_keys,
+    _gather_fields,
+    _gather_fields_async,
+    _pick_fields,
+    _safe_fetch,
+    _safe_fetch_rows,
+    _sessionization_mode,
 )
-from ..config import MOODLE_DB_PREFIX
-from ..db import MOODLE_ENGINE, LMS_ENGINE
+from ..config import EXPORT_BATCH_SIZE, MOODLE_DB_PREFIX, PAGE_SIZE_DEFAULT
+from ..db import MOODLE_ENGINE, LMS_ENGINE, connect, dedicated_connection, route_engine, run_async
+from ..request_context import request_context
+from ..server_timing import traced
+from ..sessionization import bucketed_gaps, log_columns
 
 
-def get_teacher_overall(teacher_id: int):
-    courses = _get_teacher_courses(teacher_id)
-    if not courses:
-        raise HTTPException(status_code=404, detail="teacher_id not found")
+TREND_SERIES = (
+    ("weekly", 7, 8, "W"),
+    ("monthly", 30, 6, "M"),
+    ("quarterly", 90, 4, "Q"),
+    ("yearly", 365, 3, "Y"),
+)
 
-    course_ids = [c["courseId"] for c in courses]
-    students = _get_students_in_courses(course_ids)
-    total_students = int(len(students))
-    total_courses = int(len(course_ids))
-    course_names = {c["courseId"]: c["courseName"] for c in courses}
+# KPI comparisons (current vs prev week/month): (key, days, offset_days)
+KPI_WINDOWS = (
+    ("current_metrics", 7, 0),
+    ("prev_week_metrics", 7, 7),
+    ("prev_month_metrics", 30, 30),
+)
 
-    # My courses list (avg completion + total students)
-    enrol_counts = _get_course_enrol_counts(course_ids)
-    completion_map = {}
-    if course_ids:
-        prefix = MOODLE_DB_PREFIX
-        in_courses = ",".join(str(i) for i in course_ids)
-        with MOODLE_ENGINE.connect() as conn:
-            rows = conn.execute(
-                text(
-                    f"""
-                    SELECT cm.course AS course_id,
-                           SUM(CASE WHEN cm.completion > 0 THEN 1 ELSE 0 END) AS total_activities,
-                           SUM(CASE WHEN cmc.completionstate IN (1,2) THEN 1 ELSE 0 END) AS completed_activities
-                    FROM {prefix}course_modules cm
-                    LEFT JOIN {prefix}course_modules_completion cmc
-                      ON cmc.coursemoduleid = cm.id
-                    WHERE cm.course IN ({in_courses})
-                    GROUP BY cm.course
-                    """
-                )
-            ).mappings().all()
-        for r in rows:
-            course_id = int(r["course_id"])
-            total_act = int(r["total_activities"] or 0)
-            completed_act = int(r["completed_activities"] or 0)
-            student_count = int(enrol_counts.get(course_id, 0))
-            denom = total_act * student_count
-            avg_completion = round((completed_act / denom) * 100, 1) if denom else 0
-            completion_map[course_id] = avg_completion
-
-    last_activity = _get_last_activity_by_user(course_ids, students)
-    today = datetime.utcnow().date()
-    inactive_students_7d = 0
-    inactive_students_30d = 0
-    for uid in students:
-        ts = last_activity.get(uid)
-        if not ts:
-            inactive_students_7d += 1
-            inactive_students_30d += 1
-            continue
-        last_date = datetime.utcfromtimestamp(ts).date()
-        if (today - last_date).days >= 7:
-            inactive_students_7d += 1
-        if (today - last_date).days >= 30:
-            inactive_students_30d += 1
+_WINDOW_CALLS = ("students", "window_active", "window_completions", "window_gaps")
 
-    avg_grade_map = _get_avg_grade_by_user(course_ids, students)
-    missing_map = _get_missing_by_user(course_ids, students)
-    progress_map = _get_progress_by_user(students)
+# payload field -> calls it reads (fields= selection), lookup and data stages
+TEACHER_OVERALL_FIELDS = {
+    "teacher_id": (),
+    "total_students": ("students",),
+    "total_courses": (),
+    "inactive_students_7d": ("students", "last_activity"),
+    "inactive_students_30d": ("students", "last_activity"),
+    "completion_rate": ("students", "progress_map"),
+    "avg_learning_hours_per_week": ("students", "avg_learning_hours"),
+    "dropout_rate": ("students", "last_activity"),
+    "ungraded_submissions": ("students", "ungraded_submissions"),
+    "total_forums": ("forums",),
+    "forums": ("forums",),
+    "forumActivity": ("forums", "forum_activity"),
+    "my_courses": ("enrol_counts", "activity_totals"),
+    "kpi_compare": _WINDOW_CALLS + ("window_ungraded",),
+    "trends": _WINDOW_CALLS,
+}
+TEACHER_OVERALL_EMPTY = {
+    "students": [],
+    "enrol_counts": {},
+    "activity_totals": {},
+    "forums": [],
+    "last_activity": {},
+    "avg_grade_map": {},
+    "missing_map": {},
+    "progress_map": {},
+    "avg_learning_hours": 0,
+    "ungraded_submissions": 0,
+    "forum_activity": [],
+    "window_active": {},
+    "window_completions": {"total_act": 0, "done": {}},
+    "window_gaps": [],
+    "window_ungraded": {},
+}
 
-    # risk metrics removed per requirement
+TEACHER_COURSE_FIELDS = {
+    "course_id": (),
+    "course_name": ("course_name",),
+    "total_students": ("students",),
+    "avg_grade_pct": ("students", "avg_grade_map"),
+    "missing_submissions": ("students", "missing_map"),
+    "course_rating": ("course_rating",),
+    "missing_per_student": ("students", "missing_map"),
+    "missing_details": ("students", "missing_rows", "names"),
+    "ungraded_submissions": ("students", "ungraded_rows", "names"),
+    "next_cursors": ("students", "missing_rows", "ungraded_rows", "missing_map"),
+    "summary": ("students", "missing_rows", "ungraded_rows", "detail_counts"),
+}
+TEACHER_COURSE_EMPTY = {
+    "course_name": None,
+    "students": [],
+    "course_rating": None,
+    "missing_rows": [],
+    "ungraded_rows": [],
+    "detail_counts": {"missing_rows": 0, "missing_students": 0, "ungraded_rows": 0},
+    "avg_grade_map": {},
+    "missing_map": {},
+    "names": {},
+}
 
-    avg_learning_hours = _avg_learning_hours(course_ids, students)
-    ungraded_submissions = _get_ungraded_submissions_count(course_ids, students)
 
-    # Forums managed by teacher (LMS DB)
+def _get_course_activity_totals(course_ids: list[int]):
+    if not course_ids:
+        return {}
+    prefix = MOODLE_DB_PREFIX
+    in_courses = ",".join(str(i) for i in course_ids)
+    with connect(MOODLE_ENGINE) as conn:
+        rows = conn.execute(
+            text(
+                f"""
+                SELECT cm.course AS course_id,
+                       SUM(CASE WHEN cm.completion > 0 THEN 1 ELSE 0 END) AS total_activities,
+                       SUM(CASE WHEN cmc.completionstate IN (1,2) THEN 1 ELSE 0 END) AS completed_activities
+                FROM {prefix}course_modules cm
+                LEFT JOIN {prefix}course_modules_completion cmc
+                  ON cmc.coursemoduleid = cm.id
+                WHERE cm.course IN ({in_courses})
+                GROUP BY cm.course
+                """
+            )
+        ).mappings().all()
+    return {
+        int(r["course_id"]): (int(r["total_activities"] or 0), int(r["completed_activities"] or 0))
+        for r in rows
+    }
+
+
+# Forums managed by teacher (LMS DB)
+def _get_teacher_forums(teacher_id: int):
     forums = []
-    forum_ids = []
     try:
         lms_user_id = _get_lms_user_id(teacher_id)
-        with LMS_ENGINE.connect() as conn:
+        with connect(LMS_ENGINE) as conn:
             forum_rows = conn.execute(
                 text(
                     """
@@ -130,7 +179,6 @@ def get_teacher_overall(teacher_id: int):
                 {"uid": lms_user_id},
             ).mappings().all()
         for r in forum_rows:
-            forum_ids.append(r["forum_id"])
             last_post = r.get("last_post_at")
             last_comment = r.get("last_comment_at")
             last_activity = None
@@ -151,127 +199,518 @@ def get_teacher_overall(teacher_id: int):
             )
     except HTTPException:
         forums = []
+    return forums
 
-    total_forums = int(len(forums))
 
+def _get_forum_activity(forum_ids: list):
     forum_activity = {
         "timeline": [],
         "activityBreakdown": {"posts": 0, "comments": 0},
         "topContributors": [],
     }
-    if forum_ids:
-        in_forums, params = _in_params(forum_ids, "f")
-        with LMS_ENGINE.connect() as conn:
-            post_rows = conn.execute(
-                text(
-                    f"""
-                    SELECT DATE(createdAt) AS d, COUNT(*) AS c
+    if not forum_ids:
+        return forum_activity
+    in_forums, params = _in_params(forum_ids, "f")
+    with connect(LMS_ENGINE) as conn:
+        post_rows = conn.execute(
+            text(
+                f"""
+                SELECT DATE(createdAt) AS d, COUNT(*) AS c
+                FROM post
+                WHERE forumId IN ({in_forums})
+                  AND createdAt >= DATE_SUB(UTC_TIMESTAMP(), INTERVAL 6 DAY)
+                GROUP BY d
+                """
+            ),
+            params,
+        ).mappings().all()
+        comment_rows = conn.execute(
+            text(
+                f"""
+                SELECT DATE(c.createdAt) AS d, COUNT(*) AS c
+                FROM comment c
+                JOIN post p ON p.id = c.postId
+                WHERE p.forumId IN ({in_forums})
+                  AND c.createdAt >= DATE_SUB(UTC_TIMESTAMP(), INTERVAL 6 DAY)
+                GROUP BY d
+                """
+            ),
+            params,
+        ).mappings().all()
+
+        total_posts = conn.execute(
+            text(
+                f"""
+                SELECT COUNT(*) AS c
+                FROM post
+                WHERE forumId IN ({in_forums})
+                """
+            ),
+            params,
+        ).scalar()
+
+        total_comments = conn.execute(
+            text(
+                f"""
+                SELECT COUNT(*) AS c
+                FROM comment c
+                JOIN post p ON p.id = c.postId
+                WHERE p.forumId IN ({in_forums})
+                """
+            ),
+            params,
+        ).scalar()
+
+        contrib_rows = conn.execute(
+            text(
+                f"""
+                SELECT authorId,
+                       SUM(posts) AS posts,
+                       SUM(comments) AS comments
+                FROM (
+                    SELECT authorId, COUNT(*) AS posts, 0 AS comments
                     FROM post
                     WHERE forumId IN ({in_forums})
-                      AND createdAt >= DATE_SUB(UTC_TIMESTAMP(), INTERVAL 6 DAY)
-                    GROUP BY d
-                    """
-                ),
-                params,
-            ).mappings().all()
-            comment_rows = conn.execute(
-                text(
-                    f"""
-                    SELECT DATE(c.createdAt) AS d, COUNT(*) AS c
+                    GROUP BY authorId
+                    UNION ALL
+                    SELECT c.authorId, 0 AS posts, COUNT(*) AS comments
                     FROM comment c
                     JOIN post p ON p.id = c.postId
                     WHERE p.forumId IN ({in_forums})
-                      AND c.createdAt >= DATE_SUB(UTC_TIMESTAMP(), INTERVAL 6 DAY)
-                    GROUP BY d
-                    """
-                ),
-                params,
+                    GROUP BY c.authorId
+                ) t
+                GROUP BY authorId
+                ORDER BY (SUM(posts) + SUM(comments)) DESC
+                LIMIT 5
+                """
+            ),
+            params,
+        ).mappings().all()
+
+    timeline_map = {k: {"date": _fmt_dt(k), "posts": 0, "comments": 0} for k in _date_keys(7)}
+    for r in post_rows:
+        key = r["d"].strftime("%Y-%m-%d") if hasattr(r["d"], "strftime") else str(r["d"])
+        if key in timeline_map:
+            timeline_map[key]["posts"] = int(r["c"] or 0)
+    for r in comment_rows:
+        key = r["d"].strftime("%Y-%m-%d") if hasattr(r["d"], "strftime") else str(r["d"])
+        if key in timeline_map:
+            timeline_map[key]["comments"] = int(r["c"] or 0)
+
+    forum_activity["timeline"] = list(timeline_map.values())
+    forum_activity["activityBreakdown"] = {
+        "posts": int(total_posts or 0),
+        "comments": int(total_comments or 0),
+    }
+
+    if contrib_rows:
+        user_ids = [r["authorId"] for r in contrib_rows]
+        in_users, params_u = _in_params(user_ids, "u")
+        with connect(LMS_ENGINE) as conn:
+            user_rows = conn.execute(
+                text(f"SELECT userId, username FROM account WHERE userId IN ({in_users})"),
+                params_u,
             ).mappings().all()
+        name_map = {r["userId"]: r["username"] for r in user_rows}
+        forum_activity["topContributors"] = [
+            {
+                "userId": r["authorId"],
+                "name": name_map.get(r["authorId"], r["authorId"]),
+                "posts": int(r["posts"] or 0),
+                "comments": int(r["comments"] or 0),
+                "total": int((r["posts"] or 0) + (r["comments"] or 0)),
+            }
+            for r in contrib_rows
+        ]
 
-            total_posts = conn.execute(
-                text(
-                    f"""
-                    SELECT COUNT(*) AS c
-                    FROM post
-                    WHERE forumId IN ({in_forums})
-                    """
-                ),
-                params,
-            ).scalar()
+    return forum_activity
 
-            total_comments = conn.execute(
-                text(
-                    f"""
-                    SELECT COUNT(*) AS c
-                    FROM comment c
-                    JOIN post p ON p.id = c.postId
-                    WHERE p.forumId IN ({in_forums})
-                    """
-                ),
-                params,
-            ).scalar()
 
-            contrib_rows = conn.execute(
-                text(
-                    f"""
-                    SELECT authorId,
-                           SUM(posts) AS posts,
-                           SUM(comments) AS comments
-                    FROM (
-                        SELECT authorId, COUNT(*) AS posts, 0 AS comments
-                        FROM post
-                        WHERE forumId IN ({in_forums})
-                        GROUP BY authorId
-                        UNION ALL
-                        SELECT c.authorId, 0 AS posts, COUNT(*) AS comments
-                        FROM comment c
-                        JOIN post p ON p.id = c.postId
-                        WHERE p.forumId IN ({in_forums})
-                        GROUP BY c.authorId
-                    ) t
-                    GROUP BY authorId
-                    ORDER BY (SUM(posts) + SUM(comments)) DESC
-                    LIMIT 5
-                    """
-                ),
+def _trend_windows(period_days: int, points: int, label_prefix: str, end_base: datetime):
+    windows = []
+    for i in range(points - 1, -1, -1):
+        end = end_base - timedelta(days=period_days * i)
+        start = end - timedelta(days=period_days - 1)
+        windows.append((f"{label_prefix}{points - i}", start, end))
+    return windows
+
+
+def _overall_windows():
+    # key -> (label, start, end); KPI windows have no label
+    end_base = datetime.utcnow().replace(hour=23, minute=59, second=59, microsecond=0)
+    windows = {}
+    for key, days, offset_days in KPI_WINDOWS:
+        end = end_base - timedelta(days=offset_days)
+        windows[key] = (None, end - timedelta(days=days - 1), end)
+    for name, period_days, points, label_prefix in TREND_SERIES:
+        for idx, window in enumerate(_trend_windows(period_days, points, label_prefix, end_base)):
+            windows[(name, idx)] = window
+    return windows
+
+
+# Every window is an inclusive [start, end] range. Cutting the covered range at
+# each start and end + 1 gives buckets that each window covers whole, so one
+# grouped scan per metric serves all windows.
+def _window_bounds(windows: dict) -> tuple[int, ...]:
+    edges = set()
+    for _, start, end in windows.values():
+        edges.add(int(start.timestamp()))
+        edges.add(int(end.timestamp()) + 1)
+    return tuple(sorted(edges))
+
+
+def _window_buckets(bounds: tuple[int, ...], start: datetime, end: datetime) -> range:
+    return range(bounds.index(int(start.timestamp())), bounds.index(int(end.timestamp()) + 1))
+
+
+def _bucket_sql(column: str, bounds: tuple[int, ...]):
+    params = {f"b{i}": edge for i, edge in enumerate(bounds)}
+    params.update({"range_start": bounds[0], "range_end": bounds[-1]})
+    whens = " ".join(
+        f"WHEN {column} < :b{i} THEN {i - 1}" for i in range(1, len(bounds) - 1)
+    )
+    bucket = f"CASE {whens} ELSE {len(bounds) - 2} END" if whens else "0"
+    return bucket, params
+
+
+def _get_active_student_buckets(course_ids: list[int], bounds: tuple[int, ...]):
+    prefix = MOODLE_DB_PREFIX
+    bucket, params = _bucket_sql("log.timecreated", bounds)
+    in_courses, params_c = _in_params(course_ids, "c")
+    with connect(MOODLE_ENGINE) as conn:
+        rows = _safe_fetch(
+            conn,
+            f"""
+            SELECT ra.userid AS user_id, {bucket} AS bucket
+            FROM {prefix}logstore_standard_log log
+            JOIN {prefix}role_assignments ra ON ra.userid = log.userid
+            JOIN {prefix}context ctx ON ctx.id = ra.contextid AND ctx.contextlevel = 50
+            WHERE log.courseid IN ({in_courses})
+              AND log.timecreated >= :range_start AND log.timecreated < :range_end
+              AND ctx.instanceid = log.courseid
+              AND ra.roleid = 5
+            GROUP BY ra.userid, bucket
+            """,
+            {**params, **params_c},
+        )
+    active = {}
+    for r in rows:
+        active.setdefault(int(r["bucket"]), set()).add(int(r["user_id"]))
+    return active
+
+
+def _get_completion_buckets(course_ids: list[int], bounds: tuple[int, ...]):
+    prefix = MOODLE_DB_PREFIX
+    bucket, params = _bucket_sql("cmc.timemodified", bounds)
+    in_courses, params_c = _in_params(course_ids, "c")
+    with connect(MOODLE_ENGINE) as conn:
+        total_row = conn.execute(
+            text(
+                f"""
+                SELECT SUM(CASE WHEN completion > 0 THEN 1 ELSE 0 END) AS total_act
+                FROM {prefix}course_modules
+                WHERE course IN ({in_courses})
+                """
+            ),
+            params_c,
+        ).mappings().first()
+        rows = conn.execute(
+            text(
+                f"""
+                SELECT cmc.userid AS user_id, {bucket} AS bucket, COUNT(*) AS done_act
+                FROM {prefix}course_modules_completion cmc
+                JOIN {prefix}course_modules cm ON cm.id = cmc.coursemoduleid
+                WHERE cm.course IN ({in_courses})
+                  AND cmc.completionstate IN (1,2)
+                  AND cmc.timemodified >= :range_start AND cmc.timemodified < :range_end
+                GROUP BY cmc.userid, bucket
+                """
+            ),
+            {**params, **params_c},
+        ).mappings().all()
+    done = {}
+    for r in rows:
+        done.setdefault(int(r["bucket"]), {})[int(r["user_id"])] = int(r["done_act"] or 0)
+    return {
+        "total_act": int(total_row["total_act"] or 0) if total_row else 0,
+        "done": done,
+    }
+
+
+def _get_learning_gap_buckets(course_ids: list[int], bounds: tuple[int, ...]):
+    # (userid, bucket of the earlier event, bucket of the later event, gaps, seconds)
+    prefix = MOODLE_DB_PREFIX
+    in_courses, params_c = _in_params(course_ids, "c")
+    if _sessionization_mode() == "python":
+        params = {**params_c, "range_start": bounds[0], "range_end": bounds[-1]}
+        with connect(MOODLE_ENGINE) as conn:
+            rows = _safe_fetch_rows(
+                conn,
+                f"""
+                SELECT userid, timecreated
+                FROM {prefix}logstore_standard_log
+                WHERE courseid IN ({in_courses})
+                  AND timecreated >= :range_start AND timecreated < :range_end
+                ORDER BY userid, timecreated
+                """,
                 params,
-            ).mappings().all()
+            )
+        return bucketed_gaps(*log_columns(rows), bounds)
 
-        timeline_map = {k: {"date": _fmt_dt(k), "posts": 0, "comments": 0} for k in _date_keys(7)}
-        for r in post_rows:
-            key = r["d"].strftime("%Y-%m-%d") if hasattr(r["d"], "strftime") else str(r["d"])
-            if key in timeline_map:
-                timeline_map[key]["posts"] = int(r["c"] or 0)
-        for r in comment_rows:
-            key = r["d"].strftime("%Y-%m-%d") if hasattr(r["d"], "strftime") else str(r["d"])
-            if key in timeline_map:
-                timeline_map[key]["comments"] = int(r["c"] or 0)
-
-        forum_activity["timeline"] = list(timeline_map.values())
-        forum_activity["activityBreakdown"] = {
-            "posts": int(total_posts or 0),
-            "comments": int(total_comments or 0),
-        }
+    prev_bucket, params = _bucket_sql("prev_ts", bounds)
+    bucket, _ = _bucket_sql("timecreated", bounds)
+    with connect(MOODLE_ENGINE) as conn:
+        rows = _safe_fetch(
+            conn,
+            f"""
+            SELECT userid, {prev_bucket} AS prev_bucket, {bucket} AS bucket,
+                   COUNT(*) AS gap_count, SUM(timecreated - prev_ts) AS gap_seconds
+            FROM (
+              SELECT
+                userid,
+                timecreated,
+                LAG(timecreated) OVER (PARTITION BY userid ORDER BY timecreated) AS prev_ts
+              FROM {prefix}logstore_standard_log
+              WHERE courseid IN ({in_courses})
+                AND timecreated >= :range_start AND timecreated < :range_end
+            ) g
+            WHERE timecreated - prev_ts BETWEEN 60 AND 1800
+            GROUP BY userid, prev_bucket, bucket
+            """,
+            {**params, **params_c},
+        )
+    return [
+        (
+            int(r["userid"]),
+            int(r["prev_bucket"]),
+            int(r["bucket"]),
+            int(r["gap_count"] or 0),
+            float(r["gap_seconds"] or 0),
+        )
+        for r in rows
+    ]
+
+
+def _get_ungraded_buckets(course_ids: list[int], user_ids: list[int], bounds: tuple[int, ...]):
+    if not user_ids:
+        return {}
+    prefix = MOODLE_DB_PREFIX
+    bucket, params = _bucket_sql("a.duedate", bounds)
+    in_courses, params_c = _in_params(course_ids, "c")
+    rows = _fetch_by_ids(
+        MOODLE_ENGINE,
+        f"""
+        SELECT {bucket} AS bucket, COUNT(*) AS c
+        FROM {prefix}assign_submission s
+        JOIN {prefix}assign a ON a.id = s.assignment
+        LEFT JOIN {prefix}grade_items gi
+          ON gi.itemmodule = 'assign' AND gi.iteminstance = a.id
+        LEFT JOIN {prefix}grade_grades gg
+          ON gg.itemid = gi.id AND gg.userid = s.userid
+        WHERE a.course IN ({in_courses})
+          AND s.userid IN ({{ids}})
+          AND s.status = 'submitted'
+          AND a.duedate >= :range_start AND a.duedate < :range_end
+          AND gg.id IS NULL
+        GROUP BY bucket
+        """,
+        {**params, **params_c},
+        user_ids,
+        safe=False,
+    )
+    rows = _merge_rows(rows, ("bucket",), {"c": "sum"})
+    return {int(r["bucket"]): int(r["c"] or 0) for r in rows}
+
+
+def _window_metrics(windows: dict, students: list[int], data: dict):
+    bounds = _window_bounds(windows)
+    total_students = int(len(students))
+    student_set = set(students)
+    active_buckets = data["window_active"]
+    completions = data["window_completions"]
+    # (earlier bucket, later bucket) -> [(userid, gaps, seconds)]
+    gaps_by_span = {}
+    for uid, prev_bucket, bucket, gap_count, gap_seconds in data["window_gaps"]:
+        gaps_by_span.setdefault((prev_bucket, bucket), []).append((uid, gap_count, gap_seconds))
+
+    metrics = {}
+    for key, (label, start, end) in windows.items():
+        buckets = _window_buckets(bounds, start, end)
+        active = set()
+        for b in buckets:
+            active.update(active_buckets.get(b, ()))
+
+        # KPI windows measure completion over the active students, trends over all
+        if label is None:
+            completion_users, completion_count = active, len(active)
+        else:
+            completion_users, completion_count = student_set, len(students)
+        done_act = sum(
+            done
+            for b in buckets
+            for uid, done in completions["done"].get(b, {}).items()
+            if uid in completion_users
+        )
+        denom = completions["total_act"] * completion_count
+        completion = round((done_act / denom) * 100, 1) if denom else 0
+
+        gap_count = 0
+        gap_seconds = 0.0
+        for (prev_bucket, bucket), user_gaps in gaps_by_span.items():
+            if prev_bucket < buckets.start or bucket >= buckets.stop:
+                continue
+            for uid, count, seconds in user_gaps:
+                if uid in active:
+                    gap_count += count
+                    gap_seconds += seconds
+        avg_hours = round(gap_seconds / gap_count / 3600, 2) if gap_count else 0
+
+        dropout = (
+            round(((total_students - len(active)) / total_students) * 100, 1)
+            if total_students else 0
+        )
+        if label is None:
+            metrics[key] = {
+                "students": int(len(active)),
+                "completion": completion,
+                "avgHours": avg_hours,
+                "dropout": dropout,
+                "ungraded": int(sum(data["window_ungraded"].get(b, 0) for b in buckets)),
+            }
+        else:
+            metrics[key] = {
+                "label": label,
+                "start": _fmt_dt(start),
+                "end": _fmt_dt(end),
+                "completion": completion,
+                "avgHours": avg_hours,
+                "dropout": dropout,
+            }
+    return metrics
+
+
+def _calc_delta(current_val, prev_val):
+    if not prev_val:
+        return 0
+    return round(((current_val - prev_val) / prev_val) * 100, 1)
 
-        if contrib_rows:
-            user_ids = [r["authorId"] for r in contrib_rows]
-            in_users, params_u = _in_params(user_ids, "u")
-            with LMS_ENGINE.connect() as conn:
-                user_rows = conn.execute(
-                    text(f"SELECT userId, username FROM account WHERE userId IN ({in_users})"),
-                    params_u,
-                ).mappings().all()
-            name_map = {r["userId"]: r["username"] for r in user_rows}
-            forum_activity["topContributors"] = [
-                {
-                    "userId": r["authorId"],
-                    "name": name_map.get(r["authorId"], r["authorId"]),
-                    "posts": int(r["posts"] or 0),
-                    "comments": int(r["comments"] or 0),
-                    "total": int((r["posts"] or 0) + (r["comments"] or 0)),
-                }
-                for r in contrib_rows
-            ]
+
+def _teacher_lookup_calls(teacher_id: int, course_ids: list[int]) -> dict:
+    return {
+        "students": (_get_students_in_courses, course_ids),
+        "enrol_counts": (_get_course_enrol_counts, course_ids),
+        "activity_totals": (_get_course_activity_totals, course_ids),
+        "forums": (_get_teacher_forums, teacher_id),
+    }
+
+
+def _teacher_overall_calls(course_ids: list[int], students: list[int], forums: list, windows: dict) -> dict:
+    bounds = _window_bounds(windows)
+    return {
+        "last_activity": (_get_last_activity_by_user, course_ids, students),
+        "avg_grade_map": (_get_avg_grade_by_user, course_ids, students),
+        "missing_map": (_get_missing_by_user, course_ids, students),
+        "progress_map": (_get_progress_by_user, students),
+        "avg_learning_hours": (_avg_learning_hours, course_ids, students),
+        "ungraded_submissions": (_get_ungraded_submissions_count, course_ids, students),
+        "forum_activity": (_get_forum_activity, [f["forumId"] for f in forums]),
+        # KPI comparisons and trends, bucketed over every window at once
+        "window_active": (_get_active_student_buckets, course_ids, bounds),
+        "window_completions": (_get_completion_buckets, course_ids, bounds),
+        "window_gaps": (_get_learning_gap_buckets, course_ids, bounds),
+        "window_ungraded": (_get_ungraded_buckets, course_ids, students, bounds),
+    }
+
+
+def get_teacher_overall(teacher_id: int, fields: frozenset[str] | None = None):
+    courses = _get_teacher_courses(teacher_id)
+    if not courses:
+        raise HTTPException(status_code=404, detail="teacher_id not found")
+    course_ids = [c["courseId"] for c in courses]
+    lookup = _gather_fields(
+        _teacher_lookup_calls(teacher_id, course_ids),
+        TEACHER_OVERALL_FIELDS,
+        TEACHER_OVERALL_EMPTY,
+        fields,
+    )
+    windows = _overall_windows()
+    data = _gather_fields(
+        _teacher_overall_calls(course_ids, lookup["students"], lookup["forums"], windows),
+        TEACHER_OVERALL_FIELDS,
+        TEACHER_OVERALL_EMPTY,
+        fields,
+    )
+    return _pick_fields(
+        _teacher_overall_payload(teacher_id, courses, lookup, data, windows), fields
+    )
+
+
+async def get_teacher_overall_async(teacher_id: int, fields: frozenset[str] | None = None):
+    courses = await run_async(_get_teacher_courses, teacher_id)
+    if not courses:
+        raise HTTPException(status_code=404, detail="teacher_id not found")
+    course_ids = [c["courseId"] for c in courses]
+    lookup = await _gather_fields_async(
+        _teacher_lookup_calls(teacher_id, course_ids),
+        TEACHER_OVERALL_FIELDS,
+        TEACHER_OVERALL_EMPTY,
+        fields,
+    )
+    windows = _overall_windows()
+    data = await _gather_fields_async(
+        _teacher_overall_calls(course_ids, lookup["students"], lookup["forums"], windows),
+        TEACHER_OVERALL_FIELDS,
+        TEACHER_OVERALL_EMPTY,
+        fields,
+    )
+    return _pick_fields(
+        _teacher_overall_payload(teacher_id, courses, lookup, data, windows), fields
+    )
+
+
+@traced
+def _teacher_overall_payload(teacher_id: int, courses: list, lookup: dict, data: dict, windows: dict):
+    course_ids = [c["courseId"] for c in courses]
+    students = lookup["students"]
+    total_students = int(len(students))
+    total_courses = int(len(course_ids))
+    course_names = {c["courseId"]: c["courseName"] for c in courses}
+
+    # My courses list (avg completion + total students)
+    enrol_counts = lookup["enrol_counts"]
+    completion_map = {}
+    for course_id, (total_act, completed_act) in lookup["activity_totals"].items():
+        student_count = int(enrol_counts.get(course_id, 0))
+        denom = total_act * student_count
+        avg_completion = round((completed_act / denom) * 100, 1) if denom else 0
+        completion_map[course_id] = avg_completion
+
+    last_activity = data["last_activity"]
+    today = datetime.utcnow().date()
+    inactive_students_7d = 0
+    inactive_students_30d = 0
+    for uid in students:
+        ts = last_activity.get(uid)
+        if not ts:
+            inactive_students_7d += 1
+            inactive_students_30d += 1
+            continue
+        last_date = datetime.utcfromtimestamp(ts).date()
+        if (today - last_date).days >= 7:
+            inactive_students_7d += 1
+        if (today - last_date).days >= 30:
+            inactive_students_30d += 1
+
+    progress_map = data["progress_map"]
+
+    # risk metrics removed per requirement
+
+    avg_learning_hours = data["avg_learning_hours"]
+    ungraded_submissions = data["ungraded_submissions"]
+
+    forums = lookup["forums"]
+    total_forums = int(len(forums))
+    forum_activity = data["forum_activity"]
 
     if progress_map:
         completion_rate = round(sum(progress_map.values()) / len(progress_map), 1)
@@ -295,66 +734,10 @@ def get_teacher_overall(teacher_id: int):
         for cid in course_ids
     ]
 
-    # KPI comparisons (current vs prev week/month)
-    def _calc_delta(current_val, prev_val):
-        if not prev_val:
-            return 0
-        return round(((current_val - prev_val) / prev_val) * 100, 1)
-
-    def _window_metrics(days: int, offset_days: int = 0):
-        end = datetime.utcnow().replace(hour=23, minute=59, second=59, microsecond=0) - timedelta(days=offset_days)
-        start = end - timedelta(days=days - 1)
-        start_ts = int(start.timestamp())
-        end_ts = int(end.timestamp())
-        active_students = _get_active_students_in_window(course_ids, start_ts, end_ts)
-        total_students_all = total_students
-        completion_rate_window = _get_completion_rate_window(course_ids, active_students, start_ts, end_ts)
-        avg_hours = _avg_learning_hours_window(course_ids, active_students, start_ts, end_ts)
-        dropout_rate_window = (
-            round(((total_students_all - len(active_students)) / total_students_all) * 100, 1)
-            if total_students_all else 0
-        )
-        last_activity_window = _get_last_activity_by_user_window(course_ids, students, start_ts, end_ts)
-        missing_window = _get_missing_by_user_window(course_ids, students, end_ts)
-        ungraded_window = _get_ungraded_submissions_count_window(course_ids, students, start_ts, end_ts)
-
-        return {
-            "students": int(len(active_students)),
-            "completion": completion_rate_window,
-            "avgHours": avg_hours,
-            "dropout": dropout_rate_window,
-            "ungraded": int(ungraded_window),
-        }
-
-    current_metrics = _window_metrics(7, 0)
-    prev_week_metrics = _window_metrics(7, 7)
-    prev_month_metrics = _window_metrics(30, 30)
-
-    def _trend_series(period_days: int, points: int, label_prefix: str):
-        series = []
-        end_base = datetime.utcnow().replace(hour=23, minute=59, second=59, microsecond=0)
-        for i in range(points - 1, -1, -1):
-            end = end_base - timedelta(days=period_days * i)
-            start = end - timedelta(days=period_days - 1)
-            start_ts = int(start.timestamp())
-            end_ts = int(end.timestamp())
-            active_students = _get_active_students_in_window(course_ids, start_ts, end_ts)
-            completion = _get_completion_rate_window(course_ids, students, start_ts, end_ts)
-            avg_hours = _avg_learning_hours_window(course_ids, active_students, start_ts, end_ts)
-            dropout = (
-                round(((total_students - len(active_students)) / total_students) * 100, 1)
-                if total_students else 0
-            )
-            label = f"{label_prefix}{points - i}"
-            series.append({
-                "label": label,
-                "start": _fmt_dt(start),
-                "end": _fmt_dt(end),
-                "completion": completion,
-                "avgHours": avg_hours,
-                "dropout": dropout,
-            })
-        return series
+    window_metrics = _window_metrics(windows, students, data)
+    current_metrics = window_metrics["current_metrics"]
+    prev_week_metrics = window_metrics["prev_week_metrics"]
+    prev_month_metrics = window_metrics["prev_month_metrics"]
 
     return {
         "teacher_id": teacher_id,
@@ -408,45 +791,37 @@ def get_teacher_overall(teacher_id: int):
             },
         },
         "trends": {
-            "weekly": _trend_series(7, 8, "W"),
-            "monthly": _trend_series(30, 6, "M"),
-            "quarterly": _trend_series(90, 4, "Q"),
-            "yearly": _trend_series(365, 3, "Y"),
+            name: [window_metrics[(name, idx)] for idx in range(points)]
+            for name, _, points, _ in TREND_SERIES
         },
     }
 
 
-def get_teacher_per_course(teacher_id: int, course_id: int):
-    teacher_courses = _get_teacher_courses(teacher_id)
-    course_ids = [c["courseId"] for c in teacher_courses]
-    if course_id not in course_ids:
-        raise HTTPException(status_code=404, detail="course_id not found for teacher")
-
-    course_name = _get_course_name(course_id)
-    students = _get_students_in_courses([course_id])
-    total_students = int(len(students))
-
-    avg_grade_map = _get_avg_grade_by_user([course_id], students)
-    if avg_grade_map:
-        avg_grade_pct = sum(avg_grade_map.values()) / len(avg_grade_map)
-    else:
-        avg_grade_pct = 0
-
-    missing_map = _get_missing_by_user([course_id], students)
-    missing_submissions = int(sum(missing_map.values()))
-
-    names = _get_moodle_users(students)
+# Rows are ordered by (due date, assignment id, enrolment id); after is the
+# last key of the previous page.
+def _get_course_missing_rows(course_id: int, after: list | None = None, limit: int | None = None):
     prefix = MOODLE_DB_PREFIX
-    missing_details = []
-    ungraded_details = []
-    with MOODLE_ENGINE.connect() as conn:
-        rows = conn.execute(
+    params = {"cid": course_id}
+    keyset = ""
+    if after is not None:
+        keyset = """
+                  AND (a.duedate > :due OR (a.duedate = :due
+                       AND (a.id > :aid OR (a.id = :aid AND ue.id > :ueid))))"""
+        params.update(due=after[0], aid=after[1], ueid=after[2])
+    page = ""
+    if limit is not None:
+        page = "LIMIT :limit"
+        params["limit"] = limit
+    with connect(MOODLE_ENGINE) as conn:
+        return conn.execute(
             text(
                 f"""
                 SELECT ue.userid AS user_id,
                        u.firstname, u.lastname,
                        a.id AS assignment_id,
                        a.name AS assignment_name,
+                       a.duedate AS due_ts,
+                       ue.id AS enrolment_id,
                        FROM_UNIXTIME(a.duedate) AS due_date
                 FROM {prefix}assign a
                 JOIN {prefix}enrol e ON e.courseid = a.course
@@ -457,29 +832,33 @@ def get_teacher_per_course(teacher_id: int, course_id: int):
                 WHERE a.course = :cid
                   AND a.duedate > 0
                   AND a.duedate < UNIX_TIMESTAMP(UTC_TIMESTAMP())
-                  AND (s.id IS NULL OR s.status != 'submitted')
-                ORDER BY a.duedate ASC
+                  AND (s.id IS NULL OR s.status != 'submitted'){keyset}
+                ORDER BY a.duedate ASC, a.id ASC, ue.id ASC
+                {page}
                 """
             ),
-            {"cid": course_id},
+            params,
         ).mappings().all()
-        for r in rows:
-            missing_details.append(
-                {
-                    "studentId": int(r["user_id"]),
-                    "studentName": f"{r['firstname']} {r['lastname']}".strip()
-                    if r.get("firstname")
-                    else names.get(int(r["user_id"]), "Unknown"),
-                    "assignmentId": int(r["assignment_id"]),
-                    "assignmentName": r["assignment_name"],
-                    "dueDate": _fmt_dt(r["due_date"]) if r["due_date"] else None,
-                }
-            )
 
-        urows = conn.execute(
+
+# Newest submission first; after is the last submission id of the previous page.
+def _get_course_ungraded_rows(course_id: int, after: list | None = None, limit: int | None = None):
+    prefix = MOODLE_DB_PREFIX
+    params = {"cid": course_id}
+    keyset = ""
+    if after is not None:
+        keyset = "\n                  AND s.id < :sid"
+        params["sid"] = after[0]
+    page = ""
+    if limit is not None:
+        page = "LIMIT :limit"
+        params["limit"] = limit
+    with connect(MOODLE_ENGINE) as conn:
+        return conn.execute(
             text(
                 f"""
-                SELECT s.userid AS user_id,
+                SELECT s.id AS submission_id,
+                       s.userid AS user_id,
                        u.firstname, u.lastname,
                        a.id AS assignment_id,
                        a.name AS assignment_name,
@@ -494,33 +873,365 @@ def get_teacher_per_course(teacher_id: int, course_id: int):
                 WHERE a.course = :cid
                   AND s.status = 'submitted'
                   AND s.latest = 1
-                  AND (gg.id IS NULL OR gg.finalgrade IS NULL)
+                  AND (gg.id IS NULL OR gg.finalgrade IS NULL){keyset}
                 ORDER BY s.id DESC
+                {page}
                 """
             ),
-            {"cid": course_id},
+            params,
         ).mappings().all()
-        for r in urows:
-            ungraded_details.append(
-                {
-                    "studentId": int(r["user_id"]),
-                    "studentName": f"{r['firstname']} {r['lastname']}".strip()
-                    if r.get("firstname")
-                    else names.get(int(r["user_id"]), "Unknown"),
-                    "assignmentId": int(r["assignment_id"]),
-                    "assignmentName": r["assignment_name"],
-                    "dueDate": _fmt_dt(r["due_date"]) if r["due_date"] else None,
-                }
-            )
+
+
+# Students of the course by id; after is the last student id of the previous
+# page.
+def _get_course_student_page(course_id: int, after: list | None, limit: int):
+    prefix = MOODLE_DB_PREFIX
+    params = {"cid": course_id, "limit": limit}
+    keyset = ""
+    if after is not None:
+        keyset = "\n                  AND ra.userid > :uid"
+        params["uid"] = after[0]
+    with connect(MOODLE_ENGINE) as conn:
+        rows = conn.execute(
+            text(
+                f"""
+                SELECT DISTINCT ra.userid AS user_id
+                FROM {prefix}role_assignments ra
+                JOIN {prefix}context ctx ON ctx.id = ra.contextid AND ctx.contextlevel = 50
+                WHERE ra.roleid = 5
+                  AND ctx.instanceid = :cid{keyset}
+                ORDER BY ra.userid
+                LIMIT :limit
+                """
+            ),
+            params,
+        ).mappings().all()
+    return [int(r["user_id"]) for r in rows]
+
+
+def _count_course_missing(course_id: int):
+    prefix = MOODLE_DB_PREFIX
+    with connect(MOODLE_ENGINE) as conn:
+        row = conn.execute(
+            text(
+                f"""
+                SELECT COUNT(*) AS missing_rows, COUNT(DISTINCT ue.userid) AS missing_students
+                FROM {prefix}assign a
+                JOIN {prefix}enrol e ON e.courseid = a.course
+                JOIN {prefix}user_enrolments ue ON ue.enrolid = e.id
+                JOIN {prefix}user u ON u.id = ue.userid
+                LEFT JOIN {prefix}assign_submission s
+                  ON s.assignment = a.id AND s.userid = ue.userid AND s.latest = 1
+                WHERE a.course = :cid
+                  AND a.duedate > 0
+                  AND a.duedate < UNIX_TIMESTAMP(UTC_TIMESTAMP())
+                  AND (s.id IS NULL OR s.status != 'submitted')
+                """
+            ),
+            {"cid": course_id},
+        ).mappings().first()
+    return {key: int(row[key] or 0) for key in ("missing_rows", "missing_students")}
+
+
+def _count_course_ungraded(course_id: int) -> int:
+    prefix = MOODLE_DB_PREFIX
+    with connect(MOODLE_ENGINE) as conn:
+        return int(
+            conn.execute(
+                text(
+                    f"""
+                    SELECT COUNT(*)
+                    FROM {prefix}assign_submission s
+                    JOIN {prefix}assign a ON a.id = s.assignment
+                    JOIN {prefix}user u ON u.id = s.userid
+                    JOIN {prefix}grade_items gi
+                      ON gi.itemmodule = 'assign' AND gi.iteminstance = a.id
+                    LEFT JOIN {prefix}grade_grades gg
+                      ON gg.itemid = gi.id AND gg.userid = s.userid
+                    WHERE a.course = :cid
+                      AND s.status = 'submitted'
+                      AND s.latest = 1
+                      AND (gg.id IS NULL OR gg.finalgrade IS NULL)
+                    """
+                ),
+                {"cid": course_id},
+            ).scalar()
+            or 0
+        )
+
+
+# List sizes for the summary. A first page that is not full is the whole
+# list; only a full one needs a COUNT over the course.
+def _get_course_detail_counts(course_id: int, missing_rows: list, ungraded_rows: list):
+    if len(missing_rows) <= PAGE_SIZE_DEFAULT:
+        counts = {
+            "missing_rows": len(missing_rows),
+            "missing_students": len({int(r["user_id"]) for r in missing_rows}),
+        }
+    else:
+        counts = _count_course_missing(course_id)
+    if len(ungraded_rows) <= PAGE_SIZE_DEFAULT:
+        counts["ungraded_rows"] = len(ungraded_rows)
+    else:
+        counts["ungraded_rows"] = _count_course_ungraded(course_id)
+    return counts
+
+
+def _missing_key(r) -> tuple:
+    return int(r["due_ts"]), int(r["assignment_id"]), int(r["enrolment_id"])
+
+
+def _ungraded_key(r) -> tuple:
+    return (int(r["submission_id"]),)
+
+
+def _assignment_detail(r, names: dict):
+    return {
+        "studentId": int(r["user_id"]),
+        "studentName": f"{r['firstname']} {r['lastname']}".strip()
+        if r.get("firstname")
+        else names.get(int(r["user_id"]), "Unknown"),
+        "assignmentId": int(r["assignment_id"]),
+        "assignmentName": r["assignment_name"],
+        "dueDate": _fmt_dt(r["due_date"]) if r["due_date"] else None,
+    }
+
+
+# The detail lists come as their first PAGE_SIZE_DEFAULT rows (one more is
+# read to tell whether there is a next page).
+def _teacher_course_lookup_calls(course_id: int) -> dict:
+    return {
+        "course_name": (_get_course_name, course_id),
+        "students": (_get_students_in_courses, [course_id]),
+        "course_rating": (_get_course_rating, course_id),
+        "missing_rows": (_get_course_missing_rows, course_id, None, PAGE_SIZE_DEFAULT + 1),
+        "ungraded_rows": (_get_course_ungraded_rows, course_id, None, PAGE_SIZE_DEFAULT + 1),
+    }
+
+
+def _teacher_course_calls(course_id: int, lookup: dict) -> dict:
+    students = lookup["students"]
+    return {
+        "avg_grade_map": (_get_avg_grade_by_user, [course_id], students),
+        "missing_map": (_get_missing_by_user, [course_id], students),
+        "names": (_get_moodle_users, students),
+        "detail_counts": (
+            _get_course_detail_counts,
+            course_id,
+            lookup["missing_rows"],
+            lookup["ungraded_rows"],
+        ),
+    }
+
+
+def get_teacher_per_course(teacher_id: int, course_id: int, fields: frozenset[str] | None = None):
+    teacher_courses = _get_teacher_courses(teacher_id)
+    course_ids = [c["courseId"] for c in teacher_courses]
+    if course_id not in course_ids:
+        raise HTTPException(status_code=404, detail="course_id not found for teacher")
+    lookup = _gather_fields(
+        _teacher_course_lookup_calls(course_id), TEACHER_COURSE_FIELDS, TEACHER_COURSE_EMPTY, fields
+    )
+    data = _gather_fields(
+        _teacher_course_calls(course_id, lookup),
+        TEACHER_COURSE_FIELDS,
+        TEACHER_COURSE_EMPTY,
+        fields,
+    )
+    return _pick_fields(_teacher_per_course_payload(course_id, lookup, data), fields)
+
+
+async def get_teacher_per_course_async(teacher_id: int, course_id: int, fields: frozenset[str] | None = None):
+    teacher_courses = await run_async(_get_teacher_courses, teacher_id)
+    course_ids = [c["courseId"] for c in teacher_courses]
+    if course_id not in course_ids:
+        raise HTTPException(status_code=404, detail="course_id not found for teacher")
+    lookup = await _gather_fields_async(
+        _teacher_course_lookup_calls(course_id), TEACHER_COURSE_FIELDS, TEACHER_COURSE_EMPTY, fields
+    )
+    data = await _gather_fields_async(
+        _teacher_course_calls(course_id, lookup),
+        TEACHER_COURSE_FIELDS,
+        TEACHER_COURSE_EMPTY,
+        fields,
+    )
+    return _pick_fields(_teacher_per_course_payload(course_id, lookup, data), fields)
+
+
+@traced
+def _teacher_per_course_payload(course_id: int, lookup: dict, data: dict):
+    students = lookup["students"]
+    total_students = int(len(students))
+
+    avg_grade_map = data["avg_grade_map"]
+    if avg_grade_map:
+        avg_grade_pct = sum(avg_grade_map.values()) / len(avg_grade_map)
+    else:
+        avg_grade_pct = 0
+
+    missing_map = data["missing_map"]
+    missing_submissions = int(sum(missing_map.values()))
+
+    names = data["names"]
+    missing_rows = lookup["missing_rows"][:PAGE_SIZE_DEFAULT]
+    ungraded_rows = lookup["ungraded_rows"][:PAGE_SIZE_DEFAULT]
+    missing_details = [_assignment_detail(r, names) for r in missing_rows]
+    ungraded_details = [_assignment_detail(r, names) for r in ungraded_rows]
+    missing_students = sorted(missing_map)[:PAGE_SIZE_DEFAULT]
+    next_cursors = {
+        "missing_details": _encode_cursor("missing_details", _missing_key(missing_rows[-1]))
+        if len(lookup["missing_rows"]) > PAGE_SIZE_DEFAULT
+        else None,
+        "ungraded_submissions": _encode_cursor("ungraded_submissions", _ungraded_key(ungraded_rows[-1]))
+        if len(lookup["ungraded_rows"]) > PAGE_SIZE_DEFAULT
+        else None,
+        "missing_per_student": _encode_cursor("missing_per_student", (missing_students[-1],))
+        if len(missing_map) > PAGE_SIZE_DEFAULT
+        else None,
+    }
 
     return {
         "course_id": course_id,
-        "course_name": course_name,
+        "course_name": lookup["course_name"],
         "total_students": total_students,
         "avg_grade_pct": round(avg_grade_pct, 1),
         "missing_submissions": missing_submissions,
-        "course_rating": _get_course_rating(course_id),
-        "missing_per_student": {str(k): v for k, v in missing_map.items()},
+        "course_rating": lookup["course_rating"],
+        "missing_per_student": {str(k): missing_map[k] for k in missing_students},
         "missing_details": missing_details,
         "ungraded_submissions": ungraded_details,
+        "next_cursors": next_cursors,
+        "summary": {
+            "totalStudents": total_students,
+            "missingDetails": data["detail_counts"]["missing_rows"],
+            "studentsWithMissing": data["detail_counts"]["missing_students"],
+            "ungradedSubmissions": data["detail_counts"]["ungraded_rows"],
+        },
     }
+
+
+def _check_teacher_course(teacher_id: int, course_id: int) -> None:
+    course_ids = [c["courseId"] for c in _get_teacher_courses(teacher_id)]
+    if course_id not in course_ids:
+        raise HTTPException(status_code=404, detail="course_id not found for teacher")
+
+
+def _detail_page(rows, limit: int, key):
+    items = rows[:limit]
+    names = _get_moodle_users([int(r["user_id"]) for r in items if not r.get("firstname")])
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = key(items[-1])
+    return [_assignment_detail(r, names) for r in items], next_cursor
+
+
+# One page of a teacher-per-course list, walked with keyset cursors: each page
+# reads limit + 1 rows past the previous page's last sort key.
+def get_teacher_course_page(
+    teacher_id: int, course_id: int, section: str, limit: int, cursor: str | None = None
+):
+    _check_teacher_course(teacher_id, course_id)
+    if section == "missing_details":
+        after = _decode_cursor(section, cursor, 3)
+        rows = _get_course_missing_rows(course_id, after, limit + 1)
+        items, last = _detail_page(rows, limit, _missing_key)
+    elif section == "ungraded_submissions":
+        after = _decode_cursor(section, cursor, 1)
+        rows = _get_course_ungraded_rows(course_id, after, limit + 1)
+        items, last = _detail_page(rows, limit, _ungraded_key)
+    else:
+        after = _decode_cursor(section, cursor, 1)
+        students = _get_course_student_page(course_id, after, limit + 1)
+        page = students[:limit]
+        missing_map = _get_missing_by_user([course_id], page)
+        items = [{"studentId": uid, "missing": missing_map.get(uid, 0)} for uid in page]
+        last = (page[-1],) if len(students) > limit else None
+    return {
+        "course_id": course_id,
+        "section": section,
+        "limit": limit,
+        "items": items,
+        "nextCursor": _encode_cursor(section, last) if last else None,
+    }
+
+
+async def get_teacher_course_page_async(
+    teacher_id: int, course_id: int, section: str, limit: int, cursor: str | None = None
+):
+    return await run_async(get_teacher_course_page, teacher_id, course_id, section, limit, cursor)
+
+
+EXPORT_COLUMNS = (
+    "studentId",
+    "studentName",
+    "avgGradePct",
+    "missingSubmissions",
+    "progressPct",
+    "lastActivity",
+)
+
+
+def _export_rows(course_id: int, students) -> list[dict]:
+    ids = [int(r["user_id"]) for r in students]
+    # A short-lived context per batch: the request's own context has ended by
+    # the time the body streams.
+    with request_context():
+        grades = _get_avg_grade_by_user([course_id], ids)
+        missing = _get_missing_by_user([course_id], ids)
+        progress = _get_progress_by_user(ids)
+        last_activity = _get_last_activity_by_user([course_id], ids)
+    return [
+        {
+            "studentId": uid,
+            "studentName": f"{r['firstname'] or ''} {r['lastname'] or ''}".strip(),
+            "avgGradePct": round(grades[uid], 1) if uid in grades else None,
+            "missingSubmissions": missing.get(uid, 0),
+            "progressPct": progress.get(uid, 0),
+            "lastActivity": _fmt_dt(last_activity.get(uid)),
+        }
+        for uid, r in zip(ids, students)
+    ]
+
+
+def _encode_export(rows: list[dict], fmt: str) -> bytes:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, EXPORT_COLUMNS, lineterminator="\n").writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+    return b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
+
+# Students are read through a server-side cursor on a dedicated connection and
+# sent EXPORT_BATCH_SIZE at a time, so memory stays bounded by the batch.
+def _export_chunks(engine, course_id: int, fmt: str):
+    if fmt == "csv":
+        yield (",".join(EXPORT_COLUMNS) + "\n").encode("utf-8")
+    prefix = MOODLE_DB_PREFIX
+    with dedicated_connection(engine) as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE).execute(
+            text(
+                f"""
+                SELECT DISTINCT ra.userid AS user_id, u.firstname, u.lastname
+                FROM {prefix}role_assignments ra
+                JOIN {prefix}context ctx ON ctx.id = ra.contextid AND ctx.contextlevel = 50
+                JOIN {prefix}user u ON u.id = ra.userid
+                WHERE ra.roleid = 5 AND ctx.instanceid = :cid
+                ORDER BY ra.userid
+                """
+            ),
+            {"cid": course_id},
+        )
+        for students in result.mappings().partitions():
+            yield _encode_export(_export_rows(course_id, students), fmt)
+
+
+# Checks access within the request and returns the body iterator; the
+# replica choice is made now, while the request's routing applies.
+def get_teacher_students_export(teacher_id: int, course_id: int, fmt: str):
+    _check_teacher_course(teacher_id, course_id)
+    return _export_chunks(route_engine(MOODLE_ENGINE), course_id, fmt)
+
+
+async def get_teacher_students_export_async(teacher_id: int, course_id: int, fmt: str):
+    await run_async(_check_teacher_course, teacher_id, course_id)
+    return _export_chunks(route_engine(MOODLE_ENGINE), course_id, fmt)
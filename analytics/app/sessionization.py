@@ -0,0 +1,112 @@
+from itertools import chain
+
+import numpy as np
+
+from .server_timing import traced
+
+# A gap between two consecutive log events of the same user counts as time
+# spent learning when it lasts 1-30 minutes; longer gaps start a new session.
+MIN_GAP_SECONDS = 60
+MAX_GAP_SECONDS = 1800
+DAY_SECONDS = 86400
+
+
+def log_columns(rows) -> tuple[np.ndarray, np.ndarray]:
+    # rows: (userid, timecreated) tuples as returned by the driver
+    flat = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows))
+    flat = flat.reshape(-1, 2)
+    return flat[:, 0], flat[:, 1]
+
+
+@traced
+def sessionize(user_ids, timestamps) -> dict:
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if timestamps.size == 0:
+        return {
+            "gap_count": 0,
+            "gap_seconds": 0.0,
+            "avg_gap_hours": 0.0,
+            "per_user": {},
+            "per_day": {},
+        }
+
+    order = np.lexsort((timestamps, user_ids))
+    user_ids = user_ids[order]
+    timestamps = timestamps[order]
+
+    gaps = np.diff(timestamps)
+    same_user = user_ids[1:] == user_ids[:-1]
+    learning = same_user & (gaps >= MIN_GAP_SECONDS) & (gaps <= MAX_GAP_SECONDS)
+    # a session starts at each user's first event and after every longer gap
+    session_starts = np.ones(timestamps.size, dtype=bool)
+    session_starts[1:] = ~same_user | (gaps > MAX_GAP_SECONDS)
+
+    gap_users = user_ids[1:][learning]
+    gap_values = gaps[learning]
+    # gaps are credited to the UTC day of the later event
+    gap_days = timestamps[1:][learning] // DAY_SECONDS
+
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    gap_index = np.searchsorted(users, gap_users)
+    user_gaps = np.bincount(gap_index, minlength=users.size)
+    user_seconds = np.bincount(gap_index, weights=gap_values, minlength=users.size)
+    user_sessions = np.bincount(user_index[session_starts], minlength=users.size)
+
+    days, day_index = np.unique(gap_days, return_inverse=True)
+    day_seconds = np.bincount(day_index, weights=gap_values, minlength=days.size)
+
+    gap_count = int(gap_values.size)
+    gap_seconds = float(gap_values.sum())
+    return {
+        "gap_count": gap_count,
+        "gap_seconds": gap_seconds,
+        "avg_gap_hours": gap_seconds / gap_count / 3600 if gap_count else 0.0,
+        "per_user": {
+            int(uid): {
+                "gaps": int(user_gaps[i]),
+                "seconds": float(user_seconds[i]),
+                "sessions": int(user_sessions[i]),
+            }
+            for i, uid in enumerate(users)
+        },
+        "per_day": {int(day): float(day_seconds[i]) / 3600 for i, day in enumerate(days)},
+    }
+
+
+def bucketed_gaps(user_ids, timestamps, bounds) -> list[tuple]:
+    # bounds: sorted bucket edges; bucket k holds [bounds[k], bounds[k + 1]).
+    # Returns (userid, bucket of the earlier event, bucket of the later event,
+    # gap count, gap seconds) for the 1-30 minute gaps.
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if timestamps.size < 2:
+        return []
+    order = np.lexsort((timestamps, user_ids))
+    user_ids = user_ids[order]
+    timestamps = timestamps[order]
+
+    gaps = np.diff(timestamps)
+    learning = (
+        (user_ids[1:] == user_ids[:-1])
+        & (gaps >= MIN_GAP_SECONDS)
+        & (gaps <= MAX_GAP_SECONDS)
+    )
+    edges = np.asarray(bounds, dtype=np.int64)
+    keys = np.column_stack(
+        (
+            user_ids[1:][learning],
+            np.searchsorted(edges, timestamps[:-1][learning], side="right") - 1,
+            np.searchsorted(edges, timestamps[1:][learning], side="right") - 1,
+        )
+    )
+    if keys.size == 0:
+        return []
+    groups, group_index = np.unique(keys, axis=0, return_inverse=True)
+    group_index = group_index.reshape(-1)
+    counts = np.bincount(group_index, minlength=len(groups))
+    seconds = np.bincount(group_index, weights=gaps[learning], minlength=len(groups))
+    return [
+        (int(uid), int(prev_bucket), int(bucket), int(counts[i]), float(seconds[i]))
+        for i, (uid, prev_bucket, bucket) in enumerate(groups)
+    ]
@@ -0,0 +1,56 @@
+import asyncio
+import functools
+
+from .request_context import current_context, request_context
+
+# key -> task computing the shared result. Only touched from the event loop.
+_IN_FLIGHT: dict = {}
+# name -> {"calls": n, "coalesced": n}
+_STATS: dict = {}
+
+
+async def _run_shared(compute):
+    # Runs in its own request context so a cancelled caller cannot release
+    # connections the computation still uses.
+    with request_context() as ctx:
+        result = await compute()
+    return result, ctx.query_count
+
+
+def _finish(key, task) -> None:
+    if _IN_FLIGHT.get(key) is task:
+        del _IN_FLIGHT[key]
+    if not task.cancelled():
+        # retrieved here as well, in case every caller went away
+        task.exception()
+
+
+# Concurrent calls with the same key await one computation of compute() and
+# share its result (or exception). name groups the counters.
+async def single_flight(name: str, key, compute):
+    stats = _STATS.setdefault(name, {"calls": 0, "coalesced": 0})
+    stats["calls"] += 1
+    task = _IN_FLIGHT.get(key)
+    if task is not None:
+        stats["coalesced"] += 1
+        result, _ = await asyncio.shield(task)
+        return result
+    task = asyncio.ensure_future(_run_shared(compute))
+    _IN_FLIGHT[key] = task
+    task.add_done_callback(functools.partial(_finish, key))
+    result, query_count = await asyncio.shield(task)
+    ctx = current_context()
+    if ctx is not None:
+        ctx.count_query(query_count)
+    return result
+
+
+def single_flight_stats() -> dict:
+    calls = sum(s["calls"] for s in _STATS.values())
+    coalesced = sum(s["coalesced"] for s in _STATS.values())
+    return {
+        "calls": calls,
+        "coalesced": coalesced,
+        "inFlight": len(_IN_FLIGHT),
+        "byService": {name: dict(s) for name, s in sorted(_STATS.items())},
+    }
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# A file-backed SQLite stand-in (3.25+ for window functions) so that every
+# connection of a test sees the same tables.
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'analytics.db'}")
+    yield engine
+    engine.dispose()
@@ -0,0 +1,19 @@
+from app.dimension_cache import DimensionCache
+
+
+def test_results_do_not_share_cached_objects():
+    cache = DimensionCache("test", ttl=60, max_entries=10)
+    load = lambda keys: {key: [{"courseId": 1, "courseName": "A"}] for key in keys}
+
+    first = cache.get_many(["all"], load)["all"]
+    first.append({"courseId": 2, "courseName": "B"})
+    first[0]["courseName"] = "changed"
+
+    assert cache.get_many(["all"], load)["all"] == [{"courseId": 1, "courseName": "A"}]
+    assert cache.stats()["hits"] == 1
+
+
+def test_get_returns_copy_of_list():
+    cache = DimensionCache("test", ttl=60, max_entries=10)
+    cache.get(5, lambda key: ["ai", "web"]).clear()
+    assert cache.get(5, lambda key: None) == ["ai", "web"]
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+
+import app.db as db
+from app.request_context import request_context
+
+
+def test_nested_fan_out_fits_a_small_pool(tmp_path, monkeypatch):
+    # pool_size + max_overflow = 3 connections, so 2 busy workers at most
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", pool_size=2, max_overflow=1, pool_timeout=5
+    )
+    monkeypatch.setattr(db, "_WORKER_SLOTS", threading.BoundedSemaphore(2))
+
+    def chunk(i):
+        with db.connect(engine) as conn:
+            time.sleep(0.02)
+            return conn.execute(text("SELECT :i"), {"i": i}).scalar()
+
+    def helper(n):
+        with db.connect(engine) as conn:
+            conn.execute(text("SELECT 1"))
+        return sum(db.run_parallel(chunk, [(n,), (n + 1,), (n + 2,)]))
+
+    results = []
+    errors = []
+
+    def request(n):
+        try:
+            with request_context():
+                with db.connect(engine) as conn:
+                    conn.execute(text("SELECT 1"))
+                calls = {name: (helper, n + offset) for name, offset in (("a", 0), ("b", 10), ("c", 20))}
+                results.append(db.run_calls(calls))
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=request, args=(n,)) for n in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(results) == 20
+    assert engine.pool.checkedout() == 0
+    engine.dispose()
+
+
+def test_fan_out_keeps_connection_used_by_caller(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+
+    def slow(i):
+        time.sleep(0.05)
+        return i
+
+    with request_context():
+        with db.connect(engine) as conn:
+            assert db.run_parallel(slow, [(1,), (2,), (3,)]) == [1, 2, 3]
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+    engine.dispose()
@@ -0,0 +1,113 @@
+import random
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import app.rollups as rollups
+import app.services.admin_service as admin_service
+from app.config import MOODLE_DB_PREFIX
+
+LOG_TABLE = f"{MOODLE_DB_PREFIX}logstore_standard_log"
+USERS = list(range(1, 13))
+
+
+def _events(now: int) -> list[tuple]:
+    # (userid, courseid, timecreated): nine days of random events plus rows on
+    # both sides of the 7-day and 24-hour window starts and of a UTC midnight.
+    rng = random.Random(7)
+    first_day_ts = (now // rollups.DAY_SECONDS - 6) * rollups.DAY_SECONDS
+    first_slot = (now - rollups.DAY_SECONDS) // rollups.SLOT_SECONDS * rollups.SLOT_SECONDS
+    events = [
+        (rng.choice(USERS), rng.randint(1, 3), rng.randint(now - 9 * rollups.DAY_SECONDS, now - 1))
+        for _ in range(600)
+    ]
+    for ts in (first_day_ts - 1, first_day_ts, first_slot - 1, first_slot, first_day_ts + rollups.DAY_SECONDS):
+        events += [(1, 1, ts), (2, 2, ts)]
+    return events
+
+
+@pytest.fixture
+def engines(sqlite_engine, tmp_path, monkeypatch):
+    rollup_engine = create_engine(f"sqlite:///{tmp_path / 'rollups.db'}")
+    now = int(time.time())
+    with sqlite_engine.begin() as conn:
+        conn.execute(
+            text(
+                f"CREATE TABLE {LOG_TABLE} "
+                "(id INTEGER PRIMARY KEY, userid INT, courseid INT, timecreated INT)"
+            )
+        )
+        conn.execute(
+            text(
+                f"CREATE TABLE {MOODLE_DB_PREFIX}course_modules_completion "
+                "(coursemoduleid INT, userid INT, completionstate INT, timemodified INT)"
+            )
+        )
+        conn.execute(
+            text(f"INSERT INTO {LOG_TABLE} (userid, courseid, timecreated) VALUES (:u, :c, :t)"),
+            [{"u": u, "c": c, "t": t} for u, c, t in sorted(_events(now), key=lambda e: e[2])],
+        )
+    for module in (rollups, admin_service):
+        monkeypatch.setattr(module, "MOODLE_ENGINE", sqlite_engine)
+        monkeypatch.setattr(module, "ROLLUP_ENGINE", rollup_engine)
+    monkeypatch.setattr(rollups, "ROLLUP_SETTLE_SECONDS", 0)
+    monkeypatch.setattr(rollups, "_STATE_CACHE", None)
+    yield sqlite_engine, rollup_engine
+    rollup_engine.dispose()
+
+
+def _admin_rows():
+    log_activity = admin_service._get_log_activity_rows()
+    return {
+        "trend": sorted(admin_service._get_active_users_trend_rows(USERS), key=lambda r: r["d"]),
+        "volume": sorted(log_activity["log_rows"], key=lambda r: r["d"]),
+        "concurrent": sorted(log_activity["concurrent_rows"], key=lambda r: r["t"]),
+    }
+
+
+def _raw_rows(monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(admin_service, "rollup_covers", lambda *args, **kwargs: False)
+        return _admin_rows()
+
+
+def test_rollup_and_raw_paths_agree(engines, monkeypatch):
+    raw = _raw_rows(monkeypatch)
+    rollups.refresh_rollups(log=lambda message: None)
+    first_day = admin_service._first_day(7)
+    assert rollups.rollup_covers(first_day * rollups.DAY_SECONDS)
+    assert rollups.rollup_covers(admin_service._first_slot(), table=rollups.CONCURRENCY_TABLE)
+    # rollup reads must not fall back here
+    monkeypatch.setattr(admin_service, "_from_rollup", lambda fn, *args: fn(*args))
+    assert _admin_rows() == raw
+    assert len(raw["trend"]) == 7
+    assert raw["concurrent"][0]["t"] == admin_service._first_slot()
+
+
+def test_failed_rollup_read_falls_back_to_raw_log(engines, monkeypatch):
+    _, rollup_engine = engines
+    raw = _raw_rows(monkeypatch)
+    rollups.refresh_rollups(log=lambda message: None)
+    with rollup_engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE {rollups.DAILY_TABLE}"))
+        conn.execute(text(f"DROP TABLE {rollups.CONCURRENCY_TABLE}"))
+    assert rollups.rollup_covers(admin_service._first_day(7) * rollups.DAY_SECONDS)
+    assert _admin_rows() == raw
+
+
+def test_watermark_stops_before_unsettled_rows(engines, monkeypatch):
+    moodle_engine, _ = engines
+    now = int(time.time())
+    with moodle_engine.begin() as conn:
+        conn.execute(
+            text(f"INSERT INTO {LOG_TABLE} (userid, courseid, timecreated) VALUES (1, 1, :t)"),
+            {"t": now},
+        )
+        last_settled = conn.execute(
+            text(f"SELECT MIN(id) - 1 FROM {LOG_TABLE} WHERE timecreated > :ts"), {"ts": now - 60}
+        ).scalar()
+    monkeypatch.setattr(rollups, "ROLLUP_SETTLE_SECONDS", 60)
+    result = rollups.refresh_rollups(log=lambda message: None)
+    assert result["lastId"] == last_settled
+    assert result["coveredTo"] <= now - 60
@@ -0,0 +1,120 @@
+import pytest
+from sqlalchemy import text
+
+import app.db as db
+import app.routers.common as common
+import app.services.teacher_service as teacher_service
+from app.sessionization import log_columns, sessionize
+
+# (userid, courseid, timecreated): gaps just under, at and just over both
+# thresholds, repeated events, and users active in more than one course.
+BASE = 1_700_000_000
+EVENTS = [
+    (1, 10, BASE),
+    (1, 10, BASE + 59),
+    (1, 10, BASE + 119),
+    (1, 11, BASE + 180),
+    (1, 10, BASE + 180),
+    (1, 10, BASE + 1979),
+    (1, 11, BASE + 3779),
+    (1, 10, BASE + 5580),
+    (1, 10, BASE + 5640),
+    (2, 11, BASE + 86_000),
+    (2, 11, BASE + 86_061),
+    (2, 10, BASE + 86_400 + 1400),
+    (2, 10, BASE + 86_400 + 1400),
+    (2, 11, BASE + 86_400 + 3200),
+    (3, 10, BASE + 10),
+    (3, 12, BASE + 70),
+    (3, 10, BASE + 1870),
+]
+USERS = [1, 2, 3]
+
+
+@pytest.fixture
+def moodle(sqlite_engine, monkeypatch):
+    with sqlite_engine.begin() as conn:
+        conn.execute(
+            text(
+                f"CREATE TABLE {common.MOODLE_DB_PREFIX}logstore_standard_log "
+                "(id INTEGER PRIMARY KEY, userid INT, courseid INT, timecreated INT)"
+            )
+        )
+        conn.execute(
+            text(
+                f"INSERT INTO {common.MOODLE_DB_PREFIX}logstore_standard_log "
+                "(userid, courseid, timecreated) VALUES (:u, :c, :t)"
+            ),
+            [{"u": u, "c": c, "t": t} for u, c, t in EVENTS],
+        )
+    monkeypatch.setattr(common, "MOODLE_ENGINE", sqlite_engine)
+    monkeypatch.setattr(teacher_service, "MOODLE_ENGINE", sqlite_engine)
+    return sqlite_engine
+
+
+def _filters(course_ids):
+    in_courses, params_c = common._in_params(course_ids, "c")
+    in_users, params_u = common._in_params(USERS, "u")
+    return f"courseid IN ({in_courses}) AND userid IN ({in_users})", {**params_c, **params_u}
+
+
+def _expected(course_ids):
+    rows = [(u, t) for u, c, t in EVENTS if c in course_ids]
+    return sessionize(*log_columns(rows))
+
+
+@pytest.mark.parametrize("course_ids", [[10], [11], [10, 11], [10, 11, 12]])
+def test_sql_gap_totals_match_sessionize(moodle, course_ids):
+    expected = _expected(course_ids)
+    rows = common._session_gap_totals(*_filters(course_ids))
+    per_user = {int(r["userid"]): (int(r["gap_count"]), float(r["gap_seconds"])) for r in rows}
+    assert per_user == {
+        uid: (stats["gaps"], stats["seconds"])
+        for uid, stats in expected["per_user"].items()
+        if stats["gaps"]
+    }
+
+
+@pytest.mark.parametrize("course_ids", [[10], [11], [10, 11], [10, 11, 12]])
+def test_avg_session_hours_same_in_both_modes(moodle, monkeypatch, course_ids):
+    filters, params = _filters(course_ids)
+    monkeypatch.setattr(common, "SESSIONIZATION_MODE", "sql")
+    sql_hours = common._avg_session_hours(filters, params)
+    monkeypatch.setattr(common, "SESSIONIZATION_MODE", "python")
+    python_hours = common._avg_session_hours(filters, params)
+    assert sql_hours == python_hours
+    assert python_hours > 0
+
+
+@pytest.mark.parametrize("mode", ["sql", "python"])
+@pytest.mark.parametrize("chunk_size, temp_table_min", [(1, 0), (2, 0), (1000, 2)])
+def test_avg_learning_hours_splits_user_ids(moodle, monkeypatch, mode, chunk_size, temp_table_min):
+    monkeypatch.setattr(common, "SESSIONIZATION_MODE", mode)
+    monkeypatch.setattr(common, "IN_LIST_CHUNK_SIZE", chunk_size)
+    monkeypatch.setattr(common, "IN_LIST_TEMP_TABLE_MIN", temp_table_min)
+    course_ids = [10, 11, 12]
+    assert common._avg_learning_hours(course_ids, USERS) == round(_expected(course_ids)["avg_gap_hours"], 2)
+
+
+def test_gap_buckets_same_in_both_modes(moodle, monkeypatch):
+    bounds = (BASE, BASE + 3600, BASE + 86_400, BASE + 2 * 86_400)
+    monkeypatch.setattr(common, "SESSIONIZATION_MODE", "sql")
+    sql_buckets = teacher_service._get_learning_gap_buckets([10, 11, 12], bounds)
+    monkeypatch.setattr(common, "SESSIONIZATION_MODE", "python")
+    python_buckets = teacher_service._get_learning_gap_buckets([10, 11, 12], bounds)
+    assert sorted(sql_buckets) == sorted(python_buckets)
+    assert python_buckets
+
+
+def test_window_functions_probe(moodle, monkeypatch):
+    monkeypatch.setattr(db, "_WINDOW_FUNCTIONS", {})
+    assert db.window_functions_supported(moodle) is True
+
+
+def test_sql_mode_falls_back_without_window_functions(moodle, monkeypatch):
+    filters, params = _filters([10, 11])
+    monkeypatch.setattr(common, "SESSIONIZATION_MODE", "sql")
+    monkeypatch.setattr(common, "window_functions_supported", lambda engine: False)
+    monkeypatch.setattr(common, "_session_gap_totals", lambda *args: pytest.fail("LAG() query ran"))
+    assert common._sessionization_mode() == "python"
+    assert common._avg_session_hours(filters, params) == round(_expected([10, 11])["avg_gap_hours"], 2)
@@ -0,0 +1,224 @@
+import random
+
+import pytest
+from sqlalchemy import text
+
+import app.routers.common as common
+import app.services.teacher_service as teacher_service
+
+P = common.MOODLE_DB_PREFIX
+COURSES = [10, 11]
+STUDENTS = list(range(1, 13))
+TABLES = (
+    "logstore_standard_log (id INTEGER PRIMARY KEY, userid INT, courseid INT, timecreated INT)",
+    "role_assignments (userid INT, contextid INT, roleid INT)",
+    "context (id INT, contextlevel INT, instanceid INT)",
+    "course_modules (id INT, course INT, completion INT)",
+    "course_modules_completion (coursemoduleid INT, userid INT, completionstate INT, timemodified INT)",
+    "assign (id INT, course INT, duedate INT)",
+    "assign_submission (id INT, assignment INT, userid INT, status TEXT)",
+    "grade_items (id INT, itemmodule TEXT, iteminstance INT)",
+    "grade_grades (id INT, itemid INT, userid INT)",
+)
+
+
+def _times(rng, windows, n):
+    # Spread over every window, plus events right on window starts and ends and
+    # a few short gaps after them
+    edges = [int(ts.timestamp()) for _, start, end in windows.values() for ts in (start, end)]
+    low, high = min(edges), max(edges)
+    picks = [rng.randint(low - 86_400, high + 86_400) for _ in range(n)]
+    # the KPI windows only cover the last 60 days
+    picks += [rng.randint(high - 60 * 86_400, high) for _ in range(n)]
+    burst = [edge + rng.choice((0, 0, 90, 600)) for edge in rng.sample(edges, 20)]
+    return picks + burst + [t + rng.randint(60, 1800) for t in burst]
+
+
+@pytest.fixture
+def windows():
+    return teacher_service._overall_windows()
+
+
+@pytest.fixture
+def moodle(sqlite_engine, monkeypatch, windows):
+    rng = random.Random(7)
+    with sqlite_engine.begin() as conn:
+        for table in TABLES:
+            conn.execute(text(f"CREATE TABLE {P}{table}"))
+        conn.execute(text(f"INSERT INTO {P}context VALUES (100, 50, 10), (110, 50, 11)"))
+        conn.execute(
+            text(f"INSERT INTO {P}role_assignments VALUES (:u, :ctx, 5)"),
+            [{"u": u, "ctx": 100 if u % 3 else 110} for u in STUDENTS],
+        )
+        # user 99 logs in but holds no student role
+        conn.execute(
+            text(f"INSERT INTO {P}logstore_standard_log (userid, courseid, timecreated) VALUES (:u, :c, :t)"),
+            [
+                {"u": rng.choice(STUDENTS + [99]), "c": rng.choice(COURSES), "t": t}
+                for t in _times(rng, windows, 400)
+            ],
+        )
+        # short sessions per student, some straddling a window edge
+        conn.execute(
+            text(f"INSERT INTO {P}logstore_standard_log (userid, courseid, timecreated) VALUES (:u, :c, :t)"),
+            [
+                {"u": u, "c": rng.choice(COURSES), "t": t + step * rng.randint(60, 1800)}
+                for u in STUDENTS
+                for t in rng.sample(_times(rng, windows, 10), 8)
+                for step in range(-1, 3)
+            ],
+        )
+        conn.execute(
+            text(f"INSERT INTO {P}course_modules VALUES (:id, :c, :comp)"),
+            [{"id": i, "c": COURSES[i % 2], "comp": i % 3} for i in range(1, 9)],
+        )
+        conn.execute(
+            text(f"INSERT INTO {P}course_modules_completion VALUES (:cm, :u, :state, :t)"),
+            [
+                {"cm": rng.randint(1, 8), "u": rng.choice(STUDENTS), "state": rng.randint(0, 2), "t": t}
+                for t in _times(rng, windows, 120)
+            ],
+        )
+        dues = _times(rng, windows, 30)
+        conn.execute(
+            text(f"INSERT INTO {P}assign VALUES (:id, :c, :due)"),
+            [{"id": i, "c": COURSES[i % 2], "due": due} for i, due in enumerate(dues, 1)],
+        )
+        conn.execute(
+            text(f"INSERT INTO {P}grade_items VALUES (:id, 'assign', :id)"),
+            [{"id": i} for i in range(1, len(dues) + 1, 2)],
+        )
+        submissions = [
+            {"id": i, "a": rng.randint(1, len(dues)), "u": rng.choice(STUDENTS), "s": rng.choice(("submitted", "new"))}
+            for i in range(1, 150)
+        ]
+        conn.execute(text(f"INSERT INTO {P}assign_submission VALUES (:id, :a, :u, :s)"), submissions)
+        conn.execute(
+            text(f"INSERT INTO {P}grade_grades VALUES (:id, :a, :u)"),
+            [s for s in submissions if s["id"] % 4 == 0],
+        )
+    monkeypatch.setattr(common, "MOODLE_ENGINE", sqlite_engine)
+    monkeypatch.setattr(teacher_service, "MOODLE_ENGINE", sqlite_engine)
+    return sqlite_engine
+
+
+# The per-window queries get_teacher_overall ran before the windows were
+# bucketed, one set per KPI window and trend point.
+def _per_window(conn, start_ts, end_ts, completion_users):
+    in_courses, params_c = common._in_params(COURSES, "c")
+    span = {**params_c, "start_ts": start_ts, "end_ts": end_ts}
+    active = sorted(
+        r[0]
+        for r in conn.execute(
+            text(
+                f"""
+                SELECT DISTINCT ra.userid
+                FROM {P}logstore_standard_log log
+                JOIN {P}role_assignments ra ON ra.userid = log.userid
+                JOIN {P}context ctx ON ctx.id = ra.contextid AND ctx.contextlevel = 50
+                WHERE log.courseid IN ({in_courses})
+                  AND log.timecreated BETWEEN :start_ts AND :end_ts
+                  AND ctx.instanceid = log.courseid
+                  AND ra.roleid = 5
+                """
+            ),
+            span,
+        )
+    )
+    users = active if completion_users is None else completion_users
+    completion = avg_hours = 0
+    if users:
+        in_users, params_u = common._in_params(users, "u")
+        total_act = conn.execute(
+            text(f"SELECT SUM(CASE WHEN completion > 0 THEN 1 ELSE 0 END) FROM {P}course_modules WHERE course IN ({in_courses})"),
+            params_c,
+        ).scalar() or 0
+        done_act = conn.execute(
+            text(
+                f"""
+                SELECT COUNT(*)
+                FROM {P}course_modules_completion cmc
+                JOIN {P}course_modules cm ON cm.id = cmc.coursemoduleid
+                WHERE cm.course IN ({in_courses})
+                  AND cmc.userid IN ({in_users})
+                  AND cmc.completionstate IN (1,2)
+                  AND cmc.timemodified BETWEEN :start_ts AND :end_ts
+                """
+            ),
+            {**span, **params_u},
+        ).scalar()
+        denom = total_act * len(users)
+        completion = round((done_act / denom) * 100, 1) if denom else 0
+    if active:
+        in_active, params_a = common._in_params(active, "u")
+        avg_hours = common._avg_session_hours(
+            f"""courseid IN ({in_courses})
+                  AND userid IN ({in_active})
+                  AND timecreated BETWEEN :start_ts AND :end_ts""",
+            {**span, **params_a},
+        )
+    in_students, params_s = common._in_params(STUDENTS, "u")
+    ungraded = conn.execute(
+        text(
+            f"""
+            SELECT COUNT(*)
+            FROM {P}assign_submission s
+            JOIN {P}assign a ON a.id = s.assignment
+            LEFT JOIN {P}grade_items gi ON gi.itemmodule = 'assign' AND gi.iteminstance = a.id
+            LEFT JOIN {P}grade_grades gg ON gg.itemid = gi.id AND gg.userid = s.userid
+            WHERE a.course IN ({in_courses})
+              AND s.userid IN ({in_students})
+              AND s.status = 'submitted'
+              AND a.duedate BETWEEN :start_ts AND :end_ts
+              AND gg.id IS NULL
+            """
+        ),
+        {**span, **params_s},
+    ).scalar()
+    dropout = round(((len(STUDENTS) - len(active)) / len(STUDENTS)) * 100, 1)
+    return {
+        "students": len(active),
+        "completion": completion,
+        "avgHours": avg_hours,
+        "dropout": dropout,
+        "ungraded": ungraded,
+    }
+
+
+def _expected(engine, windows):
+    expected = {}
+    with engine.connect() as conn:
+        for key, (label, start, end) in windows.items():
+            start_ts, end_ts = int(start.timestamp()), int(end.timestamp())
+            if label is None:
+                expected[key] = _per_window(conn, start_ts, end_ts, None)
+                continue
+            m = _per_window(conn, start_ts, end_ts, STUDENTS)
+            expected[key] = {
+                "label": label,
+                "start": common._fmt_dt(start),
+                "end": common._fmt_dt(end),
+                "completion": m["completion"],
+                "avgHours": m["avgHours"],
+                "dropout": m["dropout"],
+            }
+    return expected
+
+
+@pytest.mark.parametrize("mode", ["sql", "python"])
+def test_bucketed_windows_match_per_window_queries(moodle, monkeypatch, windows, mode):
+    monkeypatch.setattr(common, "SESSIONIZATION_MODE", mode)
+    bounds = teacher_service._window_bounds(windows)
+    data = {
+        "window_active": teacher_service._get_active_student_buckets(COURSES, bounds),
+        "window_completions": teacher_service._get_completion_buckets(COURSES, bounds),
+        "window_gaps": teacher_service._get_learning_gap_buckets(COURSES, bounds),
+        "window_ungraded": teacher_service._get_ungraded_buckets(COURSES, STUDENTS, bounds),
+    }
+    metrics = teacher_service._window_metrics(windows, STUDENTS, data)
+    expected = _expected(moodle, windows)
+    assert metrics == expected
+    # the fixture has to exercise every metric, not just agree on zeros
+    kpi = [expected[key] for key, _, _ in teacher_service.KPI_WINDOWS]
+    assert all(m["students"] and m["completion"] and m["avgHours"] for m in kpi)
+    assert any(m["ungraded"] for m in kpi)